@@ -1,10 +1,10 @@
 import streamlit as st
 from datetime import datetime
-import os
+from utilitycalc.registry import page_manifest
 
-def create_tile(title, description, app_file):
-    # Create a unique key for each button
-    button_key = f"launch_{app_file.replace('.py', '')}"
+def create_tile(page):
+    title = f"{page['icon']} {page['title']}"
+    description = page["description"]
     
     st.markdown(f"""
     <div style='
@@ -50,16 +50,14 @@ def create_tile(title, description, app_file):
     
     col1, col2 = st.columns([3, 1])
     with col2:
-        if st.button("🚀 Launch", key=button_key, type="primary", use_container_width=True):
-            calculator_path = os.path.join("calculators", app_file)
-            if os.path.exists(calculator_path):
-                try:
-                    # Use Streamlit's native page navigation
-                    st.switch_page(calculator_path)
-                except Exception as e:
-                    st.error(f"Error launching {title}: {str(e)}")
-            else:
-                st.error(f"Calculator not found: {calculator_path}")
+        if hasattr(st, "switch_page"):
+            if st.button("🚀 Launch", key=f"launch_{page['url_path']}", type="primary", use_container_width=True):
+                # Use Streamlit's native page navigation
+                st.switch_page(page["path"])
+        else:
+            # Older Streamlit: pages are served at /<file name>, so link straight to it
+            st.markdown(f"<a class='launch-link' href='{page['url_path']}' target='_self'>🚀 Launch</a>",
+                        unsafe_allow_html=True)
 
 def create_header():
     st.markdown("""
@@ -218,6 +216,21 @@ def main():
         div[data-testid="stDecoration"] {
             display: none;
         }
+        a.launch-link {
+            display: block;
+            background-color: #1f75fe;
+            color: white !important;
+            padding: 0.5rem 1rem;
+            font-weight: 500;
+            border-radius: 0.25rem;
+            text-align: center;
+            margin-top: 0.5rem;
+            transition: all 0.3s;
+        }
+        a.launch-link:hover {
+            background-color: #0056b3;
+            text-decoration: none !important;
+        }
         a {
             color: #1f75fe !important;
             text-decoration: none !important;
@@ -235,80 +248,8 @@ def main():
     # Home section with calculators
     st.markdown('<div id="home"></div>', unsafe_allow_html=True)
     
-    # Define calculators with their descriptions
-    calculators = {
-        "Finance": [
-            {
-                "title": "Loan EMI Calculator",
-                "description": "Calculate monthly EMI payments, total interest cost, and view complete amortization schedule for any loan amount and tenure",
-                "file": "loan_emi_calculator.py"
-            },
-            {
-                "title": "Investment Growth Calculator",
-                "description": "Plan your investments with compound interest calculations, SIP returns, and goal-based investment planning",
-                "file": "investment_calculator.py"
-            },
-            {
-                "title": "Mortgage Calculator",
-                "description": "Make informed home-buying decisions with mortgage payments, affordability analysis, and rent vs. buy comparison",
-                "file": "mortgage_calculator.py"
-            },
-            {
-                "title": "Expense Tracker",
-                "description": "Track daily expenses, set budgets, analyze spending patterns, and get insights on your financial habits",
-                "file": "expense_tracker.py"
-            },
-            {
-                "title": "Salary Calculator",
-                "description": "Calculate your take-home salary after taxes and deductions, plan your finances better",
-                "file": "salary_calculator.py"
-            }
-        ],
-        "Health & Wellness": [
-            {
-                "title": "BMI Calculator",
-                "description": "Calculate your Body Mass Index (BMI), get personalized health insights and weight management recommendations",
-                "file": "bmi_calculator.py"
-            },
-            {
-                "title": "Calorie Calculator",
-                "description": "Get personalized daily calorie needs based on your age, weight, height, activity level, and fitness goals",
-                "file": "calorie_calculator.py"
-            },
-            {
-                "title": "Hydration Calculator",
-                "description": "Track your daily water intake, get hydration reminders, and personalized recommendations based on your lifestyle",
-                "file": "hydration_calculator.py"
-            },
-            {
-                "title": "Sleep Calculator",
-                "description": "Optimize your sleep schedule, track sleep patterns, and get recommendations for better sleep quality",
-                "file": "sleep_calculator.py"
-            }
-        ],
-        "Home & Utilities": [
-            {
-                "title": "Electricity Bill Calculator",
-                "description": "Calculate electricity costs, track appliance-wise consumption, and get energy-saving recommendations",
-                "file": "electricity_calculator.py"
-            },
-            {
-                "title": "Grocery Planner",
-                "description": "Plan your meals, generate shopping lists, track grocery expenses, and minimize food waste",
-                "file": "grocery_planner.py"
-            }
-        ],
-        "Productivity": [
-            {
-                "title": "Task Time Estimator",
-                "description": "Get AI-powered estimates for task completion times, track productivity, and improve time management",
-                "file": "task_estimator.py"
-            }
-        ]
-    }
-
     # Create tiles for each category
-    for category, apps in calculators.items():
+    for category, apps in page_manifest().items():
         st.markdown(f"## {category}")
         
         # Calculate number of columns and empty slots needed
@@ -322,11 +263,7 @@ def main():
         # Distribute calculators across columns
         for i, app in enumerate(apps):
             with cols[i % num_cols]:
-                create_tile(
-                    app["title"],
-                    app["description"],
-                    app["file"]
-                )
+                create_tile(app)
         
         # Add empty tiles to maintain grid
         for i in range(num_empty):
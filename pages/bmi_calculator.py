@@ -1,5 +1,13 @@
 import streamlit as st
 import plotly.graph_objects as go
+from utilitycalc import health
+
+CATEGORY_COLORS = {
+    "Underweight": "blue",
+    "Normal weight": "green",
+    "Overweight": "orange",
+    "Obese": "red"
+}
 
 def main():
     st.set_page_config(page_title="BMI Calculator", page_icon="⚖️", layout="wide")
@@ -17,14 +25,10 @@ def main():
         
     if st.button("Calculate BMI"):
         # Calculate BMI
-        height_m = height / 100
-        bmi = weight / (height_m ** 2)
+        bmi = float(health.bmi(weight, height))
         
         # Calculate ideal weight range (using Hamwi formula)
-        if gender == "Male":
-            ideal_weight = 48 + 2.7 * (height - 152.4) / 2.54
-        else:
-            ideal_weight = 45.5 + 2.2 * (height - 152.4) / 2.54
+        ideal_weight = float(health.hamwi_ideal_weight(height, gender))
             
         weight_range = (ideal_weight * 0.9, ideal_weight * 1.1)
         
@@ -33,18 +37,8 @@ def main():
             st.info(f"Your BMI: {bmi:.1f}")
             
             # BMI Category
-            if bmi < 18.5:
-                category = "Underweight"
-                color = "blue"
-            elif bmi < 25:
-                category = "Normal weight"
-                color = "green"
-            elif bmi < 30:
-                category = "Overweight"
-                color = "orange"
-            else:
-                category = "Obese"
-                color = "red"
+            category = str(health.bmi_category(bmi))
+            color = CATEGORY_COLORS[category]
                 
             st.markdown(f"<h3 style='color: {color};'>Category: {category}</h3>", unsafe_allow_html=True)
             st.success(f"Ideal Weight Range: {weight_range[0]:.1f} - {weight_range[1]:.1f} kg")
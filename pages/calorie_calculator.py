@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from datetime import datetime
+from utilitycalc import health, nutrition
+from utilitycalc.storage import user_store
 
 def main():
     st.set_page_config(page_title="Calorie Calculator", page_icon="🍎", layout="wide")
@@ -24,34 +27,17 @@ def main():
         
     if st.button("Calculate Needs"):
         # Calculate BMR using Mifflin-St Jeor Equation
-        if gender == "Male":
-            bmr = 10 * weight + 6.25 * height - 5 * age + 5
-        else:
-            bmr = 10 * weight + 6.25 * height - 5 * age - 161
-            
-        # Activity multiplier
-        activity_multipliers = {
-            "Sedentary": 1.2,
-            "Lightly Active": 1.375,
-            "Moderately Active": 1.55,
-            "Very Active": 1.725,
-            "Extra Active": 1.9
-        }
-        
-        tdee = bmr * activity_multipliers[activity_level]
+        bmr = health.mifflin_st_jeor_bmr(weight, height, age, gender)
+        tdee = health.tdee(bmr, activity_level)
         
         # Adjust calories based on goal
-        if goal == "Lose Weight":
-            calories = tdee - 500
-        elif goal == "Gain Weight":
-            calories = tdee + 500
-        else:
-            calories = tdee
+        calories = float(health.calorie_target(tdee, goal))
             
-        # Calculate macronutrients
-        protein = weight * 2.2  # 2.2g per kg
-        fat = (calories * 0.25) / 9  # 25% of calories from fat
-        carbs = (calories - (protein * 4) - (fat * 9)) / 4  # Remaining calories from carbs
+        # Calculate macronutrients (2.2g/kg protein, 25% fat, rest carbs)
+        protein, carbs, fat = (float(m) for m in health.macros(weight, calories))
+        st.session_state.calorie_targets = {
+            "calories": calories, "protein": protein, "carbs": carbs, "fat": fat
+        }
         
         with col2:
             st.markdown("### 📊 Daily Needs")
@@ -81,6 +67,89 @@ def main():
             )])
             fig.update_layout(title="Calorie Distribution")
             st.plotly_chart(fig)
+    
+    # Food log
+    st.markdown("### 🍽️ Food Log")
+    if 'food_log' not in st.session_state:
+        st.session_state.food_log = nutrition.load_food_log(user_store())
+    foods = nutrition.default_food_database()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        log_date = st.date_input("Log Date").strftime("%Y-%m-%d")
+        query = st.text_input("Search Food", placeholder="Start typing, e.g. chick")
+        matches = nutrition.search_foods(foods["index"], query)
+        
+        if matches:
+            food_id = st.selectbox("Food", matches, format_func=lambda i: foods["names"][i])
+            per_100g = dict(zip(nutrition.NUTRIENTS, foods["nutrients"][food_id]))
+            st.caption(f"Per 100 g: {per_100g['calories']:.0f} kcal, {per_100g['protein']:.1f} g protein, "
+                       f"{per_100g['carbs']:.1f} g carbs, {per_100g['fat']:.1f} g fat")
+            grams = st.number_input("Amount (g)", min_value=1.0, value=100.0, step=10.0)
+            
+            if st.button("Log Food"):
+                nutrition.log_food(st.session_state.food_log, {
+                    "date": log_date,
+                    "food": foods["names"][food_id],
+                    "grams": grams,
+                    "time": datetime.now().strftime("%H:%M")
+                }, user_store())
+                st.success(f"Logged {grams:.0f} g of {foods['names'][food_id]}")
+        elif query:
+            st.write("No matching foods found.")
+    
+    with col2:
+        # Only the selected day is read from the per-day log
+        day_log = nutrition.day_food_log(st.session_state.food_log, log_date)
+        totals = nutrition.day_food_totals(st.session_state.food_log, log_date)
+        
+        if day_log:
+            st.dataframe(pd.DataFrame(day_log)[["time", "food", "grams"]])
+        
+        targets = st.session_state.get("calorie_targets")
+        if targets:
+            st.markdown("#### 🎯 Intake vs. Targets")
+            for nutrient in nutrition.NUTRIENTS:
+                unit = "kcal" if nutrient == "calories" else "g"
+                st.write(f"{nutrient.title()}: {totals[nutrient]:.0f} / {targets[nutrient]:.0f} {unit}")
+                st.progress(min(totals[nutrient] / targets[nutrient], 1.0) if targets[nutrient] > 0 else 0.0)
+        else:
+            st.write(f"Logged today: {totals['calories']:.0f} kcal. Calculate your needs to compare against targets.")
+    
+    # Meal planner
+    st.markdown("### 🗓️ Weekly Meal Plan")
+    targets = st.session_state.get("calorie_targets")
+    if not targets:
+        st.write("Calculate your needs above to generate a meal plan.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            excluded = st.multiselect("Exclude Foods", range(len(foods["names"])),
+                                      format_func=lambda i: foods["names"][i])
+            preferred = st.multiselect("Preferred Foods", range(len(foods["names"])),
+                                       format_func=lambda i: foods["names"][i])
+        with col2:
+            max_grams = st.slider("Max Portion per Food (g/day)", 100, 500, 300, 50)
+            max_weekly_grams = st.slider("Max per Food per Week (g)", 300, 2000, 700, 100)
+        
+        if st.button("Generate Meal Plan"):
+            try:
+                plan, planned = nutrition.plan_meals(foods, targets, max_grams=max_grams,
+                                                     max_weekly_grams=max_weekly_grams,
+                                                     excluded=excluded, preferred=preferred)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                for day, (portions, day_totals) in enumerate(zip(plan, planned), 1):
+                    cost = sum(foods["prices"][i] * g / 100 for i, g in portions.items())
+                    with st.expander(f"Day {day}: {day_totals[0]:.0f} kcal, "
+                                     f"P {day_totals[1]:.0f} g / C {day_totals[2]:.0f} g / F {day_totals[3]:.0f} g, "
+                                     f"₹{cost:.0f}"):
+                        st.dataframe(pd.DataFrame({
+                            "Food": [foods["names"][i] for i in portions],
+                            "Grams": list(portions.values())
+                        }))
 
 if __name__ == "__main__":
     main()
@@ -1,51 +1,14 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-import json
-import os
 from datetime import datetime
-
-def load_appliance_data():
-    if os.path.exists('appliance_usage.json'):
-        with open('appliance_usage.json', 'r') as f:
-            return json.load(f)
-    return []
-
-def save_appliance_data(data):
-    with open('appliance_usage.json', 'w') as f:
-        json.dump(data, f)
-
-# Common household appliances and their typical power consumption
-COMMON_APPLIANCES = {
-    "Air Conditioner": 1500,
-    "Refrigerator": 150,
-    "Washing Machine": 500,
-    "Television": 100,
-    "Microwave": 1000,
-    "Electric Fan": 75,
-    "LED Light Bulb": 10,
-    "Desktop Computer": 200,
-    "Laptop": 60,
-    "Water Heater": 2000,
-    "Iron": 1000,
-    "Dishwasher": 1500,
-    "Electric Kettle": 1500,
-    "Ceiling Fan": 75,
-    "Router/Modem": 10
-}
-
-def calculate_daily_consumption(appliances):
-    total_kwh = 0
-    for appliance in appliances:
-        hours = appliance['hours']
-        watts = appliance['watts']
-        quantity = appliance['quantity']
-        total_kwh += (watts * hours * quantity) / 1000
-    return total_kwh
-
-def calculate_bill(total_kwh, rate):
-    return total_kwh * rate
+from utilitycalc.electricity import (
+    add_appliance, calculate_bill, calculate_daily_consumption, COMMON_APPLIANCES,
+    load_appliance_data, simulate_peak_demand
+)
+from utilitycalc.storage import user_store
 
 def main():
     st.set_page_config(page_title="Electricity Bill Calculator", page_icon="⚡", layout="wide")
@@ -55,7 +18,7 @@ def main():
     
     # Initialize session state
     if 'appliances' not in st.session_state:
-        st.session_state.appliances = load_appliance_data()
+        st.session_state.appliances = load_appliance_data(user_store())
     
     tab1, tab2, tab3 = st.tabs(["Add Appliances", "View Usage", "Analysis"])
     
@@ -91,8 +54,7 @@ def main():
                     "daily_kwh": (watts * hours * quantity) / 1000,
                     "date_added": datetime.now().strftime("%Y-%m-%d")
                 }
-                st.session_state.appliances.append(appliance)
-                save_appliance_data(st.session_state.appliances)
+                add_appliance(st.session_state.appliances, appliance, user_store())
                 st.success(f"Added {name} to appliances!")
         
         with col2:
@@ -168,6 +130,28 @@ def main():
                     yaxis_title="kWh"
                 )
                 st.plotly_chart(fig2)
+            
+            # Peak demand simulation
+            st.markdown("### 🔋 Peak Demand Simulation")
+            sim_days = st.number_input("Simulated Days", min_value=100, max_value=10000, value=2000, step=100)
+            
+            if st.button("Simulate Peak Demand"):
+                summary = simulate_peak_demand(st.session_state.appliances, days=int(sim_days))
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.info(f"Typical Daily Peak (P50): {summary['peak_p50']:.2f} kW")
+                    st.warning(f"High Daily Peak (P95): {summary['peak_p95']:.2f} kW")
+                    st.error(f"Extreme Daily Peak (P99): {summary['peak_p99']:.2f} kW")
+                    st.success(f"Simulated Daily Consumption: {summary['mean_daily_kwh']:.2f} kWh")
+                    st.write(f"Suggested sanctioned load: {np.ceil(summary['peak_p99']):.0f} kW")
+                
+                with col2:
+                    fig_peaks = px.histogram(x=summary['daily_peaks'], nbins=40,
+                                             title='Distribution of Daily Peak Demand')
+                    fig_peaks.update_layout(xaxis_title="Peak Demand (kW)", yaxis_title="Days")
+                    st.plotly_chart(fig_peaks)
     
     # Analysis Tab
     with tab3:
@@ -2,19 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-import json
-from datetime import datetime
-import os
-
-def load_expenses():
-    if os.path.exists('expenses.json'):
-        with open('expenses.json', 'r') as f:
-            return json.load(f)
-    return []
-
-def save_expenses(expenses):
-    with open('expenses.json', 'w') as f:
-        json.dump(expenses, f)
+from utilitycalc.finance import add_expense, category_totals, load_expenses
+from utilitycalc.storage import user_store
 
 def main():
     st.set_page_config(page_title="Expense Tracker", page_icon="💵", layout="wide")
@@ -24,7 +13,7 @@ def main():
     
     # Initialize session state for expenses if not exists
     if 'expenses' not in st.session_state:
-        st.session_state.expenses = load_expenses()
+        st.session_state.expenses = load_expenses(user_store())
     
     # Sidebar for budget planning
     st.sidebar.header("Monthly Budget Planning")
@@ -60,8 +49,7 @@ def main():
                     "description": description,
                     "date": date.strftime("%Y-%m-%d")
                 }
-                st.session_state.expenses.append(expense)
-                save_expenses(st.session_state.expenses)
+                add_expense(st.session_state.expenses, expense, user_store())
                 st.success("Expense added successfully!")
     
     # View Expenses Tab
@@ -122,18 +110,14 @@ def main():
                 st.plotly_chart(fig1)
                 
                 # Compare with budget
-                comparison_data = []
-                for category in categories:
-                    spent = category_expenses.get(category, 0)
-                    budgeted = budget_data[category]
-                    comparison_data.append({
-                        'Category': category,
-                        'Spent': spent,
-                        'Budget': budgeted,
-                        'Remaining': budgeted - spent
-                    })
-                
-                comparison_df = pd.DataFrame(comparison_data)
+                spent = category_totals(df['amount'], df['category'], categories)
+                budgeted = [budget_data[category] for category in categories]
+                comparison_df = pd.DataFrame({
+                    'Category': categories,
+                    'Spent': spent,
+                    'Budget': budgeted,
+                    'Remaining': budgeted - spent
+                })
                 st.markdown("### Budget vs Actual Spending")
                 st.dataframe(
                     comparison_df
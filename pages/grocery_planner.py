@@ -2,38 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-import json
-import os
 from datetime import datetime, timedelta
-
-def load_grocery_data():
-    if os.path.exists('grocery_data.json'):
-        with open('grocery_data.json', 'r') as f:
-            return json.load(f)
-    return {"items": [], "meals": [], "shopping_lists": []}
-
-def save_grocery_data(data):
-    with open('grocery_data.json', 'w') as f:
-        json.dump(data, f)
-
-# Common grocery categories and items
-GROCERY_CATEGORIES = {
-    "Fruits & Vegetables": [
-        "Apples", "Bananas", "Oranges", "Tomatoes", "Potatoes", "Onions", "Carrots"
-    ],
-    "Dairy & Eggs": [
-        "Milk", "Cheese", "Yogurt", "Butter", "Eggs"
-    ],
-    "Grains & Cereals": [
-        "Rice", "Wheat Flour", "Bread", "Pasta", "Oats"
-    ],
-    "Protein": [
-        "Chicken", "Fish", "Tofu", "Lentils", "Beans"
-    ],
-    "Pantry Items": [
-        "Oil", "Sugar", "Salt", "Spices", "Tea", "Coffee"
-    ]
-}
+from utilitycalc.grocery import (
+    add_catalog_item, add_grocery_record, add_meal_to_index, add_price_record, add_purchase,
+    build_meal_index, build_price_index, expiring_within, format_amounts, group_by_category,
+    ingredient_amounts_between, ingredient_counts_between, load_grocery_data, load_spend_cube,
+    monthly_spending, optimize_basket, recent_purchases, record_pantry_event, replay_pantry,
+    session_catalog, subtract_on_hand, suggest_meals, top_spend_items, UNIT_CONVERSIONS, UNITS
+)
+from utilitycalc.storage import user_store
 
 def main():
     st.set_page_config(page_title="Grocery & Meal Planner", page_icon="🛒", layout="wide")
@@ -43,9 +20,24 @@ def main():
     
     # Initialize session state
     if 'grocery_data' not in st.session_state:
-        st.session_state.grocery_data = load_grocery_data()
+        st.session_state.grocery_data = load_grocery_data(user_store())
+    if 'grocery_catalog' not in st.session_state:
+        st.session_state.grocery_catalog = session_catalog(st.session_state.grocery_data["custom_items"])
+    if 'meal_index' not in st.session_state:
+        st.session_state.meal_index = build_meal_index(
+            st.session_state.grocery_data["meals"],
+            st.session_state.grocery_catalog
+        )
+    catalog = st.session_state.grocery_catalog
+    if 'pantry' not in st.session_state:
+        st.session_state.pantry = replay_pantry(st.session_state.grocery_data["pantry_events"])
+    if 'spend_cube' not in st.session_state:
+        st.session_state.spend_cube = load_spend_cube(st.session_state.grocery_data)
+    if 'price_index' not in st.session_state:
+        st.session_state.price_index = build_price_index(st.session_state.grocery_data["items"])
     
-    tab1, tab2, tab3, tab4 = st.tabs(["Meal Planning", "Shopping List", "Expense Tracking", "Analysis"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Meal Planning", "Shopping List", "Expense Tracking",
+                                            "Pantry", "Analysis"])
     
     # Meal Planning Tab
     with tab1:
@@ -58,35 +50,45 @@ def main():
             meal_date = st.date_input("Date")
             meal_type = st.selectbox("Meal Type", ["Breakfast", "Lunch", "Dinner"])
             meal_name = st.text_input("Meal Name")
-            ingredients = st.multiselect(
-                "Ingredients",
-                [item for items in GROCERY_CATEGORIES.values() for item in items]
-            )
+            ingredients = st.multiselect("Ingredients", catalog["items"])
             servings = st.number_input("Servings", min_value=1, value=2)
             
+            # Per-serving quantity for each selected ingredient
+            quantities = []
+            if ingredients:
+                st.markdown("#### ⚖️ Quantities per Serving")
+            for ingredient in ingredients:
+                qcol1, qcol2 = st.columns(2)
+                with qcol1:
+                    amount = st.number_input(f"{ingredient} Amount", min_value=0.0, value=0.0,
+                                             key=f"amount_{ingredient}")
+                with qcol2:
+                    unit = st.selectbox(f"{ingredient} Unit", UNITS, key=f"unit_{ingredient}")
+                if amount > 0:
+                    quantities.append({"item": ingredient, "amount": amount, "unit": unit})
+            
             if st.button("Add Meal"):
                 meal = {
                     "date": meal_date.strftime("%Y-%m-%d"),
                     "type": meal_type,
                     "name": meal_name,
                     "ingredients": ingredients,
-                    "servings": servings
+                    "servings": servings,
+                    "quantities": quantities
                 }
-                st.session_state.grocery_data["meals"].append(meal)
-                save_grocery_data(st.session_state.grocery_data)
+                add_grocery_record(st.session_state.grocery_data, "meals", meal, user_store())
+                add_meal_to_index(st.session_state.meal_index, meal)
                 st.success("Meal added to plan!")
         
         with col2:
             if st.session_state.grocery_data["meals"]:
                 # Display meal plan
-                df_meals = pd.DataFrame(st.session_state.grocery_data["meals"])
-                df_meals['date'] = pd.to_datetime(df_meals['date'])
-                df_meals = df_meals.sort_values(['date', 'type'])
+                meal_index = st.session_state.meal_index
                 
-                for date in df_meals['date'].unique():
-                    st.markdown(f"#### {date.strftime('%A, %B %d')}")
-                    day_meals = df_meals[df_meals['date'] == date]
-                    for _, meal in day_meals.iterrows():
+                for date in meal_index["dates"]:
+                    st.markdown(f"#### {datetime.strptime(date, '%Y-%m-%d').strftime('%A, %B %d')}")
+                    day_meals = sorted(meal_index["meals_by_date"][date], key=lambda m: m['type'])
+                    for meal in day_meals:
                         st.markdown(f"**{meal['type']}**: {meal['name']} ({meal['servings']} servings)")
                         st.write(", ".join(meal['ingredients']))
                         st.markdown("---")
@@ -105,43 +107,92 @@ def main():
             if st.button("Generate Shopping List"):
                 end_date = start_date + timedelta(days=days)
                 
-                # Get meals within date range
-                df_meals = pd.DataFrame(st.session_state.grocery_data["meals"])
-                if not df_meals.empty:
-                    df_meals['date'] = pd.to_datetime(df_meals['date'])
-                    mask = (df_meals['date'] >= pd.Timestamp(start_date)) & \
-                           (df_meals['date'] <= pd.Timestamp(end_date))
-                    selected_meals = df_meals[mask]
-                    
-                    # Compile ingredients
-                    ingredients_list = []
-                    for _, meal in selected_meals.iterrows():
-                        ingredients_list.extend(meal['ingredients'])
-                    
-                    # Count ingredients
-                    ingredients_count = pd.Series(ingredients_list).value_counts()
+                # Sum the per-day ingredient counts within the date range
+                if st.session_state.grocery_data["meals"]:
+                    ingredients_count = ingredient_counts_between(
+                        st.session_state.meal_index,
+                        start_date.strftime("%Y-%m-%d"),
+                        end_date.strftime("%Y-%m-%d")
+                    )
+                    ingredients_amounts = ingredient_amounts_between(
+                        st.session_state.meal_index,
+                        start_date.strftime("%Y-%m-%d"),
+                        end_date.strftime("%Y-%m-%d")
+                    )
                     
                     # Create shopping list
                     shopping_list = {
                         "date_created": datetime.now().strftime("%Y-%m-%d"),
                         "start_date": start_date.strftime("%Y-%m-%d"),
                         "end_date": end_date.strftime("%Y-%m-%d"),
-                        "items": [{"item": item, "quantity": count} 
-                                for item, count in ingredients_count.items()]
+                        "items": subtract_on_hand(
+                            [{"item": item, "quantity": count,
+                              "amounts": ingredients_amounts.get(item, {})}
+                             for item, count in ingredients_count],
+                            st.session_state.pantry["on_hand"]
+                        )
                     }
                     
-                    st.session_state.grocery_data["shopping_lists"].append(shopping_list)
-                    save_grocery_data(st.session_state.grocery_data)
+                    add_grocery_record(st.session_state.grocery_data, "shopping_lists", shopping_list,
+                                       user_store())
                     
                     with col2:
                         st.markdown("### 📝 Shopping List")
-                        for category, items in GROCERY_CATEGORIES.items():
-                            category_items = [item for item in shopping_list["items"] 
-                                           if item["item"] in items]
-                            if category_items:
-                                st.markdown(f"#### {category}")
-                                for item in category_items:
+                        grouped = group_by_category(catalog, shopping_list["items"])
+                        for category, category_items in grouped.items():
+                            st.markdown(f"#### {category}")
+                            for item in category_items:
+                                if item['amounts']:
+                                    st.write(f"- {item['item']}: {format_amounts(item['amounts'])}")
+                                else:
                                     st.write(f"- {item['item']} (x{item['quantity']})")
+        
+        # Cheapest basket for the latest shopping list
+        if st.session_state.grocery_data["shopping_lists"]:
+            st.markdown("### 💸 Cheapest Basket")
+            latest_list = st.session_state.grocery_data["shopping_lists"][-1]
+            
+            bcol1, bcol2 = st.columns(2)
+            with bcol1:
+                limit_budget = st.checkbox("Limit to Budget")
+                basket_budget = None
+                if limit_budget:
+                    basket_budget = st.number_input("Basket Budget (₹)", min_value=0.0, value=1000.0, step=100.0)
+                price_basis = st.selectbox("Price Basis", ["Latest", "Median", "Seasonal"])
+                allow_substitutes = st.checkbox("Allow Substitutions", value=True)
+            
+            if st.button("Optimize Basket"):
+                try:
+                    basket, missing = optimize_basket(
+                        latest_list["items"],
+                        st.session_state.price_index,
+                        basis=price_basis,
+                        month=datetime.now().month,
+                        allow_substitutes=allow_substitutes,
+                        budget=basket_budget
+                    )
+                except ValueError as e:
+                    basket, missing = [], []
+                    with bcol2:
+                        st.error(f"No basket fits the budget. {e}")
+                
+                with bcol2:
+                    if basket:
+                        basket_df = pd.DataFrame([{
+                            "Item": entry["item"],
+                            "Buy": entry["buy"],
+                            "Packs": ", ".join(f"{count} x {format_amounts({base: size})}"
+                                               for base, packs in entry["packs"].items()
+                                               for size, count in packs.items()),
+                            "Cost": entry["cost"]
+                        } for entry in basket])
+                        st.dataframe(basket_df.style.format({'Cost': '₹{:.2f}'}))
+                        
+                        basket_total = basket_df["Cost"].sum()
+                        st.success(f"Basket Total: ₹{basket_total:,.2f}"
+                                   + (" (within budget)" if basket_budget is not None else ""))
+                    if missing:
+                        st.warning(f"No price history for: {', '.join(missing)}")
     
     # Expense Tracking Tab
     with tab3:
@@ -151,32 +202,59 @@ def main():
         
         with col1:
             # Add new item
-            category = st.selectbox("Category", list(GROCERY_CATEGORIES.keys()))
-            item = st.selectbox("Item", GROCERY_CATEGORIES[category])
-            quantity = st.number_input("Quantity", min_value=1, value=1)
+            category = st.selectbox("Category", list(catalog["categories"].keys()))
+            item = st.selectbox("Item", catalog["categories"][category])
+            qcol1, qcol2 = st.columns(2)
+            with qcol1:
+                quantity = st.number_input("Quantity", min_value=0.01, value=1.0)
+            with qcol2:
+                quantity_unit = st.selectbox("Unit", UNITS, index=UNITS.index("pieces"))
             price = st.number_input("Price (₹)", min_value=0.0, value=0.0)
             purchase_date = st.date_input("Purchase Date")
+            add_to_pantry = st.checkbox("Add to Pantry")
+            if add_to_pantry:
+                expiry_date = st.date_input("Expiry Date", value=purchase_date + timedelta(days=7))
             
             if st.button("Add Item"):
                 item_data = {
                     "category": category,
                     "item": item,
                     "quantity": quantity,
+                    "unit": quantity_unit,
                     "price": price,
                     "date": purchase_date.strftime("%Y-%m-%d")
                 }
-                st.session_state.grocery_data["items"].append(item_data)
-                save_grocery_data(st.session_state.grocery_data)
+                st.session_state.spend_cube = add_purchase(st.session_state.grocery_data, item_data, user_store())
+                add_price_record(st.session_state.price_index, item_data)
+                if add_to_pantry:
+                    record_pantry_event(st.session_state.grocery_data, st.session_state.pantry, {"add": {
+                        "item": item,
+                        "quantity": quantity,
+                        "unit": quantity_unit,
+                        "expiry": expiry_date.strftime("%Y-%m-%d"),
+                        "added": purchase_date.strftime("%Y-%m-%d")
+                    }}, user_store())
                 st.success("Item added to expenses!")
+            
+            with st.expander("➕ Add Custom Item"):
+                custom_name = st.text_input("Item Name").strip()
+                custom_category = st.text_input("Item Category", value="Other").strip() or "Other"
+                
+                if st.button("Add to Catalog") and custom_name:
+                    if custom_name in catalog["ids"]:
+                        st.warning(f"{custom_name} is already in the catalog")
+                    else:
+                        add_catalog_item(catalog, custom_name, custom_category)
+                        add_grocery_record(st.session_state.grocery_data, "custom_items",
+                                           {"item": custom_name, "category": custom_category}, user_store())
+                        st.success(f"Added {custom_name} to {custom_category}!")
         
         with col2:
             if st.session_state.grocery_data["items"]:
-                df_items = pd.DataFrame(st.session_state.grocery_data["items"])
-                df_items['date'] = pd.to_datetime(df_items['date'])
-                
                 # Display recent expenses
                 st.markdown("### Recent Expenses")
-                recent_items = df_items.sort_values('date', ascending=False).head(10)
+                recent_items = pd.DataFrame(recent_purchases(st.session_state.grocery_data, 10))
+                recent_items['date'] = pd.to_datetime(recent_items['date'])
                 st.dataframe(
                     recent_items[['date', 'item', 'quantity', 'price']]
                     .style.format({
@@ -185,50 +263,103 @@ def main():
                     })
                 )
     
-    # Analysis Tab
+    # Pantry Tab
     with tab4:
+        st.markdown("### 🥫 Pantry Inventory")
+        pantry = st.session_state.pantry
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Use stock, oldest expiry first
+            st.markdown("#### Use Items")
+            if pantry["on_hand"]:
+                use_item = st.selectbox("Pantry Item", sorted(pantry["on_hand"]))
+                stock = pantry["on_hand"][use_item]
+                # Only units in a dimension the item is stocked in
+                use_unit = st.selectbox("Unit Used", [unit for unit in UNITS if UNIT_CONVERSIONS[unit][0] in stock])
+                base, factor = UNIT_CONVERSIONS[use_unit]
+                in_stock = stock[base] / factor
+                use_quantity = st.number_input("Quantity Used", min_value=0.0, max_value=float(in_stock),
+                                               value=min(1.0, float(in_stock)))
+                if st.button("Use Item"):
+                    used = record_pantry_event(st.session_state.grocery_data, pantry, {
+                        "use": use_item, "quantity": use_quantity, "unit": use_unit
+                    }, user_store())
+                    st.success(f"Used {used:g} {use_unit} of {use_item}")
+            else:
+                st.write("Your pantry is empty. Tick \"Add to Pantry\" when adding grocery items.")
+            
+            if st.button("Clear Expired Items"):
+                wasted = record_pantry_event(st.session_state.grocery_data, pantry, {
+                    "discard": datetime.now().strftime("%Y-%m-%d")
+                }, user_store())
+                if wasted:
+                    st.warning("Discarded: " + ", ".join(f"{e['item']} ({e['quantity']:g} {e['unit']})" for e in wasted))
+                else:
+                    st.success("Nothing has expired!")
+        
+        with col2:
+            st.markdown("#### ⏳ Expiring Soon")
+            horizon = st.number_input("Expiring Within (days)", min_value=1, max_value=30, value=3)
+            cutoff = (datetime.now() + timedelta(days=int(horizon))).strftime("%Y-%m-%d")
+            expiring = expiring_within(pantry, cutoff)
+            
+            if expiring:
+                for entry in expiring:
+                    st.write(f"- {entry['item']} ({entry['quantity']:g} {entry['unit']}) expires {entry['expiry']}")
+                
+                suggestions = suggest_meals(st.session_state.meal_index,
+                                            {entry['item'] for entry in expiring})
+                if suggestions:
+                    st.markdown("#### 🍳 Meals to Use Them Up")
+                    for meal, uses in suggestions[:5]:
+                        st.write(f"- {meal['name']} (uses {uses} expiring item{'s' if uses > 1 else ''})")
+            else:
+                st.success("Nothing is expiring soon!")
+    
+    # Analysis Tab
+    with tab5:
         if st.session_state.grocery_data["items"]:
-            df_items = pd.DataFrame(st.session_state.grocery_data["items"])
-            df_items['date'] = pd.to_datetime(df_items['date'])
+            cube = st.session_state.spend_cube
             
             col1, col2 = st.columns(2)
             
             with col1:
                 # Spending by category
-                category_spending = df_items.groupby('category')['price'].sum()
+                category_spending = cube["by_category"]
                 
                 fig1 = go.Figure(data=[go.Pie(
-                    labels=category_spending.index,
-                    values=category_spending.values,
+                    labels=list(category_spending.keys()),
+                    values=list(category_spending.values()),
                     hole=.3
                 )])
                 fig1.update_layout(title="Spending by Category")
                 st.plotly_chart(fig1)
                 
                 # Monthly spending trend
-                monthly_spending = df_items.set_index('date')\
-                    .resample('M')['price'].sum().reset_index()
+                months, month_totals = monthly_spending(cube)
                 
-                fig2 = px.line(monthly_spending, x='date', y='price',
-                              title='Monthly Spending Trend')
+                fig2 = px.line(x=pd.to_datetime(months), y=month_totals,
+                              title='Monthly Spending Trend',
+                              labels={'x': 'date', 'y': 'price'})
                 st.plotly_chart(fig2)
             
             with col2:
                 # Spending insights
                 st.markdown("### 💡 Spending Insights")
                 
-                total_spent = df_items['price'].sum()
-                avg_monthly = monthly_spending['price'].mean()
+                total_spent = cube["total"]
+                avg_monthly = sum(month_totals) / len(month_totals)
                 
                 st.info(f"Total Spent: ₹{total_spent:,.2f}")
                 st.success(f"Average Monthly Spending: ₹{avg_monthly:,.2f}")
                 
                 # Most expensive items
-                top_items = df_items.groupby('item')['price'].sum()\
-                    .sort_values(ascending=False).head(5)
+                top_items = top_spend_items(cube)
                 
                 st.markdown("#### Most Expensive Items")
-                for item, price in top_items.items():
+                for item, price in top_items:
                     st.write(f"- {item}: ₹{price:,.2f}")
                 
                 # Budget recommendations
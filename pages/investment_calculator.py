@@ -1,6 +1,6 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
+from utilitycalc import finance
 
 def main():
     st.set_page_config(page_title="Investment Growth Calculator", page_icon="📈", layout="wide")
@@ -17,16 +17,10 @@ def main():
         investment_period = st.number_input("Investment Period (Years)", min_value=1, max_value=50, value=10)
         
     if st.button("Calculate Returns"):
-        # Monthly rate
-        monthly_rate = annual_return / (12 * 100)
-        months = investment_period * 12
-        
-        # Calculate future value
-        future_value = initial_investment * (1 + monthly_rate) ** months
-        
         # Calculate future value with monthly contributions
-        if monthly_contribution > 0:
-            future_value += monthly_contribution * (((1 + monthly_rate) ** months - 1) / monthly_rate)
+        future_value = float(finance.future_value(initial_investment, monthly_contribution,
+                                                  annual_return, investment_period))
+        months = investment_period * 12
         
         total_invested = initial_investment + (monthly_contribution * months)
         total_returns = future_value - total_invested
@@ -39,13 +33,7 @@ def main():
             
             # Create growth visualization
             years = list(range(investment_period + 1))
-            values = []
-            for year in years:
-                months = year * 12
-                value = initial_investment * (1 + monthly_rate) ** months
-                if monthly_contribution > 0:
-                    value += monthly_contribution * (((1 + monthly_rate) ** months - 1) / monthly_rate)
-                values.append(value)
+            values = finance.future_value(initial_investment, monthly_contribution, annual_return, years)
             
             fig = go.Figure()
             fig.add_trace(go.Scatter(x=years, y=values,
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+from utilitycalc import finance
 
 def main():
     st.set_page_config(page_title="Loan EMI Calculator", page_icon="💰", layout="wide")
@@ -16,17 +17,11 @@ def main():
         loan_term = st.number_input("Loan Term (Years)", min_value=1, max_value=30, value=5)
 
     if st.button("Calculate EMI"):
-        # Monthly interest rate
-        monthly_rate = interest_rate / (12 * 100)
-        
-        # Total number of months
-        months = loan_term * 12
-        
         # Calculate EMI
-        emi = loan_amount * monthly_rate * (1 + monthly_rate)**months / ((1 + monthly_rate)**months - 1)
+        emi = float(finance.emi(loan_amount, interest_rate, loan_term))
         
         # Calculate total payment and interest
-        total_payment = emi * months
+        total_payment = emi * loan_term * 12
         total_interest = total_payment - loan_amount
         
         with col2:
@@ -36,23 +31,15 @@ def main():
             st.warning(f"Total Payment: ₹{total_payment:,.2f}")
             
             # Create amortization schedule
-            payment_data = []
-            remaining_balance = loan_amount
-            
-            for month in range(1, months + 1):
-                interest_payment = remaining_balance * monthly_rate
-                principal_payment = emi - interest_payment
-                remaining_balance -= principal_payment
-                
-                payment_data.append({
-                    'Month': month,
-                    'Principal': principal_payment,
-                    'Interest': interest_payment,
-                    'Balance': remaining_balance
-                })
+            schedule = finance.amortization_schedule(loan_amount, interest_rate, loan_term)
             
             # Create visualization
-            df = pd.DataFrame(payment_data)
+            df = pd.DataFrame({
+                'Month': schedule["month"],
+                'Principal': schedule["principal"],
+                'Interest': schedule["interest"],
+                'Balance': schedule["balance"]
+            })
             fig = go.Figure()
             fig.add_trace(go.Scatter(x=df['Month'], y=df['Balance'],
                                    name='Remaining Balance',
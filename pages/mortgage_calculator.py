@@ -1,39 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import numpy as np
-
-def calculate_mortgage_payment(principal, annual_rate, years):
-    monthly_rate = annual_rate / (12 * 100)
-    months = years * 12
-    
-    if monthly_rate == 0:
-        monthly_payment = principal / months
-    else:
-        monthly_payment = principal * (monthly_rate * (1 + monthly_rate)**months) / ((1 + monthly_rate)**months - 1)
-    
-    return monthly_payment
-
-def calculate_affordability(monthly_income, other_debts=0, down_payment=0, annual_rate=8.0, years=20):
-    # Using the 28/36 rule
-    max_mortgage_payment = monthly_income * 0.28
-    max_total_debt_payment = monthly_income * 0.36 - other_debts
-    
-    # Use the lower of the two values
-    max_payment = min(max_mortgage_payment, max_total_debt_payment)
-    
-    # Calculate maximum affordable loan
-    monthly_rate = annual_rate / (12 * 100)
-    months = years * 12
-    
-    if monthly_rate == 0:
-        max_loan = max_payment * months
-    else:
-        max_loan = max_payment * ((1 - (1 + monthly_rate)**(-months)) / monthly_rate)
-    
-    max_home_price = max_loan + down_payment
-    
-    return max_home_price, max_loan, max_payment
+from utilitycalc import finance
 
 def main():
     st.set_page_config(page_title="Mortgage Calculator", page_icon="🏠", layout="wide")
@@ -59,9 +27,9 @@ def main():
             years = st.number_input("Loan Term (Years)", min_value=5, max_value=30, value=20)
             
             if st.button("Calculate Affordability"):
-                max_price, max_loan, max_payment = calculate_affordability(
+                max_price, max_loan, max_payment = (float(v) for v in finance.affordability(
                     monthly_income, other_debts, down_payment, annual_rate, years
-                )
+                ))
                 
                 with col2:
                     st.markdown("### 📊 Affordability Analysis")
@@ -70,7 +38,7 @@ def main():
                     st.warning(f"Maximum Monthly Payment: ₹{max_payment:,.2f}")
                     
                     # Create payment breakdown
-                    monthly_payment = calculate_mortgage_payment(max_loan, annual_rate, years)
+                    monthly_payment = float(finance.emi(max_loan, annual_rate, years))
                     total_payment = monthly_payment * years * 12
                     total_interest = total_payment - max_loan
                     
@@ -85,30 +53,14 @@ def main():
                     
                     # Amortization schedule
                     st.markdown("### 📅 Amortization Schedule")
-                    balance = max_loan
-                    monthly_rate = annual_rate / (12 * 100)
-                    schedule_data = []
-                    
-                    for year in range(1, years + 1):
-                        yearly_principal = 0
-                        yearly_interest = 0
-                        
-                        for month in range(12):
-                            interest_payment = balance * monthly_rate
-                            principal_payment = monthly_payment - interest_payment
-                            balance -= principal_payment
-                            
-                            yearly_principal += principal_payment
-                            yearly_interest += interest_payment
-                        
-                        schedule_data.append({
-                            'Year': year,
-                            'Principal': yearly_principal,
-                            'Interest': yearly_interest,
-                            'Remaining Balance': balance
-                        })
-                    
-                    schedule_df = pd.DataFrame(schedule_data)
+                    schedule = finance.yearly_amortization(max_loan, annual_rate, years)
+                    
+                    schedule_df = pd.DataFrame({
+                        'Year': schedule["year"],
+                        'Principal': schedule["principal"],
+                        'Interest': schedule["interest"],
+                        'Remaining Balance': schedule["balance"]
+                    })
                     st.dataframe(
                         schedule_df.style.format({
                             'Principal': '₹{:,.2f}',
@@ -135,41 +87,21 @@ def main():
             analysis_years = st.slider("Analysis Period (Years)", 5, 30, 10)
             
             if st.button("Compare Rent vs Buy"):
-                # Calculate buying costs
-                monthly_payment = calculate_mortgage_payment(
-                    home_price - down_payment, annual_rate, years
+                # Calculate yearly buying and renting costs
+                comparison = finance.rent_vs_buy(
+                    home_price, down_payment, monthly_rent, annual_rate, years,
+                    home_appreciation, rent_increase, property_tax_rate, maintenance_percent,
+                    analysis_years
                 )
-                
-                buy_costs = []
-                rent_costs = []
-                home_values = []
-                
-                current_home_value = home_price
-                current_rent = monthly_rent
-                
-                for year in range(1, analysis_years + 1):
-                    # Buying costs
-                    yearly_mortgage = monthly_payment * 12
-                    property_tax = current_home_value * property_tax_rate / 100
-                    maintenance = current_home_value * maintenance_percent / 100
-                    
-                    total_buy_cost = yearly_mortgage + property_tax + maintenance
-                    buy_costs.append(total_buy_cost)
-                    
-                    # Home appreciation
-                    current_home_value *= (1 + home_appreciation / 100)
-                    home_values.append(current_home_value)
-                    
-                    # Renting costs
-                    yearly_rent = current_rent * 12
-                    rent_costs.append(yearly_rent)
-                    current_rent *= (1 + rent_increase / 100)
+                buy_costs = comparison["buy_costs"]
+                rent_costs = comparison["rent_costs"]
+                home_values = comparison["home_values"]
                 
                 with col2:
                     st.markdown("### 📊 Cost Comparison")
                     
                     # Create comparison chart
-                    years = list(range(1, analysis_years + 1))
+                    years = comparison["year"]
                     
                     fig = go.Figure()
                     fig.add_trace(go.Scatter(
@@ -202,12 +134,8 @@ def main():
                     st.success(f"Estimated Home Value after {analysis_years} years: ₹{final_home_value:,.2f}")
                     
                     # Break-even analysis
-                    cumulative_buy = np.cumsum(buy_costs)
-                    cumulative_rent = np.cumsum(rent_costs)
-                    break_even_year = np.where(cumulative_rent > cumulative_buy)[0]
-                    
-                    if len(break_even_year) > 0:
-                        st.success(f"Break-even Point: Year {break_even_year[0] + 1}")
+                    if comparison["break_even_year"] is not None:
+                        st.success(f"Break-even Point: Year {comparison['break_even_year']}")
                     else:
                         st.error("No break-even point within the analysis period")
                     
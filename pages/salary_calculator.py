@@ -1,40 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-
-def calculate_tax_old_regime(taxable_income):
-    tax = 0
-    if taxable_income <= 250000:
-        tax = 0
-    elif taxable_income <= 500000:
-        tax = (taxable_income - 250000) * 0.05
-    elif taxable_income <= 750000:
-        tax = 12500 + (taxable_income - 500000) * 0.10
-    elif taxable_income <= 1000000:
-        tax = 37500 + (taxable_income - 750000) * 0.15
-    elif taxable_income <= 1250000:
-        tax = 75000 + (taxable_income - 1000000) * 0.20
-    elif taxable_income <= 1500000:
-        tax = 125000 + (taxable_income - 1250000) * 0.25
-    else:
-        tax = 187500 + (taxable_income - 1500000) * 0.30
-    return tax
-
-def calculate_tax_new_regime(taxable_income):
-    tax = 0
-    if taxable_income <= 300000:
-        tax = 0
-    elif taxable_income <= 600000:
-        tax = (taxable_income - 300000) * 0.05
-    elif taxable_income <= 900000:
-        tax = 15000 + (taxable_income - 600000) * 0.10
-    elif taxable_income <= 1200000:
-        tax = 45000 + (taxable_income - 900000) * 0.15
-    elif taxable_income <= 1500000:
-        tax = 90000 + (taxable_income - 1200000) * 0.20
-    else:
-        tax = 150000 + (taxable_income - 1500000) * 0.30
-    return tax
+from utilitycalc import finance
 
 def main():
     st.set_page_config(page_title="Salary Calculator", page_icon="💰", layout="wide")
@@ -59,26 +26,20 @@ def main():
             medical_insurance = st.number_input("Medical Insurance Premium (80D) (₹)", min_value=0, value=0)
             home_loan_interest = st.number_input("Home Loan Interest (80EE) (₹)", min_value=0, value=0)
             
-            total_deductions = min(epf + insurance + elss, 150000) + medical_insurance + home_loan_interest
+            total_deductions = finance.old_regime_deductions(epf, insurance, elss, medical_insurance,
+                                                             home_loan_interest)
         else:
             total_deductions = 0
         
     if st.button("Calculate Tax"):
-        # Calculate taxable income
-        taxable_income = annual_salary - total_deductions
-        
-        # Calculate tax based on regime
-        if regime == "Old Regime":
-            tax = calculate_tax_old_regime(taxable_income)
-        else:
-            tax = calculate_tax_new_regime(taxable_income)
-        
-        # Calculate cess
-        cess = tax * 0.04
-        total_tax = tax + cess
-        
-        # Calculate monthly take-home
-        monthly_salary = (annual_salary - total_tax) / 12
+        # Calculate tax based on regime, plus cess and monthly take-home
+        breakdown = {key: float(value) for key, value in
+                     finance.salary_breakdown(annual_salary, total_deductions, regime).items()}
+        taxable_income = breakdown["taxable_income"]
+        tax = breakdown["tax"]
+        cess = breakdown["cess"]
+        total_tax = breakdown["total_tax"]
+        monthly_salary = breakdown["monthly_take_home"]
         
         with col2:
             st.markdown("### 📊 Tax Calculation Summary")
@@ -3,25 +3,14 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from datetime import datetime, timedelta
-import json
-import os
-
-def load_sleep_data():
-    if os.path.exists('sleep_data.json'):
-        with open('sleep_data.json', 'r') as f:
-            return json.load(f)
-    return []
-
-def save_sleep_data(data):
-    with open('sleep_data.json', 'w') as f:
-        json.dump(data, f)
-
-def calculate_sleep_debt(sleep_hours, recommended_hours=8):
-    return max(0, recommended_hours - sleep_hours)
-
-def calculate_recovery_plan(total_debt, max_extra_sleep=2):
-    days_needed = total_debt / max_extra_sleep
-    return round(days_needed)
+from utilitycalc.sleep import (
+    add_sleep_records, build_recovery_calendar, calculate_sleep_debt, circular_std_minutes,
+    detect_sleep_episodes, episodes_to_records, hourly_sleep_probability, load_sleep_data,
+    load_sleep_stats, load_wearable_csv, mean_bedtime, mean_wake_time, most_common_quality,
+    most_common_time, nightly_totals, plan_recovery_schedule, recent_durations,
+    recovery_days_needed, regularity_index, sleep_duration_std, social_jetlag_hours, TREND_DAYS
+)
+from utilitycalc.storage import user_store
 
 def main():
     st.set_page_config(page_title="Sleep Debt Calculator", page_icon="😴", layout="wide")
@@ -31,7 +20,9 @@ def main():
     
     # Initialize session state
     if 'sleep_data' not in st.session_state:
-        st.session_state.sleep_data = load_sleep_data()
+        st.session_state.sleep_data = load_sleep_data(user_store())
+    if 'sleep_stats' not in st.session_state:
+        st.session_state.sleep_stats = load_sleep_stats(st.session_state.sleep_data, user_store())
     
     tab1, tab2, tab3 = st.tabs(["Track Sleep", "Sleep Analysis", "Recovery Plan"])
     
@@ -66,39 +57,71 @@ def main():
                     "quality": sleep_quality
                 }
                 
-                st.session_state.sleep_data.append(sleep_record)
-                save_sleep_data(st.session_state.sleep_data)
+                add_sleep_records(st.session_state.sleep_data, st.session_state.sleep_stats,
+                                  [sleep_record], user_store())
                 st.success("Sleep record added!")
+        
+        with col2:
+            st.markdown("### ⌚ Import Wearable Data")
+            st.write("Upload minute-level CSV exports with timestamp, heart_rate and movement columns")
+            uploads = st.file_uploader("Wearable Exports", type=["csv"], accept_multiple_files=True)
+            
+            if uploads and st.button("Import Sleep Episodes"):
+                existing = {(r['date'], r['sleep_time']) for r in st.session_state.sleep_data}
+                imported = []
+                for upload in uploads:
+                    try:
+                        episodes = detect_sleep_episodes(load_wearable_csv(upload))
+                    except ValueError as e:
+                        st.error(f"{upload.name}: {str(e)}")
+                        continue
+                    for record in episodes_to_records(episodes):
+                        if (record['date'], record['sleep_time']) not in existing:
+                            existing.add((record['date'], record['sleep_time']))
+                            imported.append(record)
+                
+                imported.sort(key=lambda r: (r['date'], r['sleep_time']))
+                add_sleep_records(st.session_state.sleep_data, st.session_state.sleep_stats,
+                                  imported, user_store())
+                st.success(f"Imported {len(imported)} sleep episodes!")
+                
+                if imported:
+                    st.dataframe(pd.DataFrame(imported)[
+                        ['date', 'sleep_time', 'wake_time', 'duration', 'awakenings', 'efficiency']
+                    ].style.format({'duration': '{:.1f} hrs', 'efficiency': '{:.0%}'}))
     
     # Sleep Analysis Tab
     with tab2:
         if st.session_state.sleep_data:
-            df = pd.DataFrame(st.session_state.sleep_data)
-            df['date'] = pd.to_datetime(df['date'])
+            stats = st.session_state.sleep_stats
             
             col1, col2 = st.columns(2)
             
             with col1:
-                # Sleep duration trend
-                fig1 = px.line(df, x='date', y='duration',
-                             title='Sleep Duration Trend')
+                # Sleep duration trend over the nights kept in the stats
+                dates, hours_slept = nightly_totals(stats)
+                fig1 = px.line(x=pd.to_datetime(dates), y=hours_slept,
+                             title=f'Sleep Duration Trend (last {TREND_DAYS} days)',
+                             labels={'x': 'date', 'y': 'duration'})
                 fig1.add_hline(y=8, line_dash="dash", 
                              annotation_text="Recommended")
                 st.plotly_chart(fig1)
                 
-                # Calculate statistics
-                avg_duration = df['duration'].mean()
-                total_debt = sum([calculate_sleep_debt(hrs) for hrs in df['duration']])
-                quality_counts = df['quality'].value_counts()
+                # Statistics come from the running aggregates
+                avg_duration = stats['mean']
+                total_debt = stats['total_debt']
+                quality_counts = stats['quality_counts']
                 
                 st.markdown("### 📊 Sleep Statistics")
                 st.info(f"Average Sleep Duration: {avg_duration:.1f} hours")
+                st.warning(f"Sleep Debt (last 7 nights): {stats['rolling_debt']['7']:.1f} hours")
+                st.warning(f"Sleep Debt (last 30 nights): {stats['rolling_debt']['30']:.1f} hours")
                 st.warning(f"Total Sleep Debt: {total_debt:.1f} hours")
                 
                 # Quality distribution
                 fig2 = go.Figure(data=[go.Pie(
-                    labels=quality_counts.index,
-                    values=quality_counts.values,
+                    labels=list(quality_counts.keys()),
+                    values=list(quality_counts.values()),
                     hole=.3
                 )])
                 fig2.update_layout(title="Sleep Quality Distribution")
@@ -107,22 +130,17 @@ def main():
             with col2:
                 # Sleep timing pattern
                 st.markdown("### ⏰ Sleep Timing Pattern")
-                df['sleep_hour'] = pd.to_datetime(df['sleep_time']).dt.hour
-                df['wake_hour'] = pd.to_datetime(df['wake_time']).dt.hour
-                
-                avg_sleep_hour = df['sleep_hour'].mean()
-                avg_wake_hour = df['wake_hour'].mean()
+                timing = stats['timing']
                 
-                # Create 24-hour clock visualization
+                # Create 24-hour clock visualization from the asleep histogram
                 hours = list(range(24))
-                values = [1 if h >= avg_sleep_hour or h <= avg_wake_hour else 0 
-                         for h in hours]
+                values = hourly_sleep_probability(timing, stats['count'])
                 
                 fig3 = go.Figure(data=[go.Barpolar(
                     r=values,
-                    theta=hours,
-                    width=ones,
-                    marker_color=["#1f77b4" if v else "#lightgray" for v in values]
+                    theta=[h * 15 for h in hours],
+                    width=[15] * len(hours),
+                    marker_color=["#1f77b4" if v >= 0.5 else "lightgray" for v in values]
                 )])
                 fig3.update_layout(
                     title="Average Sleep-Wake Pattern",
@@ -130,7 +148,7 @@ def main():
                         radialaxis=dict(visible=False, range=[0, 1]),
                         angularaxis=dict(
                             ticktext=[f"{h:02d}:00" for h in hours],
-                            tickvals=hours,
+                            tickvals=[h * 15 for h in hours],
                             direction="clockwise"
                         )
                     )
@@ -138,7 +156,16 @@ def main():
                 st.plotly_chart(fig3)
                 
                 # Sleep consistency
-                sleep_std = df['duration'].std()
+                sleep_std = sleep_duration_std(stats)
+                st.info(f"Average Bedtime: {mean_bedtime(stats)}")
+                st.info(f"Average Wake Time: {mean_wake_time(stats)}")
+                bedtime_spread = circular_std_minutes(timing['bedtime'])
+                if bedtime_spread is not None:
+                    st.info(f"Bedtime Variability: ±{bedtime_spread:.0f} minutes")
+                st.info(f"Sleep Regularity Index: {regularity_index(timing):.0f}/100")
+                jetlag = social_jetlag_hours(timing)
+                if jetlag is not None:
+                    st.warning(f"Social Jetlag: {jetlag:.1f} hours")
                 st.info(f"Sleep Consistency (lower is better): {sleep_std:.1f} hours")
         else:
             st.write("Add some sleep records to see the analysis!")
@@ -152,14 +179,38 @@ def main():
         with col1:
             target_sleep = st.number_input("Target Sleep Hours", min_value=6.0, max_value=10.0, value=8.0)
             max_extra_sleep = st.number_input("Maximum Extra Sleep per Day", min_value=0.5, max_value=4.0, value=2.0)
+            plan_start = st.date_input("Plan Start Date", key="plan_start")
+            horizon_weeks = st.number_input("Planning Horizon (weeks)", min_value=1, max_value=12, value=2)
+            
+            # Per-day constraints, editable for shift rotations
+            st.markdown("#### 📅 Sleep Constraints")
+            calendar = st.data_editor(
+                pd.DataFrame(build_recovery_calendar(plan_start, int(horizon_weeks) * 7)),
+                disabled=["Date"],
+                key="recovery_calendar"
+            )
             
             if st.session_state.sleep_data:
-                df = pd.DataFrame(st.session_state.sleep_data)
-                recent_avg = df['duration'].tail(7).mean()
+                stats = st.session_state.sleep_stats
+                last_week = recent_durations(stats, 7)
+                recent_avg = sum(last_week) / len(last_week)
                 total_debt = sum([calculate_sleep_debt(hrs, target_sleep) 
-                                for hrs in df['duration'].tail(7)])
+                                for hrs in last_week])
                 
-                days_needed = calculate_recovery_plan(total_debt, max_extra_sleep)
+                try:
+                    schedule_df = plan_recovery_schedule(
+                        total_debt,
+                        calendar["Earliest Bedtime"],
+                        calendar["Latest Wake"],
+                        calendar["Commitments (hrs)"],
+                        target_sleep,
+                        max_extra_sleep
+                    )
+                except ValueError:
+                    st.error("Use HH:MM for bedtimes and wake times")
+                    st.stop()
+                schedule_df.insert(1, "Date", calendar["Date"].to_numpy())
+                days_needed = recovery_days_needed(schedule_df)
                 
                 with col2:
                     st.markdown("### 📋 Recovery Summary")
@@ -167,24 +218,17 @@ def main():
                     st.warning(f"Current Sleep Debt: {total_debt:.1f} hours")
                     
                     if total_debt > 0:
-                        st.error(f"Days needed for recovery: {days_needed} days")
-                        
-                        # Create recovery schedule
-                        schedule = []
-                        remaining_debt = total_debt
-                        for day in range(days_needed):
-                            extra_sleep = min(max_extra_sleep, remaining_debt)
-                            schedule.append({
-                                'Day': day + 1,
-                                'Extra Sleep Needed': extra_sleep,
-                                'Total Sleep Target': target_sleep + extra_sleep
-                            })
-                            remaining_debt -= extra_sleep
+                        if days_needed is not None:
+                            st.error(f"Days needed for recovery: {days_needed} days")
+                            schedule_df = schedule_df.head(days_needed)
+                        else:
+                            st.error("Sleep debt can't be cleared within this horizon")
                         
-                        schedule_df = pd.DataFrame(schedule)
                         st.dataframe(schedule_df.style.format({
-                            'Extra Sleep Needed': '{:.1f} hrs',
-                            'Total Sleep Target': '{:.1f} hrs'
+                            'Sleep Opportunity': '{:.1f} hrs',
+                            'Planned Sleep': '{:.1f} hrs',
+                            'Extra Sleep': '{:.1f} hrs',
+                            'Remaining Debt': '{:.1f} hrs'
                         }))
                     else:
                         st.success("No sleep debt to recover from!")
@@ -193,13 +237,14 @@ def main():
                 st.markdown("### 💡 Personalized Sleep Tips")
                 tips = [
                     "- Maintain a consistent sleep schedule, even on weekends",
-                    f"- Aim to sleep by {df['sleep_time'].mode()[0]} and wake up by {df['wake_time'].mode()[0]}",
+                    f"- Aim to sleep by {most_common_time(stats['timing']['bedtime'])} "
+                    f"and wake up by {most_common_time(stats['timing']['wake'])}",
                     "- Create a relaxing bedtime routine"
                 ]
                 
                 if recent_avg < 7:
                     tips.append("- Prioritize sleep by going to bed earlier")
-                if df['quality'].value_counts().index[0] != "Excellent":
+                if most_common_quality(stats) != "Excellent":
                     tips.append("- Improve sleep environment (temperature, darkness, noise)")
                 
                 st.write("\n".join(tips))
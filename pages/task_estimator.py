@@ -1,57 +1,31 @@
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
-import json
-import os
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime
+from utilitycalc.tasks import (
+    add_task, add_to_text_index, completion_date, EXPERIENCE_LEVELS, load_task_model,
+    load_task_store, load_text_index, parse_dependencies, predict_task_times, save_task_model,
+    save_text_index, similar_tasks, simulate_project, TASK_COMPLEXITIES, task_model_retrain, task_page,
+    task_row, task_summary, TASK_TYPES, update_task, update_task_model
+)
+from utilitycalc.storage import user_store
 
-def load_tasks():
-    if os.path.exists('tasks_history.json'):
-        with open('tasks_history.json', 'r') as f:
-            return json.load(f)
-    return []
+def get_text_index():
+    if 'text_index' not in st.session_state:
+        st.session_state.text_index = load_text_index(st.session_state.task_store, user_store())
+    return st.session_state.text_index
 
-def save_tasks(tasks):
-    with open('tasks_history.json', 'w') as f:
-        json.dump(tasks, f)
-
-def estimate_time(complexity, task_type, experience_level):
-    # Base time in hours for different complexity levels
-    base_times = {
-        "Low": 1,
-        "Medium": 3,
-        "High": 8,
-        "Very High": 16
-    }
-    
-    # Multipliers for different task types
-    type_multipliers = {
-        "Development": 1.0,
-        "Design": 0.8,
-        "Documentation": 0.6,
-        "Testing": 0.7,
-        "Research": 1.2,
-        "Planning": 0.5
-    }
-    
-    # Experience level adjustments
-    experience_multipliers = {
-        "Beginner": 1.5,
-        "Intermediate": 1.0,
-        "Expert": 0.7
-    }
-    
-    base_time = base_times[complexity]
-    type_mult = type_multipliers[task_type]
-    exp_mult = experience_multipliers[experience_level]
-    
-    estimated_time = base_time * type_mult * exp_mult
-    
-    # Add some variance (±20%)
-    min_time = estimated_time * 0.8
-    max_time = estimated_time * 1.2
-    
-    return min_time, estimated_time, max_time
+def get_task_model():
+    # Loaded on first use and never trained inline; a model retrained in the
+    # background replaces the session's copy once it is ready
+    if 'task_model' not in st.session_state:
+        st.session_state.task_model = load_task_model(st.session_state.task_store, user_store())
+    retrain = task_model_retrain(user_store())
+    if (retrain is not None and retrain.done() and retrain.exception() is None
+            and retrain.result()["version"] > st.session_state.task_model["version"]):
+        st.session_state.task_model = retrain.result()
+    return st.session_state.task_model
 
 def main():
     st.set_page_config(page_title="Task Time Estimator", page_icon="⏱️", layout="wide")
@@ -59,12 +33,13 @@ def main():
     st.title("⏱️ AI-Based Task Time Estimator")
     st.write("Estimate task completion time based on complexity and other factors")
     
-    # Initialize session state
-    if 'tasks' not in st.session_state:
-        st.session_state.tasks = load_tasks()
+    # Initialize session state; rows are read from the column store a page at a time
+    if 'task_store' not in st.session_state:
+        st.session_state.task_store = load_task_store(user_store())
+    store = st.session_state.task_store
     
     # Main content
-    tab1, tab2, tab3 = st.tabs(["Estimate Task", "Task History", "Analysis"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Estimate Task", "Task History", "Analysis", "Project Simulation"])
     
     # Estimate Task Tab
     with tab1:
@@ -75,23 +50,53 @@ def main():
             task_description = st.text_area("Task Description")
             complexity = st.select_slider(
                 "Task Complexity",
-                options=["Low", "Medium", "High", "Very High"],
+                options=TASK_COMPLEXITIES,
                 value="Medium"
             )
             task_type = st.selectbox(
                 "Task Type",
-                ["Development", "Design", "Documentation", "Testing", "Research", "Planning"]
+                TASK_TYPES
             )
             experience_level = st.select_slider(
                 "Experience Level",
-                options=["Beginner", "Intermediate", "Expert"],
+                options=EXPERIENCE_LEVELS,
                 value="Intermediate"
             )
             
+            # Analogous past tasks for whatever has been typed so far
+            query = f"{task_name} {task_description}"
+            if query.strip() and store["count"]:
+                matches = similar_tasks(get_text_index(), query)
+                if matches:
+                    st.markdown("#### 🔎 Similar Past Tasks")
+                    for position, score in matches:
+                        past = task_row(store, position)
+                        hours = past.get('actual_time')
+                        hours_text = f"{hours:.1f} hrs actual" if hours else f"{past['estimated_time']:.1f} hrs estimated"
+                        st.write(f"- {past['name'] or 'Untitled'}: {hours_text} ({score:.0%} match)")
+            
             if st.button("Estimate Time"):
-                min_time, estimated_time, max_time = estimate_time(
-                    complexity, task_type, experience_level
-                )
+                task = {
+                    "name": task_name,
+                    "description": task_description,
+                    "complexity": complexity,
+                    "type": task_type,
+                    "experience_level": experience_level
+                }
+                low, expected, high = predict_task_times(get_task_model(), [task])
+                task.update({
+                    "estimated_time": float(expected[0]),
+                    "min_time": float(low[0]),
+                    "max_time": float(high[0])
+                })
+                st.session_state.last_estimate = task
+            
+            # Keep the last estimate across reruns so it can be saved
+            if 'last_estimate' in st.session_state:
+                estimate = st.session_state.last_estimate
+                min_time = estimate['min_time']
+                estimated_time = estimate['estimated_time']
+                max_time = estimate['max_time']
                 
                 with col2:
                     st.markdown("### 📊 Time Estimate")
@@ -125,45 +130,67 @@ def main():
                     
                     # Save task
                     if st.button("Save Estimate"):
-                        task = {
-                            "name": task_name,
-                            "description": task_description,
-                            "complexity": complexity,
-                            "type": task_type,
-                            "experience_level": experience_level,
-                            "estimated_time": estimated_time,
-                            "min_time": min_time,
-                            "max_time": max_time,
-                            "date": datetime.now().strftime("%Y-%m-%d")
-                        }
-                        st.session_state.tasks.append(task)
-                        save_tasks(st.session_state.tasks)
+                        task = dict(estimate, date=datetime.now().strftime("%Y-%m-%d"))
+                        add_task(store, task, user_store())
+                        save_text_index(add_to_text_index(get_text_index(), [task]), user_store())
+                        del st.session_state.last_estimate
                         st.success("Task estimate saved!")
     
     # Task History Tab
     with tab2:
-        if st.session_state.tasks:
-            df = pd.DataFrame(st.session_state.tasks)
-            st.dataframe(
-                df.style.format({
-                    'estimated_time': '{:.1f} hrs',
-                    'min_time': '{:.1f} hrs',
-                    'max_time': '{:.1f} hrs'
-                })
-            )
+        if store["count"]:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                type_filter = st.multiselect("Filter by Type", TASK_TYPES)
+            with col2:
+                complexity_filter = st.multiselect("Filter by Complexity", TASK_COMPLEXITIES)
+            with col3:
+                page_size = st.selectbox("Rows per Page", [25, 50, 100])
+            
+            filters = {"type": type_filter, "complexity": complexity_filter}
+            _, _, total_matches = task_page(store, 0, 1, filters)
+            page_count = max(1, -(-total_matches // page_size))
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+            
+            # Only the visible page is materialized, already formatted
+            positions, page_df, _ = task_page(store, page - 1, page_size, filters)
+            st.dataframe(page_df)
+            st.caption(f"{total_matches} matching tasks")
+            
+            # Log actual time and update the model with that one task
+            columns = store["columns"]
+            pending = [i for i in positions if not columns["actual_time"][i]]
+            if pending:
+                st.markdown("### ✅ Log Actual Time")
+                task_index = st.selectbox(
+                    "Completed Task",
+                    pending,
+                    format_func=lambda i: f"{columns['name'][i] or 'Untitled'} ({columns['date'][i]})"
+                )
+                actual_time = st.number_input("Actual Time (hours)", min_value=0.1, value=1.0)
+                
+                if st.button("Save Actual Time"):
+                    update_task(store, task_index, {"actual_time": actual_time}, user_store())
+                    task = task_row(store, task_index)
+                    model = update_task_model(get_task_model(), [task], store["training_version"])
+                    save_task_model(model, user_store())
+                    st.success("Actual time saved and model updated!")
         else:
             st.write("No task history available.")
     
     # Analysis Tab
     with tab3:
-        if st.session_state.tasks:
-            df = pd.DataFrame(st.session_state.tasks)
+        if store["count"]:
+            # Running totals per type and complexity, so no rows are read here
+            by_type = task_summary(store, "type")
+            by_complexity = task_summary(store, "complexity")
             
             col1, col2 = st.columns(2)
             
             with col1:
                 # Average time by complexity
-                avg_by_complexity = df.groupby('complexity')['estimated_time'].mean()
+                avg_by_complexity = pd.Series({value: hours / count for value, (count, hours)
+                                               in sorted(by_complexity.items())})
                 fig1 = go.Figure(data=[go.Bar(
                     x=avg_by_complexity.index,
                     y=avg_by_complexity.values,
@@ -178,7 +205,7 @@ def main():
             
             with col2:
                 # Average time by task type
-                avg_by_type = df.groupby('type')['estimated_time'].mean()
+                avg_by_type = pd.Series({value: hours / count for value, (count, hours) in sorted(by_type.items())})
                 fig2 = go.Figure(data=[go.Bar(
                     x=avg_by_type.index,
                     y=avg_by_type.values,
@@ -193,29 +220,86 @@ def main():
             
             # Insights
             st.markdown("### 💡 Task Insights")
-            total_tasks = len(df)
-            total_hours = df['estimated_time'].sum()
-            avg_task_time = df['estimated_time'].mean()
+            total_tasks = store["count"]
+            total_hours = sum(hours for _, hours in by_type.values())
+            avg_task_time = total_hours / total_tasks
             
             st.info(f"Total Tasks: {total_tasks}")
             st.success(f"Total Estimated Hours: {total_hours:.1f}")
             st.warning(f"Average Task Time: {avg_task_time:.1f} hours")
             
             # Most common task type
-            most_common_type = df['type'].mode()[0]
+            most_common_type = min(by_type, key=lambda value: (-by_type[value][0], value))
             st.write(f"Most common task type: {most_common_type}")
             
             # Time distribution
             st.markdown("### ⏰ Time Distribution")
             fig3 = go.Figure(data=[go.Pie(
-                labels=df['type'],
-                values=df['estimated_time'],
+                labels=list(by_type),
+                values=[hours for _, hours in by_type.values()],
                 hole=.3
             )])
             fig3.update_layout(title="Time Distribution by Task Type")
             st.plotly_chart(fig3)
         else:
             st.write("Add some tasks to see the analysis!")
+    
+    # Project Simulation Tab
+    with tab4:
+        st.markdown("### 🗺️ Project Schedule Simulation")
+        st.write("List tasks with three-point estimates and the IDs of tasks they depend on")
+        
+        project = st.data_editor(
+            pd.DataFrame([
+                {"ID": "A", "Task": "Planning", "Optimistic": 4.0, "Most Likely": 6.0, "Pessimistic": 10.0, "Depends On": ""},
+                {"ID": "B", "Task": "Design", "Optimistic": 8.0, "Most Likely": 12.0, "Pessimistic": 20.0, "Depends On": "A"},
+                {"ID": "C", "Task": "Development", "Optimistic": 16.0, "Most Likely": 24.0, "Pessimistic": 40.0, "Depends On": "B"},
+                {"ID": "D", "Task": "Documentation", "Optimistic": 4.0, "Most Likely": 6.0, "Pessimistic": 12.0, "Depends On": "B"},
+                {"ID": "E", "Task": "Testing", "Optimistic": 6.0, "Most Likely": 8.0, "Pessimistic": 16.0, "Depends On": "C, D"}
+            ]),
+            num_rows="dynamic",
+            key="project_tasks"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            project_start = st.date_input("Project Start Date")
+            hours_per_day = st.number_input("Working Hours per Day", min_value=1.0, max_value=24.0, value=8.0)
+            trials = st.number_input("Simulation Trials", min_value=1000, max_value=200000, value=50000, step=1000)
+        
+        if st.button("Run Simulation"):
+            # Blank rows the editor adds are skipped; anything else incomplete is
+            # rejected by simulate_project before any result is shown
+            project = project[project["ID"].notna() & (project["ID"].astype(str).str.strip() != "")]
+            try:
+                finish, criticality = simulate_project(
+                    [str(task_id).strip() for task_id in project["ID"]],
+                    project["Optimistic"].to_numpy(dtype=float),
+                    project["Most Likely"].to_numpy(dtype=float),
+                    project["Pessimistic"].to_numpy(dtype=float),
+                    [parse_dependencies(deps) for deps in project["Depends On"]],
+                    trials=int(trials)
+                )
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            
+            with col2:
+                st.markdown("### 📅 Completion Forecast")
+                for label, q in [("50%", 50), ("80%", 80), ("95%", 95)]:
+                    hours = float(np.percentile(finish, q))
+                    st.info(f"{label} confidence: {hours:.1f} hours, "
+                            f"done by {completion_date(project_start, hours, hours_per_day):%Y-%m-%d}")
+            
+            fig = go.Figure(data=[go.Histogram(x=finish, nbinsx=50)])
+            fig.update_layout(title="Project Duration Distribution", xaxis_title="Hours", yaxis_title="Trials")
+            st.plotly_chart(fig)
+            
+            st.markdown("### 🔥 Criticality Index")
+            st.dataframe(pd.DataFrame({
+                "Task": project["Task"].to_numpy(),
+                "Criticality": criticality
+            }).sort_values("Criticality", ascending=False).style.format({'Criticality': '{:.0%}'}))
 
 if __name__ == "__main__":
     main()
@@ -2,25 +2,797 @@ import pytest
 import sys
 import os
 
-# Add src to Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+# Add the project root to Python path so utilitycalc and pages import
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 def test_loan_emi_calculation():
-    # TODO: Add test cases for loan EMI calculator
-    pass
+    import numpy as np
+    from utilitycalc import finance
+    assert np.allclose(finance.emi([100000, 120000], [10.0, 0.0], [5, 1]), [2124.70, 10000], atol=0.01)
+    schedule = finance.amortization_schedule(100000, 10.0, 5)
+    assert len(schedule["month"]) == 60 and np.isclose(schedule["interest"][0], 100000 * 10 / 1200)
+    assert np.isclose(schedule["principal"].sum(), 100000) and np.isclose(schedule["balance"][-1], 0, atol=1e-6)
+    yearly = finance.yearly_amortization(100000, 10.0, 5)
+    assert np.isclose(yearly["interest"].sum(), schedule["interest"].sum())
+    assert np.isclose(yearly["balance"][0], schedule["balance"][11])
+    assert np.allclose(finance.income_tax([240000, 1000000, 2000000], "Old Regime"), [0, 75000, 337500])
+    assert np.allclose(finance.income_tax([600000, 2000000], "New Regime"), [15000, 300000])
+    breakdown = finance.salary_breakdown(1000000, finance.old_regime_deductions(100000, 80000), "Old Regime")
+    assert breakdown["taxable_income"] == 850000 and np.isclose(breakdown["total_tax"], 52500 * 1.04)
 
 def test_investment_growth():
-    # TODO: Add test cases for investment calculator
-    pass
+    import numpy as np
+    from utilitycalc import finance
+    rate = 8 / 1200
+    expected = 10000 * (1 + rate) ** 120 + 1000 * ((1 + rate) ** 120 - 1) / rate
+    assert np.isclose(finance.future_value(10000, 1000, 8.0, 10), expected)
+    assert np.allclose(finance.future_value(10000, 1000, 0.0, [0, 1, 2]), [10000, 22000, 34000])
+    comparison = finance.rent_vs_buy(1000000, 200000, 8000, 0.0, 10, 0, 10, 1.0, 1.0, 10)
+    assert np.allclose(comparison["buy_costs"], 80000 + 20000)
+    assert comparison["break_even_year"] == 2 and np.isclose(comparison["rent_costs"][1], 105600)
 
 def test_bmi_calculation():
-    # TODO: Add test cases for BMI calculator
-    pass
+    import numpy as np
+    from utilitycalc import health
+    bmi = health.bmi(np.array([50, 70, 85, 110]), np.array([170, 170, 170, 170]))
+    assert np.allclose(bmi, [17.30, 24.22, 29.41, 38.06], atol=0.01)
+    assert list(health.bmi_category(bmi)) == ["Underweight", "Normal weight", "Overweight", "Obese"]
+    assert health.bmi_category(25.0) == "Overweight"
+    assert np.allclose(health.hamwi_ideal_weight([170, 170], ["Male", "Female"]), [66.71, 60.74], atol=0.01)
 
 def test_calorie_needs():
-    # TODO: Add test cases for calorie calculator
-    pass
+    import numpy as np
+    from utilitycalc import health
+    bmr = health.mifflin_st_jeor_bmr([70, 60], [170, 165], [30, 40], ["Male", "Female"])
+    assert np.allclose(bmr, [1617.5, 1270.25])
+    calories = health.calorie_target(health.tdee(bmr, ["Moderately Active", "Sedentary"]),
+                                     ["Maintain Weight", "Lose Weight"])
+    assert np.allclose(calories, [1617.5 * 1.55, 1270.25 * 1.2 - 500])
+    protein, carbs, fat = health.macros(70, 2000)
+    assert protein == 154 and np.isclose(fat * 9, 500) and np.isclose(carbs, (2000 - 616 - 500) / 4)
 
 def test_hydration_needs():
-    # TODO: Add test cases for hydration calculator
-    pass
+    import numpy as np
+    from utilitycalc import health
+    water = health.hydration_needs([70, 70], ["Light Exercise", "Athlete"], ["Moderate", "Hot"],
+                                   [False, True], [False, True], [2, 0])
+    assert np.allclose(water, [70 * 30 * 1.2 + 400, (70 * 30 * 1.8 * 1.2 + 300) * 1.15])
+
+def test_duty_cycle_reduces_refrigerator_load():
+    from utilitycalc.electricity import simulate_load_profiles, summarize_peak_demand
+    fridge = [{"name": "Refrigerator", "watts": 150, "quantity": 2, "hours": 24.0}]
+    profiles = simulate_load_profiles(fridge, days=500, seed=1)
+    summary = summarize_peak_demand(profiles)
+    assert profiles.shape == (500, 96)
+    assert summary["peak_max"] <= 0.3
+    # Compressor runs roughly a third of the time, not the full 7.2 kWh
+    assert 1.5 < summary["mean_daily_kwh"] < 3.5
+
+def test_load_simulation_is_reproducible():
+    from utilitycalc.electricity import simulate_load_profiles
+    appliances = [{"name": "Television", "watts": 100, "quantity": 1, "hours": 3.0}]
+    first = simulate_load_profiles(appliances, days=50, seed=7)
+    second = simulate_load_profiles(appliances, days=50, seed=7)
+    assert (first == second).all()
+    assert abs(first.sum(axis=1).mean() * 15 / 60 / 1000 - 0.3) < 0.01
+
+def test_incremental_sleep_stats_match_full_history():
+    import datetime
+    import statistics
+    from utilitycalc.sleep import build_sleep_stats, sleep_duration_std, mean_bedtime, new_sleep_stats, \
+        recent_durations, update_sleep_stats, ROLLING_WINDOWS
+    durations = [6.0, 7.5, 8.0, 5.5, 9.0, 6.5, 7.0, 4.0, 8.5, 6.0]
+    records = [{"date": f"2025-01-{i + 1:02d}", "sleep_time": "23:30" if i % 2 else "00:30",
+                "wake_time": "07:00", "duration": d, "quality": "Good"}
+               for i, d in enumerate(durations)]
+    stats = build_sleep_stats(records)
+    assert abs(stats['mean'] - statistics.mean(durations)) < 1e-9
+    assert abs(sleep_duration_std(stats) - statistics.stdev(durations)) < 1e-9
+    assert abs(stats['rolling_debt']['7'] - sum(max(0, 8 - d) for d in durations[-7:])) < 1e-9
+    assert abs(stats['total_debt'] - sum(max(0, 8 - d) for d in durations)) < 1e-9
+    assert mean_bedtime(stats) == "00:00"
+    # Windows follow dates, so a backfilled or shuffled history gives the same figures
+    backfill = dict(records[0], date="2024-12-01", duration=3.0)
+    shuffled = build_sleep_stats([records[-1], backfill] + records[:-1])
+    assert shuffled['rolling_debt'] == stats['rolling_debt'] and shuffled['latest_date'] == "2025-01-10"
+    # Running window sums agree with re-summing the window over a long, gappy, out-of-order history
+    import random
+    rng = random.Random(0)
+    nights = [dict(records[0], date=str(datetime.date(2023, 1, 1) + datetime.timedelta(days=day)),
+                   duration=rng.uniform(3, 10))
+              for day in sorted(rng.sample(range(700), 300))]
+    nights = nights[:100] + rng.sample(nights[100:200], 100) + nights[200:]
+    stats = new_sleep_stats()
+    for night in nights:
+        update_sleep_stats(stats, night)
+        for window in ROLLING_WINDOWS:
+            expected = sum(max(0, 8 - hours) for hours in recent_durations(stats, window))
+            assert abs(stats['rolling_debt'][str(window)] - expected) < 1e-6
+
+def test_wearable_episode_detection():
+    import io
+    import numpy as np
+    import pandas as pd
+    from utilitycalc.sleep import load_wearable_csv, detect_sleep_episodes, episodes_to_records
+    # Two nights: asleep 23:00-07:00 with one 10 minute awakening at 03:00
+    minutes = pd.date_range("2025-01-01 12:00", "2025-01-03 11:59", freq="min")
+    hour = minutes.hour + minutes.minute / 60
+    asleep = (hour >= 23) | (hour < 7)
+    asleep &= ~((hour >= 3) & (hour < 3 + 10 / 60))
+    csv = pd.DataFrame({
+        "Timestamp": minutes,
+        "Heart Rate": np.where(asleep, 55, 80),
+        "Movement": np.where(asleep, 0, 20)
+    }).to_csv(index=False)
+    episodes = detect_sleep_episodes(load_wearable_csv(io.StringIO(csv)))
+    assert len(episodes) == 2
+    assert list(episodes['awakenings']) == [1, 1]
+    assert (episodes['efficiency'] > 0.95).all()
+    records = episodes_to_records(episodes)
+    assert [r['date'] for r in records] == ["2025-01-01", "2025-01-02"]
+    assert records[0]['sleep_time'] == "23:00" and records[0]['wake_time'] == "07:00"
+
+def test_sleep_timing_histograms_wrap_midnight():
+    from utilitycalc.sleep import build_sleep_stats, mean_bedtime, mean_wake_time, \
+        social_jetlag_hours, regularity_index, hourly_sleep_probability
+    # Weeknights 23:00-07:00 and Friday/Saturday nights 01:00-09:00
+    records = []
+    for day in range(1, 15):
+        date = f"2025-01-{day:02d}"
+        free = day % 7 in (3, 4)  # 2025-01-03 is a Friday
+        records.append({"date": date, "sleep_time": "01:00" if free else "23:00",
+                        "wake_time": "09:00" if free else "07:00", "duration": 8.0,
+                        "quality": "Good"})
+    stats = build_sleep_stats(records)
+    assert mean_bedtime(stats) == "23:34"
+    assert mean_wake_time(stats) is not None
+    assert abs(social_jetlag_hours(stats['timing']) - 2.0) < 1e-6
+    assert regularity_index(stats['timing']) < 100
+    probability = hourly_sleep_probability(stats['timing'], stats['count'])
+    assert probability[3] == 1.0 and probability[12] == 0.0
+
+def test_recovery_schedule_respects_constraints():
+    from utilitycalc.sleep import plan_recovery_schedule, recovery_days_needed
+    # A night shift on day 2 leaves only 5 hours and adds 3 hours of debt
+    schedule = plan_recovery_schedule(
+        5.0,
+        ["22:00", "22:00", "22:00", "21:00", "22:00"],
+        ["07:00", "07:00", "07:00", "07:00", "07:00"],
+        [0, 4, 0, 0, 0],
+        target_sleep=8,
+        max_extra_sleep=2
+    )
+    assert list(schedule['Extra Sleep']) == [1.0, 0.0, 1.0, 2.0, 1.0]
+    assert list(schedule['Remaining Debt']) == [4.0, 7.0, 6.0, 4.0, 3.0]
+    assert schedule['Bedtime'][3] == "21:00"
+    assert recovery_days_needed(schedule) is None
+    assert recovery_days_needed(plan_recovery_schedule(3.0, ["21:00"] * 3, ["07:00"] * 3, [0] * 3)) == 2
+
+def test_meal_index_range_counts():
+    from utilitycalc.grocery import build_meal_index, add_meal_to_index, ingredient_counts_between, \
+        session_catalog
+    meals = [
+        {"date": "2025-01-05", "type": "Lunch", "ingredients": ["Rice", "Lentils"]},
+        {"date": "2025-01-01", "type": "Dinner", "ingredients": ["Rice", "Chicken"]},
+        {"date": "2025-01-10", "type": "Dinner", "ingredients": ["Pasta"]}
+    ]
+    index = build_meal_index(meals, session_catalog([]))
+    add_meal_to_index(index, {"date": "2025-01-03", "type": "Breakfast", "ingredients": ["Oats", "Rice"]})
+    assert index["dates"] == ["2025-01-01", "2025-01-03", "2025-01-05", "2025-01-10"]
+    counts = ingredient_counts_between(index, "2025-01-01", "2025-01-05")
+    assert counts[0] == ("Rice", 3)
+    assert dict(counts) == {"Rice": 3, "Lentils": 1, "Chicken": 1, "Oats": 1}
+    assert ingredient_counts_between(index, "2025-02-01", "2025-02-07") == []
+
+def test_grocery_catalog_groups_in_one_pass():
+    from utilitycalc.grocery import GROCERY_CATALOG, session_catalog, add_catalog_item, group_by_category
+    catalog = session_catalog([{"item": f"Custom {i}", "category": "Snacks"} for i in range(2000)])
+    assert catalog["ids"]["Custom 1999"] == len(GROCERY_CATALOG["items"]) + 1999
+    assert "Custom 0" not in GROCERY_CATALOG["ids"]
+    assert add_catalog_item(catalog, "Rice") == GROCERY_CATALOG["ids"]["Rice"]
+    grouped = group_by_category(catalog, [
+        {"item": "Custom 5", "quantity": 1},
+        {"item": "Milk", "quantity": 2},
+        {"item": "Apples", "quantity": 1},
+        {"item": "Unknown", "quantity": 1}
+    ])
+    assert list(grouped) == ["Fruits & Vegetables", "Dairy & Eggs", "Snacks", "Other"]
+
+def test_meal_quantities_scale_and_normalize():
+    from utilitycalc.grocery import build_meal_index, session_catalog, ingredient_amounts_between, \
+        normalize_quantities, format_amounts
+    bases, amounts = normalize_quantities(["kg", "cups", "pieces", "l"], [1.5, 2, 3, 0.5])
+    assert list(bases) == [0, 1, 2, 1]
+    assert list(amounts) == [1500.0, 480.0, 3.0, 500.0]
+    meals = [
+        {"date": "2025-01-01", "ingredients": ["Rice", "Milk"], "servings": 4,
+         "quantities": [{"item": "Rice", "amount": 100, "unit": "g"},
+                        {"item": "Milk", "amount": 1, "unit": "cups"}]},
+        {"date": "2025-01-02", "ingredients": ["Rice", "Eggs"], "servings": 2,
+         "quantities": [{"item": "Rice", "amount": 0.25, "unit": "kg"},
+                        {"item": "Eggs", "amount": 2, "unit": "pieces"}]},
+        {"date": "2025-01-02", "ingredients": ["Bread"], "servings": 1}
+    ]
+    index = build_meal_index(meals, session_catalog([]))
+    totals = ingredient_amounts_between(index, "2025-01-01", "2025-01-02")
+    assert totals == {"Rice": {"g": 900.0}, "Milk": {"ml": 960.0}, "Eggs": {"pieces": 4.0}}
+    assert format_amounts({"g": 1500.0, "pieces": 4.0}) == "1.50 kg, 4 pieces"
+
+def test_basket_optimizer_picks_packs_and_substitutes():
+    from utilitycalc.grocery import build_price_index, cheapest_packs, optimize_basket, pack_options
+    import numpy as np
+    cost, packs = cheapest_packs(7, np.array([1, 3, 5]), np.array([10.0, 25.0, 38.0]))
+    assert (cost, packs) == (58.0, {1: 2, 5: 1})
+    # Large needs buy the bulk in the best-value pack instead of a million-step DP
+    cost, packs = cheapest_packs(1_000_000, np.array([1, 3, 5]), np.array([10.0, 25.0, 38.0]))
+    assert (cost, packs) == (200_000 * 38.0, {5: 200_000})
+    records = [
+        {"item": "Chicken", "quantity": 1, "price": 250.0, "date": "2025-01-05"},
+        {"item": "Tofu", "quantity": 2, "price": 180.0, "date": "2025-01-06"},
+        {"item": "Tofu", "quantity": 2, "price": 200.0, "date": "2025-03-06"},
+        {"item": "Rice", "quantity": 5, "price": 300.0, "date": "2025-01-01"},
+        {"item": "Rice", "quantity": 1, "price": 70.0, "date": "2025-02-01"},
+        {"item": "Rice", "quantity": 1, "unit": "kg", "price": 80.0, "date": "2025-02-01"},
+        {"item": "Rice", "quantity": 500, "unit": "g", "price": 45.0, "date": "2025-02-01"}
+    ]
+    index = build_price_index(records)
+    assert index["Tofu"]["pieces"]["latest"] == 100.0
+    assert index["Rice"]["g"]["latest"] == 0.09
+    assert list(pack_options(index["Tofu"]["pieces"], "Median")[1]) == [190.0]
+    basket, missing = optimize_basket(
+        [{"item": "Chicken", "quantity": 3}, {"item": "Rice", "quantity": 6}, {"item": "Milk", "quantity": 1}],
+        index
+    )
+    assert [(b["buy"], b["packs"], b["cost"]) for b in basket] == [
+        ("Tofu", {"pieces": {2: 2}}, 400.0), ("Rice", {"pieces": {1: 1, 5: 1}}, 370.0)
+    ]
+    assert missing == ["Milk"]
+    # Gram needs are priced against gram packs, not the meal count
+    basket, _ = optimize_basket([{"item": "Rice", "quantity": 2, "amounts": {"g": 1200}}], index)
+    assert (basket[0]["packs"], basket[0]["cost"]) == ({"g": {500: 1, 1000: 1}}, 125.0)
+    basket, _ = optimize_basket([{"item": "Chicken", "quantity": 3}], index, allow_substitutes=False)
+    assert basket[0]["cost"] == 750.0
+    # A budget keeps requested items until a substitute is needed to fit
+    shopping = [{"item": "Chicken", "quantity": 3}, {"item": "Rice", "quantity": 1, "amounts": {"g": 1200}}]
+    assert [b["buy"] for b in optimize_basket(shopping, index, budget=900)[0]] == ["Chicken", "Rice"]
+    assert [b["buy"] for b in optimize_basket(shopping, index, budget=600)[0]] == ["Tofu", "Rice"]
+    with pytest.raises(ValueError):
+        optimize_basket(shopping, index, budget=500)
+    with pytest.raises(ValueError):
+        optimize_basket(shopping, index, allow_substitutes=False, budget=600)
+
+def test_pantry_expiry_heap():
+    from utilitycalc.grocery import build_pantry, add_pantry_entry, consume_pantry_item, \
+        discard_expired, expiring_within, subtract_on_hand, build_meal_index, session_catalog, suggest_meals
+    pantry = build_pantry([
+        {"item": "Milk", "quantity": 2, "expiry": "2025-01-03"},
+        {"item": "Milk", "quantity": 1, "expiry": "2025-01-10"},
+        {"item": "Eggs", "quantity": 12, "expiry": "2025-01-20"}
+    ])
+    add_pantry_entry(pantry, {"item": "Tofu", "quantity": 1, "expiry": "2025-01-02"})
+    add_pantry_entry(pantry, {"item": "Rice", "quantity": 1, "unit": "kg", "expiry": "2025-02-01"})
+    assert pantry["on_hand"] == {"Milk": {"pieces": 3}, "Eggs": {"pieces": 12}, "Tofu": {"pieces": 1},
+                                 "Rice": {"g": 1000}}
+    assert consume_pantry_item(pantry, "Milk", 2) == 2
+    # Partial use in another unit of the same dimension
+    assert consume_pantry_item(pantry, "Rice", 500, "g") == 500
+    assert pantry["entries"][pantry["by_item"][("Rice", "g")][0][1]]["quantity"] == 0.5
+    assert [e["expiry"] for e in expiring_within(pantry, "2025-01-15")] == ["2025-01-02", "2025-01-10"]
+    wasted = discard_expired(pantry, "2025-01-05")
+    assert [e["item"] for e in wasted] == ["Tofu"]
+    assert pantry["on_hand"] == {"Milk": {"pieces": 1}, "Eggs": {"pieces": 12}, "Rice": {"g": 500}}
+    shopping = subtract_on_hand([{"item": "Milk", "quantity": 3}, {"item": "Eggs", "quantity": 6},
+                                 {"item": "Rice", "quantity": 2, "amounts": {"g": 900}}],
+                                pantry["on_hand"])
+    # Amounts shrink by the stock; the meal count never offsets grams
+    assert shopping == [{"item": "Milk", "quantity": 2},
+                        {"item": "Rice", "quantity": 2, "amounts": {"g": 400}}]
+    assert subtract_on_hand([{"item": "Rice", "quantity": 2, "amounts": {"g": 500}}], pantry["on_hand"]) == []
+    index = build_meal_index([
+        {"date": "2025-01-01", "name": "Omelette", "ingredients": ["Eggs", "Milk"]},
+        {"date": "2025-01-02", "name": "Porridge", "ingredients": ["Oats", "Milk"]}
+    ], session_catalog([]))
+    assert [(m["name"], n) for m, n in suggest_meals(index, {"Eggs", "Milk"})] == [("Omelette", 2), ("Porridge", 1)]
+
+def test_spend_cube_matches_groupby():
+    from utilitycalc.grocery import load_spend_cube, add_to_spend_cube, monthly_spending, top_spend_items
+    data = {"items": [
+        {"category": "Protein", "item": "Chicken", "quantity": 1, "price": 250.0, "date": "2024-11-05"},
+        {"category": "Dairy & Eggs", "item": "Milk", "quantity": 2, "price": 60.0, "date": "2024-11-20"},
+        {"category": "Protein", "item": "Fish", "quantity": 1, "price": 300.0, "date": "2025-01-03"}
+    ]}
+    cube = load_spend_cube(data)
+    assert data["spend_cube"] is cube and cube["count"] == 3
+    add_to_spend_cube(cube, {"category": "Protein", "item": "Chicken", "quantity": 1, "price": 200.0,
+                             "date": "2025-01-09"})
+    assert cube["by_category"] == {"Protein": 750.0, "Dairy & Eggs": 60.0}
+    assert cube["cells"]["2025-01"]["Protein"] == {"Fish": 300.0, "Chicken": 200.0}
+    assert monthly_spending(cube) == (["2024-11", "2024-12", "2025-01"], [310.0, 0.0, 500.0])
+    assert top_spend_items(cube, 2) == [("Chicken", 450.0), ("Fish", 300.0)]
+
+def test_grocery_records_append_and_migrate(tmp_path):
+    from utilitycalc.grocery import load_grocery_data, add_grocery_record, add_purchase, \
+        record_pantry_event, replay_pantry, recent_purchases
+    from utilitycalc.storage import get_store
+    storage = get_store(root=str(tmp_path))
+    storage.save("grocery_data", {"items": [{"category": "Protein", "item": "Fish", "quantity": 1,
+                                             "price": 300.0, "date": "2025-01-03"}],
+                                  "meals": [], "shopping_lists": [],
+                                  "pantry": [{"id": 0, "item": "Milk", "quantity": 2, "unit": "l",
+                                              "expiry": "2025-01-05"}]})
+    data = load_grocery_data(storage)
+    assert storage.load("grocery_data") == {"migrated": True} and len(data["items"]) == 1
+    pantry = replay_pantry(data["pantry_events"])
+    cube = add_purchase(data, {"category": "Dairy & Eggs", "item": "Milk", "quantity": 1, "price": 60.0,
+                               "date": "2025-01-09"}, storage)
+    assert cube["count"] == 2 and storage.load("grocery_spend_cube") == cube
+    record_pantry_event(data, pantry, {"add": {"item": "Milk", "quantity": 1, "unit": "l",
+                                               "expiry": "2025-01-20"}}, storage)
+    assert record_pantry_event(data, pantry, {"use": "Milk", "quantity": 2.5, "unit": "l"}, storage) == 2.5
+    add_grocery_record(data, "meals", {"date": "2025-01-09", "name": "Tea"}, storage)
+    # Every action appended a record; reloading replays the same state
+    reloaded = load_grocery_data(storage)
+    assert reloaded == data and (tmp_path / "grocery_pantry.jsonl").exists()
+    assert replay_pantry(reloaded["pantry_events"])["on_hand"] == pantry["on_hand"] == {"Milk": {"ml": 500.0}}
+    assert [record["item"] for record in recent_purchases(reloaded, 1)] == ["Milk"]
+
+def test_task_model_learns_from_actuals(tmp_path, monkeypatch):
+    import numpy as np
+    import pickle
+    from utilitycalc.tasks import load_task_model, update_task_model, predict_task_times, estimate_time, \
+        task_model_retrain, build_task_store, update_task
+    from utilitycalc.storage import get_store
+    monkeypatch.chdir(tmp_path)
+    task = {"complexity": "Medium", "type": "Development", "experience_level": "Intermediate"}
+    # Untrained model reproduces the rule-based estimate
+    model = load_task_model(build_task_store([]))
+    low, expected, high = predict_task_times(model, [task])
+    assert np.allclose([low[0], expected[0], high[0]], estimate_time("Medium", "Development", "Intermediate"))
+
+    # Development tasks consistently take twice the rule estimate
+    history = [dict(task, actual_time=6.0 * (1 + 0.05 * (i % 3))) for i in range(30)]
+    # A stale model is retrained in the background while the old one is served
+    assert not load_task_model(build_task_store(history))["fitted"]
+    trained = model = task_model_retrain().result(timeout=30)
+    assert get_store().flush(timeout=5) and (tmp_path / "task_model.pkl").exists()
+    model = update_task_model(model, [dict(task, actual_time=6.0)])
+    low, expected, high = predict_task_times(model, [task, dict(task, complexity="High")])
+    assert 5.0 < expected[0] < 7.0
+    assert (low < expected).all() and (expected < high).all()
+    assert expected[1] > expected[0]
+    # The saved model is reused only while it matches the history's training version
+    store = build_task_store(history)
+    assert load_task_model(store)["n_samples"] == 30 and task_model_retrain().result() is trained
+    # Re-logging an actual time leaves the completed count alone but still retrains once
+    update_task(store, 0, {"actual_time": 9.0}, get_store())
+    assert store["completed"] == 30 and load_task_model(store)["version"] == 30
+    assert task_model_retrain().result(timeout=30)["version"] == 31 and get_store().flush(timeout=5)
+    assert load_task_model(store)["version"] == 31 and task_model_retrain().result()["version"] == 31
+    # A model file that was not signed with the key is never unpickled
+    (tmp_path / "task_model.pkl").write_bytes(b"\0" * 32 + pickle.dumps(model))
+    assert load_task_model(build_task_store([]))["n_samples"] == 0
+
+def test_project_simulation_over_dag():
+    import datetime
+    import numpy as np
+    import pytest
+    from utilitycalc.tasks import simulate_project, topological_order, completion_date
+    assert topological_order(["C", "A", "B"], [["B"], [], ["A"]]) == [1, 2, 0]
+    with pytest.raises(ValueError):
+        topological_order(["A", "B"], [["B"], ["A"]])
+    # Rows left incomplete in the editor are rejected, not simulated as NaN
+    with pytest.raises(ValueError, match="'B'"):
+        simulate_project(["A", "B"], [1.0, np.nan], [2.0, 3.0], [3.0, 4.0], [[], ["A"]], trials=10)
+    with pytest.raises(ValueError):
+        simulate_project([], [], [], [], [], trials=10)
+    # A -> (B, C) -> D, with B always longer than C
+    finish, criticality = simulate_project(
+        ["A", "B", "C", "D"],
+        [2, 5, 1, 1], [3, 6, 2, 2], [4, 8, 3, 3],
+        [[], ["A"], ["A"], ["B", "C"]],
+        trials=20000, chunk_size=7000, seed=0
+    )
+    assert finish.shape == (20000,)
+    assert 8 <= finish.min() and finish.max() <= 15
+    assert abs(np.mean(finish) - (3 + 6.17 + 2)) < 0.2
+    assert np.allclose(criticality, [1, 1, 0, 1])
+    assert completion_date(datetime.date(2025, 1, 3), 20, 8) == datetime.date(2025, 1, 7)
+
+def test_task_text_similarity_index(tmp_path, monkeypatch):
+    from utilitycalc.tasks import build_text_index, add_to_text_index, load_text_index, \
+        save_text_index, similar_tasks, build_task_store
+    monkeypatch.chdir(tmp_path)
+    tasks = [
+        {"name": "Login page", "description": "Build the login form with password reset"},
+        {"name": "Quarterly report", "description": "Write the finance summary document"},
+        {"name": "Payment API", "description": "Integrate the payment gateway REST API"}
+    ]
+    index = build_text_index(tasks[:2])
+    add_to_text_index(index, tasks[2:])
+    save_text_index(index)
+    reloaded = load_text_index(build_task_store(tasks))
+    assert reloaded["matrix"].shape[0] == 3
+    assert (reloaded["df"] == index["df"]).all()
+    matches = similar_tasks(reloaded, "password reset on the login screen", k=2)
+    assert matches[0][0] == 0 and matches[0][1] > 0.2
+    assert similar_tasks(reloaded, "gateway api")[0][0] == 2
+    assert similar_tasks(reloaded, "the and of") == []
+
+    # Each save appends only the new rows as a shard; too many shards merge into one
+    from utilitycalc import tasks as task_module
+    monkeypatch.setattr(task_module, "MAX_TEXT_SHARDS", 3)
+    more = [{"name": f"Task {i}", "description": f"sprint item {i}"} for i in range(3)]
+    shard_counts = []
+    for task in more:
+        save_text_index(add_to_text_index(reloaded, [task]))
+        shard_counts.append(list(reloaded["shards"]))
+        assert reloaded["row_norms"] is None
+        similar_tasks(reloaded, "sprint")
+        assert len(reloaded["row_norms"]) == reloaded["matrix"].shape[0]
+    assert shard_counts == [[3, 1], [3, 1, 1], [6]]
+    again = load_text_index(build_task_store(tasks + more))
+    assert (again["matrix"] != reloaded["matrix"]).nnz == 0
+    assert similar_tasks(again, "gateway api") == similar_tasks(build_text_index(tasks + more), "gateway api")
+
+def test_task_store_appends_and_pages(tmp_path, monkeypatch):
+    import json
+    from utilitycalc.tasks import load_task_store, add_task, update_task, task_page, task_rows, task_summary
+    monkeypatch.chdir(tmp_path)
+    legacy = [{"name": f"Task {i}", "type": "Design" if i % 2 else "Testing", "complexity": "Low",
+               "experience_level": "Expert", "estimated_time": float(i), "min_time": 0.8 * i,
+               "max_time": 1.2 * i, "date": "2025-01-01"} for i in range(5)]
+    (tmp_path / "tasks_history.json").write_text(json.dumps(legacy))
+    store = load_task_store()
+    assert store["count"] == 5
+    add_task(store, dict(legacy[0], name="Task 5", type="Design"))
+    update_task(store, 1, {"actual_time": 2.5})
+    assert len((tmp_path / "tasks_history.jsonl").read_text().splitlines()) == 7
+
+    reloaded = load_task_store()
+    assert task_rows(reloaded) == task_rows(store)
+    assert task_rows(reloaded)[1]["actual_time"] == 2.5
+    # Running totals match a regroup of the rows
+    assert task_summary(reloaded, "type") == {"Testing": (3, 6.0), "Design": (3, 4.0)}
+    assert task_summary(reloaded, "complexity") == {"Low": (6, 10.0)} and reloaded["completed"] == 1
+    positions, page_df, total = task_page(reloaded, page=0, page_size=2, filters={"type": ["Design"]})
+    assert total == 3 and positions == [5, 3]
+    assert list(page_df["Estimated"]) == ["0.0 hrs", "3.0 hrs"]
+    positions, page_df, _ = task_page(reloaded, page=1, page_size=2, filters={"type": ["Design"]})
+    assert positions == [1] and page_df["Actual"].iloc[0] == "2.5 hrs"
+    update_task(reloaded, 5, {"type": "Testing", "estimated_time": 2.0})
+    assert task_summary(reloaded, "type") == {"Testing": (4, 8.0), "Design": (2, 4.0)}
+
+def test_batch_screening_streams_chunks(tmp_path):
+    import pandas as pd
+    from utilitycalc.batch import main, screen_chunk
+    roster = pd.DataFrame({
+        "employee_id": range(7),
+        "weight": [70, 55, 90, 62, 80, 100, 48],
+        "height": [175, 160, 180, 168, 172, 185, 158],
+        "age": [30, 25, 45, 38, 50, 29, 60],
+        "gender": ["Male", "Female", "Male", "Female", "Male", "Male", "Female"],
+        "goal": ["Lose Weight", None, None, "Gain Weight", None, None, None]
+    })
+    roster.to_csv(tmp_path / "roster.csv", index=False)
+    main([str(tmp_path / "roster.csv"), str(tmp_path / "results.csv"), "--chunksize", "3"])
+    results = pd.read_csv(tmp_path / "results.csv")
+    assert len(results) == 7 and list(results["employee_id"]) == list(range(7))
+    assert results.loc[0, "bmi_category"] == "Normal weight"
+    assert results.loc[0, "calories"] == round((10 * 70 + 6.25 * 175 - 5 * 30 + 5) * 1.55 - 500)
+    assert results.loc[1, "water_ml"] == round(55 * 30 * 1.2)
+    assert results["error"].isna().all()
+
+    # Text flags and label case are parsed explicitly; bad values only fail their own row
+    roster = pd.DataFrame({
+        "weight": [70, 60, 60, "heavy"], "height": [175, 165, 165, 170], "age": [30, 28, 28, 40],
+        "gender": ["male", "FEMALE", "Female", "Male"], "pregnant": ["no", "Yes", "maybe", "False"]
+    })
+    roster.to_csv(tmp_path / "roster.csv", index=False)
+    main([str(tmp_path / "roster.csv"), str(tmp_path / "results.csv")])
+    results = pd.read_csv(tmp_path / "results.csv")
+    assert list(results["gender"]) == ["male", "FEMALE", "Female", "Male"]
+    assert results.loc[0, "water_ml"] == round(70 * 30 * 1.2)
+    assert results.loc[1, "water_ml"] == round(60 * 30 * 1.2 + 300)
+    assert results.loc[2, "error"] == "invalid pregnant" and results.loc[3, "error"] == "invalid weight"
+    assert results.loc[2:, "bmi"].isna().all() and results.loc[:1, "error"].isna().all()
+    bad = pd.DataFrame({"weight": [-1], "height": [170], "age": [30], "gender": ["x"], "pregnant": [2]})
+    assert list(screen_chunk(bad)["error"]) == ["invalid weight; invalid gender; invalid pregnant"]
+
+    # A header-only roster still produces a results file with the header
+    roster.iloc[:0].to_csv(tmp_path / "roster.csv", index=False)
+    main([str(tmp_path / "roster.csv"), str(tmp_path / "results.csv")])
+    results = pd.read_csv(tmp_path / "results.csv")
+    assert results.empty and {"weight", "bmi", "error"} <= set(results.columns)
+
+def test_food_prefix_search_and_totals(tmp_path):
+    import time
+    import numpy as np
+    from utilitycalc import nutrition
+    from utilitycalc.storage import get_store
+    foods = nutrition.default_food_database()
+    names = foods["names"]
+    results = [names[i] for i in nutrition.search_foods(foods["index"], "chick")]
+    assert "Chicken Breast Grilled" in results and "Chickpeas Cooked" in results
+    assert [names[i] for i in nutrition.search_foods(foods["index"], "grill chi")] == ["Chicken Breast Grilled"]
+    assert nutrition.search_foods(foods["index"], "zzz") == []
+    # A large table: results match a brute-force ranking and short prefixes stay fast
+    syl = ["ba", "ce", "di", "fo", "gu", "ka", "le", "mi", "no", "pu", "ra", "so", "ti"]
+    big = [f"{syl[i % 13]}{syl[i // 13 % 13]} {syl[i // 169 % 13] * (1 + i % 3)}{syl[i // 2197 % 13]} {i}"
+           for i in range(100000)]
+    index = nutrition.build_food_index(big)
+    for query in ["ba", "ka mi", "so 12"]:
+        expected = sorted((i for i, name in enumerate(big)
+                           if all(any(w.startswith(q) for w in name.lower().split()) for q in query.split())),
+                          key=lambda i: (len(big[i]), big[i]))[:20]
+        assert nutrition.search_foods(index, query) == expected
+    start = time.perf_counter()
+    for _ in range(100):
+        nutrition.search_foods(index, "b")
+    assert time.perf_counter() - start < 1
+    totals = nutrition.food_log_totals(foods, [foods["ids"]["Chicken Breast Grilled"], foods["ids"]["Apple"]],
+                                       [200, 150])
+    assert np.isclose(totals["calories"], 330 + 78) and np.isclose(totals["protein"], 62.45)
+    assert nutrition.food_log_totals(foods, [], [])["fat"] == 0.0
+
+    # The log is kept per day with running totals, and reloads the same way
+    storage = get_store(root=str(tmp_path))
+    log = nutrition.load_food_log(storage)
+    for date, food, grams in [("2025-01-01", "Apple", 150), ("2025-01-02", "Chicken Breast Grilled", 200),
+                              ("2025-01-02", "Apple", 150), ("2025-01-02", "Unknown Food", 100)]:
+        nutrition.log_food(log, {"date": date, "food": food, "grams": grams, "time": "12:00"}, storage)
+    assert [e["food"] for e in nutrition.day_food_log(log, "2025-01-02")] == ["Chicken Breast Grilled", "Apple"]
+    assert np.isclose(nutrition.day_food_totals(log, "2025-01-02")["calories"], totals["calories"])
+    assert nutrition.day_food_totals(log, "2025-01-03")["calories"] == 0.0
+    reloaded = nutrition.load_food_log(storage)
+    assert reloaded["days"] == log["days"] and len(storage.load("food_log")) == 4
+
+def test_meal_plan_hits_macro_targets():
+    import numpy as np
+    from utilitycalc import nutrition
+    foods = nutrition.default_food_database()
+    targets = {"calories": 2200, "protein": 140, "carbs": 250, "fat": 70}
+    chicken = foods["ids"]["Chicken Breast Grilled"]
+    plan, planned = nutrition.plan_meals(foods, targets, days=7, max_weekly_grams=700, excluded=[chicken])
+    assert len(plan) == 7 and planned.shape == (7, 4)
+    assert np.allclose(planned, [2200, 140, 250, 70], rtol=0.05)
+    assert all(chicken not in day for day in plan)
+    # Cached plans are keyed on the hash taken at load, not on the table itself
+    from utilitycalc.cache import default_cache
+    hits = default_cache().hits
+    assert nutrition.plan_meals(dict(foods, index=None), targets, days=7, max_weekly_grams=700,
+                                excluded=[chicken])[0] == plan
+    assert default_cache().hits == hits + 1
+    weekly = {}
+    for day in plan:
+        assert all(10 <= grams <= 300 for grams in day.values())
+        for food_id, grams in day.items():
+            weekly[food_id] = weekly.get(food_id, 0) + grams
+    assert max(weekly.values()) <= 700 + 5 * 7
+
+def test_hydration_log_appends_and_aggregates(tmp_path):
+    import numpy as np
+    from utilitycalc import health
+    from utilitycalc.hydration import load_intake_log, log_intake, intake_status, day_intake
+    from utilitycalc.storage import get_store
+    storage = get_store(root=str(tmp_path))
+    schedule = health.hourly_hydration_schedule(1600)
+    assert np.isclose(schedule[6], 120) and np.isclose(schedule[21], 80) and schedule[:6].sum() == 0
+    log = load_intake_log(storage)
+    log_intake(log, "2024-03-01", 7, 250, storage)
+    log_intake(log, "2024-03-01", 7, 250, storage)
+    log_intake(log, "2024-03-01", 12, 500, storage)
+    log_intake(log, "2024-03-02", 8, 250, storage)
+    reloaded = load_intake_log(storage)
+    assert np.array_equal(day_intake(reloaded, "2024-03-01"), day_intake(log, "2024-03-01"))
+    assert day_intake(reloaded, "2024-03-01")[7] == 500
+    cumulative = np.cumsum(schedule)
+    assert intake_status(reloaded, "2024-03-01", 7, cumulative) == (1000.0, 240.0)
+    assert intake_status(reloaded, "2024-03-03", 7, cumulative)[0] == 0.0
+    assert (tmp_path / "hydration_log.jsonl").exists()
+
+def test_page_manifest_reads_pages_without_importing_them():
+    import subprocess
+    import textwrap
+    from utilitycalc.registry import page_manifest
+    manifest = page_manifest()
+    pages = [page for apps in manifest.values() for page in apps]
+    root = os.path.join(os.path.dirname(__file__), '..')
+    assert sorted(page["file"] for page in pages) == sorted(f for f in os.listdir(os.path.join(root, "pages"))
+                                                            if f.endswith(".py"))
+    bmi = next(page for page in pages if page["file"] == "bmi_calculator.py")
+    assert bmi["icon"] == "⚖️" and bmi["url_path"] == "bmi_calculator" and bmi["path"] == "pages/bmi_calculator.py"
+    assert set(bmi) == {"title", "description", "file", "path", "url_path", "icon"}
+    code = textwrap.dedent("""
+        import sys
+        from utilitycalc.registry import page_manifest
+        page_manifest()
+        assert not any(name.split(".")[0] in ("plotly", "pandas", "pages") for name in sys.modules), sys.modules
+    """)
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+def test_core_imports_without_ui_dependencies():
+    import subprocess
+    import textwrap
+    code = textwrap.dedent("""
+        import sys
+        from utilitycalc import electricity, finance, grocery, health, hydration, nutrition, sleep, tasks
+        heavy = {"streamlit", "plotly", "pandas", "sklearn", "scipy"}
+        assert not heavy & {name.split(".")[0] for name in sys.modules}
+    """)
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.join(os.path.dirname(__file__), '..'), check=True)
+
+@pytest.mark.parametrize("backend", ["json", "jsonl", "sqlite"])
+def test_storage_namespaces_batches_and_concurrent_appends(tmp_path, backend):
+    import threading
+    from utilitycalc.storage import get_store, session_namespace, user_namespace
+    store = get_store(backend=backend, root=str(tmp_path))
+    other = get_store(user_namespace("someone@example.com"), backend=backend, root=str(tmp_path))
+    assert user_namespace("test@example.com") == "default" != other.namespace
+    # Anonymous sessions never share a namespace, but keep theirs across reruns
+    first, second = {}, {}
+    assert user_namespace(None) is None
+    assert session_namespace(first) == session_namespace(first) != session_namespace(second)
+    store.save("settings", {"theme": "dark"})
+    store.append("expenses", {"amount": 1})
+    other.append("expenses", {"amount": 2})
+    assert store.load("expenses") == [{"amount": 1}] and other.load("expenses") == [{"amount": 2}]
+    assert other.load("settings", {}) == {}
+    with store.batch():
+        store.append("expenses", {"amount": 3})
+        store.save("settings", {"theme": "light"})
+        store.save("settings", {"theme": "blue"})
+        assert store.load("expenses")[-1] == {"amount": 3}
+        assert get_store(backend=backend, root=str(tmp_path)).backend.read("default", "settings") == {"theme": "dark"}
+    assert store.load("settings") == {"theme": "blue"} and len(store.load("expenses")) == 2
+
+    def worker(n):
+        for i in range(20):
+            store.append("log", {"worker": n, "i": i})
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted((r["worker"], r["i"]) for r in store.load("log")) == [(n, i) for n in range(4) for i in range(20)]
+    assert not list(tmp_path.rglob("*.tmp"))
+
+def test_write_behind_coalesces_and_acknowledges(tmp_path):
+    import time
+    from utilitycalc.storage import JSONLBackend, Store, WriteBehindBackend
+
+    class SlowBackend(JSONLBackend):
+        calls = 0
+
+        def append(self, namespace, name, records):
+            SlowBackend.calls += 1
+            time.sleep(0.2)
+            super().append(namespace, name, records)
+
+    backend = WriteBehindBackend(SlowBackend(str(tmp_path)), max_pending=50)
+    store = Store(backend)
+    start = time.perf_counter()
+    acks = [store.append("expenses", {"amount": i}) for i in range(10)]
+    assert time.perf_counter() - start < 0.1
+    store.save("settings", {"theme": "dark"})
+    assert len(store.load("expenses")) == 10 and store.load("settings") == {"theme": "dark"}
+    assert store.flush(timeout=5) and all(ack.result() for ack in acks)
+    assert SlowBackend.calls == 1
+    acks = [store.append("expenses", {"amount": i}) for i in range(120)]
+    store.write_file("model.bin", lambda f: f.write(b"v1"))
+    store.write_file("model.bin", lambda f: f.write(b"v2"))
+    backend.close()
+    assert all(ack.done() for ack in acks) and SlowBackend.calls <= 4
+    assert len(JSONLBackend(str(tmp_path)).read("default", "expenses")) == 130
+    assert (tmp_path / "model.bin").read_bytes() == b"v2"
+
+def test_write_behind_reads_during_flush_and_retries_failures(tmp_path):
+    import threading
+    import time
+    from utilitycalc.storage import JSONLBackend, Store, WriteBehindBackend
+
+    class FlakyBackend(JSONLBackend):
+        failures = 1
+        release = threading.Event()
+
+        def append(self, namespace, name, records):
+            if name == "slow":
+                FlakyBackend.release.wait(5)
+            elif name == "expenses" and FlakyBackend.failures:
+                FlakyBackend.failures -= 1
+                raise OSError("disk full")
+            super().append(namespace, name, records)
+
+    backend = WriteBehindBackend(FlakyBackend(str(tmp_path)), retry_delay=0.05)
+    store = Store(backend)
+    store.save("settings", {"theme": "dark"})
+    store.flush(timeout=5)
+    store.append("slow", {"n": 1})
+    time.sleep(0.2)
+    store.append("notes", {"n": 2})
+    # Reads of other documents don't wait for the stalled flush, and queued data reads back
+    start = time.perf_counter()
+    assert store.load("settings") == {"theme": "dark"} and store.load("notes") == [{"n": 2}]
+    assert time.perf_counter() - start < 1
+    FlakyBackend.release.set()
+
+    ack = store.append("expenses", {"amount": 1})
+    durable = store.append("notes", {"n": 3})
+    # Only the failed document's change fails; the other one in the same flush is acknowledged
+    assert isinstance(ack.exception(timeout=5), OSError) and durable.result(timeout=5) is True
+    assert store.load("expenses") == [{"amount": 1}]
+    assert store.flush(timeout=5) and JSONLBackend(str(tmp_path)).read("default", "expenses") == [{"amount": 1}]
+
+    # File content is captured when queued and read back before it reaches disk
+    content = bytearray(b"v1")
+    store.write_file("model.bin", lambda f: f.write(content))
+    content[:] = b"xx"
+    assert store.read_file("model.bin") == b"v1" and store.read_file("missing.bin") is None
+    backend.close()
+    assert (tmp_path / "model.bin").read_bytes() == b"v1"
+
+def test_result_cache_keys_tiers_and_invalidation(tmp_path, monkeypatch):
+    import numpy as np
+    from utilitycalc import cache
+    assert cache.canonical_hash({"a": 1, "b": np.arange(3)}) == cache.canonical_hash({"b": np.arange(3), "a": 1})
+    assert cache.canonical_hash([1, 2]) != cache.canonical_hash((1, 2)) != cache.canonical_hash([1.0, 2])
+    assert cache.canonical_hash(np.arange(3)) != cache.canonical_hash(np.arange(3.0))
+    calls = []
+    memory = cache.ResultCache(max_bytes=2000)
+
+    @cache.cached(cache=memory)
+    def schedule(principal, rate, years=5):
+        calls.append(principal)
+        return {"balance": np.linspace(principal, 0, years * 12)}
+
+    first = schedule(1000, 8.0)
+    first["balance"][:] = 0  # callers get copies, so this cannot poison the cache
+    assert schedule(1000, 8.0)["balance"][0] == 1000 and calls == [1000]
+    for principal in range(2000, 7000, 1000):
+        schedule(principal, 8.0)
+    assert memory._bytes <= 2000
+    schedule(1000, 8.0)
+    assert calls[-1] == 1000  # evicted by the size bound
+    assert schedule(1000, 8.0)["balance"][-1] == 0 and memory.hits == 2
+    # Keyword, positional and defaulted arguments share one entry
+    assert schedule(principal=1000, rate=8.0, years=5)["balance"][-1] == 0
+    assert memory.hits == 3 and len(calls) == 7
+    # Arguments without a canonical form run uncached
+    misses = memory.misses
+
+    @cache.cached(cache=memory)
+    def count(items):
+        calls.append(items)
+        return len(items)
+    assert count([object()]) == count([object()]) == 1 and memory.misses == misses and len(calls) == 9
+
+    # The disk tier is shared between caches, as between server processes, and honours TTLs
+    monkeypatch.setenv("UTILITYCALC_CACHE_KEY", "test-secret")
+    shared = [cache.ResultCache(directory=str(tmp_path)) for _ in range(2)]
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+    shared[0].set("plan", [1, 2, 3], ttl=60)
+    assert shared[1].get("plan") == (True, [1, 2, 3])
+    clock[0] += 61
+    assert shared[1].get("plan") == (False, None) and shared[0].get("plan") == (False, None)
+
+    def double(x):
+        calls.append(x)
+        return 2 * x
+    v1, v2 = cache.cached(cache=shared[0])(double), cache.cached(version=2, cache=shared[0])(double)
+    assert v1(21) == v1(21) == v2(21) == 42 and calls[-2:] == [21, 21]
+
+    # Entries not signed with this cache's key are never unpickled
+    import pickle
+    shared[0].set("report", {"total": 1})
+    (tmp_path / "report.pkl").write_bytes(b"\0" * 40 + pickle.dumps({"total": 2}))
+    forged = cache.ResultCache(directory=str(tmp_path))
+    assert forged.get("report") == (False, None)
+    other_key = cache.ResultCache(directory=str(tmp_path), secret=b"another secret")
+    shared[0].set("report", {"total": 1})
+    assert other_key.get("report") == (False, None) and forged.get("report") == (True, {"total": 1})
+    # A disk that refuses the write leaves the result cached in memory
+    def full_disk(path, write):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(cache, "atomic_write", full_disk)
+    assert shared[0].set("full", 3) and shared[0].get("full") == (True, 3)
+    assert not (tmp_path / "full.pkl").exists()
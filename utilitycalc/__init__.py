@@ -0,0 +1 @@
+"""Calculation core for UtilityCalc Pro, usable without Streamlit."""
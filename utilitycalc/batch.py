@@ -0,0 +1,170 @@
+"""Batch health screening over a roster CSV.
+
+Usage:
+    python -m utilitycalc.batch roster.csv results.csv [--chunksize 50000]
+
+The roster needs weight, height, age and gender columns. activity_level,
+goal, exercise_level, climate, pregnant, high_altitude and caffeine_cups
+are optional and fall back to the calculators' defaults. The roster is
+streamed in chunks, so memory stays flat for any cohort size.
+
+Labels such as gender and climate match case-insensitively, and pregnant
+and high_altitude accept true/false, yes/no or 1/0. A row with a value that
+can't be parsed gets empty results and a message in the error column; the
+other rows are still screened.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utilitycalc import health
+
+REQUIRED_COLUMNS = ["weight", "height", "age", "gender"]
+DEFAULTS = {
+    "activity_level": "Moderately Active",
+    "goal": "Maintain Weight",
+    "exercise_level": "Light Exercise",
+    "climate": "Moderate",
+    "pregnant": False,
+    "high_altitude": False,
+    "caffeine_cups": 0
+}
+CHOICES = {
+    "gender": health.SEXES,
+    "activity_level": list(health.ACTIVITY_MULTIPLIERS),
+    "goal": list(health.GOAL_ADJUSTMENTS),
+    "exercise_level": list(health.HYDRATION_ACTIVITY_MULTIPLIERS),
+    "climate": list(health.CLIMATE_MULTIPLIERS)
+}
+FLAG_COLUMNS = ["pregnant", "high_altitude"]
+TRUE_FLAGS = {"true", "t", "yes", "y", "1", "1.0"}
+FALSE_FLAGS = {"false", "f", "no", "n", "0", "0.0"}
+# Smallest valid value of each numeric column
+MINIMUMS = {"weight": 1e-9, "height": 1e-9, "age": 0, "caffeine_cups": 0}
+
+def distinct_labels(values):
+    """(codes, labels): each row's index into its distinct values, stripped and lower-cased once each."""
+    codes, uniques = pd.factorize(values.astype(str))
+    return codes, pd.Index(uniques, dtype=object).str.strip().str.lower()
+
+def parse_choices(values, choices):
+    """Labels matched to `choices` ignoring case and spaces, NaN where nothing matches."""
+    canonical = {choice.lower(): choice for choice in choices}
+    codes, labels = distinct_labels(values)
+    return pd.Series(labels.map(canonical).to_numpy(dtype=object)[codes], index=values.index)
+
+def parse_flags(values):
+    """True/False from booleans, 1/0 or yes/no/true/false text, NaN for anything else."""
+    codes, labels = distinct_labels(values)
+    flags = np.full(len(labels), np.nan, dtype=object)
+    flags[labels.isin(TRUE_FLAGS)] = True
+    flags[labels.isin(FALSE_FLAGS)] = False
+    return pd.Series(flags[codes], index=values.index)
+
+def join_problems(invalid):
+    """'; '-joined "invalid <column>" messages for each row of a boolean frame, one column at a time."""
+    messages = np.full(len(invalid), "", dtype=object)
+    for column in invalid.columns:
+        mask = invalid[column].to_numpy()
+        label = f"invalid {column}"
+        messages[mask] = np.where(messages[mask] == "", label, messages[mask] + "; " + label)
+    return messages
+
+def validate_chunk(chunk):
+    """Parse every column in place; returns a per-row error message, empty for valid rows."""
+    invalid = {}
+    for column, minimum in MINIMUMS.items():
+        chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        invalid[column] = ~(chunk[column] >= minimum)
+    for column, choices in CHOICES.items():
+        chunk[column] = parse_choices(chunk[column], choices)
+        invalid[column] = chunk[column].isna()
+    for column in FLAG_COLUMNS:
+        chunk[column] = parse_flags(chunk[column])
+        invalid[column] = chunk[column].isna()
+    invalid = pd.DataFrame(invalid, index=chunk.index)
+    # Messages are only built for the rows that failed a check
+    failing = invalid.any(axis=1).to_numpy()
+    errors = pd.Series("", index=chunk.index, dtype=object)
+    errors[failing] = join_problems(invalid[failing])
+    return errors
+
+def screen_chunk(chunk):
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Roster is missing columns: {', '.join(missing)}")
+    for column, default in DEFAULTS.items():
+        if column not in chunk.columns:
+            chunk[column] = default
+        else:
+            chunk[column] = chunk[column].fillna(default)
+
+    errors = validate_chunk(chunk)
+    results = screen_rows(chunk[errors == ""]).reindex(chunk.index)
+    results["error"] = errors
+    return results
+
+def screen_rows(chunk):
+    weight = chunk["weight"].to_numpy(dtype=float)
+    height = chunk["height"].to_numpy(dtype=float)
+    gender = chunk["gender"].to_numpy()
+
+    bmi = health.bmi(weight, height)
+    bmr = health.mifflin_st_jeor_bmr(weight, height, chunk["age"].to_numpy(dtype=float), gender)
+    calories = health.calorie_target(health.tdee(bmr, chunk["activity_level"].to_numpy()),
+                                     chunk["goal"].to_numpy())
+    protein, carbs, fat = health.macros(weight, calories)
+    water = health.hydration_needs(
+        weight,
+        chunk["exercise_level"].to_numpy(),
+        chunk["climate"].to_numpy(),
+        chunk["pregnant"].to_numpy(dtype=bool),
+        chunk["high_altitude"].to_numpy(dtype=bool),
+        chunk["caffeine_cups"].to_numpy(dtype=float)
+    )
+
+    return pd.DataFrame({
+        "bmi": np.round(bmi, 1),
+        "bmi_category": health.bmi_category(bmi),
+        "ideal_weight": np.round(health.hamwi_ideal_weight(height, gender), 1),
+        "bmr": np.round(bmr),
+        "calories": np.round(calories),
+        "protein_g": np.round(protein, 1),
+        "carbs_g": np.round(carbs, 1),
+        "fat_g": np.round(fat, 1),
+        "water_ml": np.round(water)
+    }, index=chunk.index)
+
+def run_batch(roster_path, output_path, chunksize=50000):
+    """Screen the roster into `output_path`; returns (rows written, rows with an error)."""
+    rows = failed = 0
+    written = False
+    for chunk in pd.read_csv(roster_path, chunksize=chunksize):
+        # The input columns are written back as they were read, not as parsed
+        original = chunk.copy()
+        screened = screen_chunk(chunk)
+        results = pd.concat([original, screened], axis=1)
+        results.to_csv(output_path, mode='a' if written else 'w', header=not written, index=False)
+        written = True
+        rows += len(results)
+        failed += int((screened["error"] != "").sum())
+    if not written:
+        # A header-only roster may yield no chunk; it still gets a file with every column's header
+        header = pd.read_csv(roster_path, nrows=0)
+        pd.concat([header, screen_chunk(header.copy())], axis=1).to_csv(output_path, index=False)
+    return rows, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a roster CSV with the health calculators")
+    parser.add_argument("roster", help="input CSV with weight, height, age and gender columns")
+    parser.add_argument("output", help="CSV file to write results to")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows per chunk")
+    args = parser.parse_args(argv)
+    rows, failed = run_batch(args.roster, args.output, args.chunksize)
+    print(f"Screened {rows} people into {args.output}")
+    if failed:
+        print(f"{failed} rows had invalid values; see the error column")
+
+if __name__ == "__main__":
+    main()
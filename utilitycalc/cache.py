@@ -0,0 +1,290 @@
+"""Result cache for calculator functions, keyed by a hash of their inputs.
+
+Decorate a function with ``@cached()`` and calls with the same arguments
+return a stored result instead of recomputing it. Keys are a SHA-256 of
+the function's identity, its version and a canonical encoding of the
+arguments, so equal NumPy arrays, dicts in any key order and repeated
+reruns all land on the same entry. Bump ``version`` when a formula
+changes (or CACHE_VERSION to drop everything) and old entries are never
+read again.
+
+Results are stored pickled, so every hit returns a fresh copy that the
+caller is free to modify. The in-process tier is an LRU capped by total
+size. Setting UTILITYCALC_CACHE_DIR adds a disk tier in that directory
+that every server process shares; entries are written atomically, so a
+process reads either a whole entry or none. Disk entries are signed with
+an HMAC and only unpickled when the signature matches, so a file planted
+in the directory is ignored rather than run. The key is
+UTILITYCALC_CACHE_KEY, or a private key file created in the user's home
+directory that all of that user's processes share.
+"""
+import datetime
+import functools
+import hashlib
+import hmac
+import inspect
+import logging
+import math
+import os
+import pickle
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from utilitycalc.storage import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Part of every key; bump to invalidate every cached result at once
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+DEFAULT_DISK_MAX_BYTES = 512 * 2 ** 20
+# Disk usage is checked after this many writes rather than on every one
+DISK_PRUNE_INTERVAL = 100
+KEY_FILE = os.path.join(os.path.expanduser("~"), ".utilitycalc", "cache.key")
+# A disk entry is an HMAC-SHA256 of the rest, the expiry time (NaN for none) and the pickled result
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+EXPIRY = struct.Struct('<d')
+
+def _update(hasher, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, complex)):
+        token = f"{type(value).__name__}:{value!r}".encode()
+    elif isinstance(value, str):
+        token = b"str:" + value.encode('utf-8')
+    elif isinstance(value, bytes):
+        token = b"bytes:" + value
+    elif isinstance(value, (datetime.date, datetime.time)):
+        token = f"{type(value).__name__}:{value.isoformat()}".encode()
+    elif isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return _update(hasher, ("ndarray", value.shape, value.tolist()))
+        token = f"ndarray:{value.dtype.str}:{value.shape}:".encode() + np.ascontiguousarray(value).tobytes()
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}[{len(value)}]".encode())
+        for item in value:
+            _update(hasher, item)
+        return
+    elif isinstance(value, dict):
+        hasher.update(f"dict[{len(value)}]".encode())
+        for key, item in sorted((canonical_hash(k), (k, v)) for k, v in value.items()):
+            hasher.update(key.encode())
+            _update(hasher, item[1])
+        return
+    elif isinstance(value, (set, frozenset)):
+        hasher.update(f"set[{len(value)}]".encode())
+        for key in sorted(canonical_hash(item) for item in value):
+            hasher.update(key.encode())
+        return
+    else:
+        raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+    # Length-prefix every token so adjacent values cannot run together
+    hasher.update(struct.pack('<Q', len(token)) + token)
+
+def canonical_hash(value):
+    """Hex SHA-256 of a value built from JSON-like types, NumPy arrays and dates."""
+    hasher = hashlib.sha256()
+    _update(hasher, value)
+    return hasher.hexdigest()
+
+def cache_key(path=KEY_FILE):
+    """Secret for signing disk entries, from UTILITYCALC_CACHE_KEY or a 0600 key file created on first use."""
+    secret = os.environ.get("UTILITYCALC_CACHE_KEY")
+    if secret:
+        return secret.encode('utf-8')
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'rb') as f:
+            return f.read()
+    secret = os.urandom(32)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+    return secret
+
+def sign(name, body, secret=None):
+    """`body` prefixed with an HMAC-SHA256 of `name` and `body`, under the cache key unless `secret` is given.
+
+    The name is signed too, so a valid blob cannot be passed off under another name.
+    """
+    return hmac.new(secret or cache_key(), name.encode() + body, hashlib.sha256).digest() + body
+
+def verify(name, signed, secret=None):
+    """The body of a `sign` result for `name`, or None if its signature does not match."""
+    signature, body = signed[:SIGNATURE_SIZE], signed[SIGNATURE_SIZE:]
+    if not hmac.compare_digest(signature, sign(name, body, secret)[:SIGNATURE_SIZE]):
+        return None
+    return body
+
+class ResultCache:
+    """Size-bounded in-memory LRU of pickled results, with an optional shared disk tier."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, disk_max_bytes=DEFAULT_DISK_MAX_BYTES,
+                 secret=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.secret = secret or (cache_key() if directory else None)
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()  # key: (expires_at or None, pickled result)
+        self._bytes = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _read_disk(self, key):
+        """(expires_at, pickled result) of a disk entry with a valid signature, else None."""
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        body = verify(key, raw, self.secret)
+        if body is None or len(body) < EXPIRY.size:
+            logger.warning("Ignoring cache entry %s with a bad signature", key)
+            return None
+        expires_at, = EXPIRY.unpack_from(body)
+        return (None if math.isnan(expires_at) else expires_at), body[EXPIRY.size:]
+
+    def _write_disk(self, key, expires_at, data):
+        body = EXPIRY.pack(math.nan if expires_at is None else expires_at) + data
+        entry = sign(key, body, self.secret)
+        try:
+            atomic_write(self._disk_path(key), lambda f: f.write(entry))
+        except OSError:
+            logger.warning("Could not write cache entry %s to disk", key, exc_info=True)
+            return
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self.prune_disk()
+
+    def get(self, key):
+        """(True, result) for a live entry, else (False, None)."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, pickle.loads(entry[1])
+        if self.directory:
+            entry = self._read_disk(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at is None or expires_at > now:
+                    self._remember(key, expires_at, data)
+                    with self._lock:
+                        self.hits += 1
+                    return True, pickle.loads(data)
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key, result, ttl=None):
+        """Store `result`; False if it cannot be pickled, in which case nothing is cached."""
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._remember(key, expires_at, data)
+        if self.directory:
+            self._write_disk(key, expires_at, data)
+        return True
+
+    def _remember(self, key, expires_at, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (expires_at, data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def prune_disk(self):
+        """Delete the least recently written disk entries until the tier fits its limit."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another process pruned it first
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+@lru_cache(maxsize=None)
+def default_cache():
+    """The process-wide cache, with the disk tier if UTILITYCALC_CACHE_DIR is set."""
+    return ResultCache(directory=os.environ.get("UTILITYCALC_CACHE_DIR") or None)
+
+def cached(version=1, ttl=None, cache=None, key=None):
+    """Memoize a function on its arguments in `cache` (the default cache if None).
+
+    Results live for `ttl` seconds, or until evicted if None. Arguments are
+    bound to the signature with defaults filled in, so passing a value by
+    position, by keyword or not at all gives the same key. `key`, called
+    with the bound arguments, returns what to hash in their place, so a
+    large argument can be stood in for by a version or hash it already
+    carries. Calls whose arguments cannot be hashed canonically, or whose
+    results cannot be pickled, run uncached. Exceptions are never cached.
+
+    A function is identified by its module and qualified name, which stay
+    the same across checkouts and processes; decorate functions in the
+    utilitycalc modules, not in pages, which all run as __main__.
+    """
+    def decorator(func):
+        identity = (func.__module__, func.__qualname__, version, CACHE_VERSION)
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = cache or default_cache()
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                inputs = key(*bound.args, **bound.kwargs) if key else (bound.args, sorted(bound.kwargs.items()))
+                digest = canonical_hash((identity, inputs))
+            except TypeError:
+                return func(*args, **kwargs)
+            hit, result = store.get(digest)
+            if hit:
+                return result
+            result = func(*args, **kwargs)
+            store.set(digest, result, ttl)
+            return result
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
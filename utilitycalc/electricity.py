@@ -0,0 +1,112 @@
+"""Appliance consumption, billing and load-profile simulation for the electricity calculator."""
+import numpy as np
+
+from utilitycalc.cache import cached
+from utilitycalc.storage import get_store
+
+def load_appliance_data(storage=None):
+    return (storage or get_store()).load("appliance_usage", [])
+
+def add_appliance(appliances, appliance, storage=None):
+    appliances.append(appliance)
+    (storage or get_store()).append("appliance_usage", appliance)
+
+# Common household appliances and their typical power consumption
+COMMON_APPLIANCES = {
+    "Air Conditioner": 1500,
+    "Refrigerator": 150,
+    "Washing Machine": 500,
+    "Television": 100,
+    "Microwave": 1000,
+    "Electric Fan": 75,
+    "LED Light Bulb": 10,
+    "Desktop Computer": 200,
+    "Laptop": 60,
+    "Water Heater": 2000,
+    "Iron": 1000,
+    "Dishwasher": 1500,
+    "Electric Kettle": 1500,
+    "Ceiling Fan": 75,
+    "Router/Modem": 10
+}
+
+def calculate_daily_consumption(appliances):
+    total_kwh = 0
+    for appliance in appliances:
+        hours = appliance['hours']
+        watts = appliance['watts']
+        quantity = appliance['quantity']
+        total_kwh += (watts * hours * quantity) / 1000
+    return total_kwh
+
+def calculate_bill(total_kwh, rate):
+    return total_kwh * rate
+
+# Thermostat-driven appliances cycle on and off instead of drawing their
+# rated power for the whole usage window. duty is the average fraction of
+# time the compressor/element is on, cycle_minutes the length of one on/off
+# cycle and always_on marks appliances that stay plugged in all day.
+DUTY_CYCLE_MODELS = {
+    "Refrigerator": {"duty": 0.35, "duty_spread": 0.08, "cycle_minutes": 40, "always_on": True},
+    "Air Conditioner": {"duty": 0.65, "duty_spread": 0.15, "cycle_minutes": 30, "always_on": False},
+    "Water Heater": {"duty": 0.30, "duty_spread": 0.10, "cycle_minutes": 20, "always_on": False}
+}
+
+# Typical start of the daily usage window (hour of day) used when sampling
+USAGE_START_HOURS = {
+    "Air Conditioner": 18,
+    "Water Heater": 6,
+    "LED Light Bulb": 18,
+    "Television": 19,
+    "Microwave": 12,
+    "Electric Kettle": 7,
+    "Iron": 8
+}
+
+def simulate_load_profiles(appliances, days=1000, slot_minutes=15, seed=None):
+    """Sample per-slot household demand in watts, shape (days, slots)."""
+    rng = np.random.default_rng(seed)
+    slots = 24 * 60 // slot_minutes
+    minutes = np.arange(slots) * slot_minutes
+    profiles = np.zeros((days, slots))
+
+    for appliance in appliances:
+        units = int(appliance['quantity'])
+        shape = (days, units, 1)
+        model = DUTY_CYCLE_MODELS.get(appliance['name'])
+
+        # Place each unit's usage window around its typical start time
+        if model and model['always_on']:
+            active = np.ones((days, units, slots), dtype=bool)
+        else:
+            start_hour = USAGE_START_HOURS.get(appliance['name'], 8)
+            start = rng.normal(start_hour * 60, 90, size=shape) % (24 * 60)
+            active = ((minutes - start) % (24 * 60)) < appliance['hours'] * 60
+
+        # Thermostat cycling with a random phase, period and duty per unit-day
+        if model:
+            period = model['cycle_minutes'] * rng.uniform(0.8, 1.2, size=shape)
+            phase = rng.uniform(0, 1, size=shape) * period
+            duty = np.clip(rng.normal(model['duty'], model['duty_spread'], size=shape), 0.05, 1.0)
+            active &= ((minutes + phase) % period) < duty * period
+
+        profiles += active.sum(axis=1) * appliance['watts']
+
+    return profiles
+
+def summarize_peak_demand(profiles, slot_minutes=15):
+    daily_peaks = profiles.max(axis=1) / 1000
+    daily_kwh = profiles.sum(axis=1) * slot_minutes / 60 / 1000
+    return {
+        "daily_peaks": daily_peaks,
+        "peak_p50": float(np.percentile(daily_peaks, 50)),
+        "peak_p95": float(np.percentile(daily_peaks, 95)),
+        "peak_p99": float(np.percentile(daily_peaks, 99)),
+        "peak_max": float(daily_peaks.max()),
+        "mean_daily_kwh": float(daily_kwh.mean())
+    }
+
+@cached()
+def simulate_peak_demand(appliances, days=1000, slot_minutes=15, seed=0):
+    """Peak demand summary of a seeded simulation, cached so reruns and other users reuse it."""
+    return summarize_peak_demand(simulate_load_profiles(appliances, days, slot_minutes, seed), slot_minutes)
@@ -0,0 +1,140 @@
+"""Loan, investment, mortgage, salary tax and expense formulas for the finance pages.
+
+Rates are annual percentages, as entered on the pages. Every formula
+accepts scalars or NumPy arrays, and schedules are built in closed form
+rather than by stepping month by month.
+"""
+import numpy as np
+from numpy.typing import ArrayLike
+
+from utilitycalc.storage import get_store
+
+# (lower bound of slab, rate) for Indian income tax, before the 4% cess
+OLD_REGIME_SLABS = [(250000, 0.05), (500000, 0.10), (750000, 0.15), (1000000, 0.20),
+                    (1250000, 0.25), (1500000, 0.30)]
+NEW_REGIME_SLABS = [(300000, 0.05), (600000, 0.10), (900000, 0.15), (1200000, 0.20),
+                    (1500000, 0.30)]
+TAX_SLABS = {"Old Regime": OLD_REGIME_SLABS, "New Regime": NEW_REGIME_SLABS}
+CESS_RATE = 0.04
+SECTION_80C_LIMIT = 150000
+
+def monthly_rate(annual_rate: ArrayLike) -> np.ndarray:
+    return np.asarray(annual_rate, dtype=float) / (12 * 100)
+
+def annuity_factor(annual_rate: ArrayLike, months: ArrayLike) -> np.ndarray:
+    """Value today of 1 paid at the end of each month; just the month count at 0%."""
+    rate = monthly_rate(annual_rate)
+    months = np.asarray(months, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = (1 - (1 + rate) ** -months) / rate
+    return np.where(rate == 0, months, factor)
+
+def emi(principal: ArrayLike, annual_rate: ArrayLike, years: ArrayLike) -> np.ndarray:
+    """Monthly instalment that pays off `principal` over `years`."""
+    return np.asarray(principal, dtype=float) / annuity_factor(annual_rate, np.asarray(years) * 12)
+
+def amortization_schedule(principal: float, annual_rate: float, years: int) -> dict:
+    """Monthly arrays of month number, principal paid, interest paid and balance left."""
+    rate = float(monthly_rate(annual_rate))
+    payment = float(emi(principal, annual_rate, years))
+    month = np.arange(1, int(years * 12) + 1)
+    if rate == 0:
+        balance = principal - payment * month
+    else:
+        growth = (1 + rate) ** month
+        balance = principal * growth - payment * (growth - 1) / rate
+    interest = np.concatenate([[principal], balance[:-1]]) * rate
+    return {"month": month, "principal": payment - interest, "interest": interest, "balance": balance}
+
+def yearly_amortization(principal: float, annual_rate: float, years: int) -> dict:
+    """The monthly schedule summed per year, with the balance at each year end."""
+    schedule = amortization_schedule(principal, annual_rate, years)
+    return {
+        "year": np.arange(1, years + 1),
+        "principal": schedule["principal"].reshape(years, 12).sum(axis=1),
+        "interest": schedule["interest"].reshape(years, 12).sum(axis=1),
+        "balance": schedule["balance"][11::12]
+    }
+
+def future_value(initial: ArrayLike, monthly_contribution: ArrayLike, annual_return: ArrayLike,
+                 years: ArrayLike) -> np.ndarray:
+    """Compound growth of a lump sum plus end-of-month contributions."""
+    rate = monthly_rate(annual_return)
+    months = np.asarray(years, dtype=float) * 12
+    growth = (1 + rate) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contributions = np.where(rate == 0, months, (growth - 1) / rate)
+    return np.asarray(initial, dtype=float) * growth + np.asarray(monthly_contribution) * contributions
+
+def affordability(monthly_income: ArrayLike, other_debts: ArrayLike = 0, down_payment: ArrayLike = 0,
+                  annual_rate: ArrayLike = 8.0, years: ArrayLike = 20):
+    """(max home price, max loan, max monthly payment) under the 28/36 rule."""
+    monthly_income = np.asarray(monthly_income, dtype=float)
+    max_payment = np.minimum(monthly_income * 0.28, monthly_income * 0.36 - np.asarray(other_debts))
+    max_loan = max_payment * annuity_factor(annual_rate, np.asarray(years) * 12)
+    return max_loan + down_payment, max_loan, max_payment
+
+def rent_vs_buy(home_price: float, down_payment: float, monthly_rent: float, annual_rate: float,
+                loan_years: int, home_appreciation: float, rent_increase: float,
+                property_tax_rate: float, maintenance_percent: float, analysis_years: int) -> dict:
+    """Yearly buying and renting costs, home values and the first year renting costs more in total.
+
+    Property tax and maintenance are charged on the home's value at the start
+    of each year; rent rises at the end of each year.
+    """
+    year = np.arange(analysis_years)
+    start_values = home_price * (1 + home_appreciation / 100) ** year
+    mortgage = float(emi(home_price - down_payment, annual_rate, loan_years)) * 12
+    buy_costs = mortgage + start_values * (property_tax_rate + maintenance_percent) / 100
+    rent_costs = monthly_rent * 12 * (1 + rent_increase / 100) ** year
+    ahead = np.flatnonzero(np.cumsum(rent_costs) > np.cumsum(buy_costs))
+    return {
+        "year": year + 1,
+        "buy_costs": buy_costs,
+        "rent_costs": rent_costs,
+        "home_values": start_values * (1 + home_appreciation / 100),
+        "break_even_year": int(ahead[0]) + 1 if len(ahead) else None
+    }
+
+def income_tax(taxable_income: ArrayLike, regime: str = "New Regime") -> np.ndarray:
+    """Slab tax before cess: each slab's rate applies to the income inside it."""
+    lower, rates = np.array(TAX_SLABS[regime]).T
+    upper = np.append(lower[1:], np.inf)
+    income = np.asarray(taxable_income, dtype=float)[..., None]
+    return (np.clip(income - lower, 0, upper - lower) * rates).sum(axis=-1)
+
+def old_regime_deductions(epf: float = 0, insurance: float = 0, elss: float = 0,
+                          medical_insurance: float = 0, home_loan_interest: float = 0) -> float:
+    """80C investments up to their limit, plus 80D and home loan interest."""
+    return min(epf + insurance + elss, SECTION_80C_LIMIT) + medical_insurance + home_loan_interest
+
+def salary_breakdown(annual_salary: ArrayLike, deductions: ArrayLike = 0, regime: str = "New Regime") -> dict:
+    """Taxable income, tax, cess, total tax and annual and monthly take-home pay."""
+    annual_salary = np.asarray(annual_salary, dtype=float)
+    taxable_income = annual_salary - deductions
+    tax = income_tax(taxable_income, regime)
+    cess = tax * CESS_RATE
+    total_tax = tax + cess
+    return {
+        "taxable_income": taxable_income,
+        "tax": tax,
+        "cess": cess,
+        "total_tax": total_tax,
+        "annual_take_home": annual_salary - total_tax,
+        "monthly_take_home": (annual_salary - total_tax) / 12
+    }
+
+def load_expenses(storage=None):
+    return (storage or get_store()).load("expenses", [])
+
+def add_expense(expenses, expense, storage=None):
+    """Record one expense in memory and append it to storage."""
+    expenses.append(expense)
+    (storage or get_store()).append("expenses", expense)
+
+def category_totals(amounts: ArrayLike, categories: ArrayLike, category_names: list) -> np.ndarray:
+    """Spend per name in `category_names`, in that order; unknown categories are ignored."""
+    positions = {name: i for i, name in enumerate(category_names)}
+    codes = np.array([positions.get(c, len(category_names)) for c in categories], dtype=int)
+    return np.bincount(codes, weights=np.asarray(amounts, dtype=float),
+                       minlength=len(category_names) + 1)[:len(category_names)]
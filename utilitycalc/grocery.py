@@ -0,0 +1,584 @@
+"""Units, catalog, meal index, pantry, spend cube and basket optimizer for the grocery planner."""
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+from utilitycalc.storage import get_store
+
+# Each collection is an append-only record list and the pantry is kept as
+# its add/use/discard events, so an action writes one record; the spend
+# cube is a small document of its own.
+GROCERY_RECORDS = {"items": "grocery_items", "meals": "grocery_meals",
+                   "shopping_lists": "grocery_shopping_lists", "custom_items": "grocery_custom_items",
+                   "pantry_events": "grocery_pantry"}
+SPEND_CUBE = "grocery_spend_cube"
+LEGACY_GROCERY_DATA = "grocery_data"
+
+def migrate_grocery_data(storage):
+    # Split the old whole-file document once; saves make a repeat harmless
+    legacy = storage.load(LEGACY_GROCERY_DATA)
+    if not legacy or legacy.get("migrated"):
+        return
+    legacy["pantry_events"] = [{"add": entry} for entry in legacy.get("pantry", [])]
+    with storage.batch():
+        for kind, name in GROCERY_RECORDS.items():
+            storage.save(name, legacy.get(kind, []))
+        if "spend_cube" in legacy:
+            storage.save(SPEND_CUBE, legacy["spend_cube"])
+        storage.save(LEGACY_GROCERY_DATA, {"migrated": True})
+
+def load_grocery_data(storage=None):
+    storage = storage or get_store()
+    migrate_grocery_data(storage)
+    data = {kind: storage.load(name, []) for kind, name in GROCERY_RECORDS.items()}
+    data["spend_cube"] = storage.load(SPEND_CUBE)
+    return data
+
+def add_grocery_record(data, kind, record, storage=None):
+    data[kind].append(record)
+    (storage or get_store()).append(GROCERY_RECORDS[kind], record)
+
+def add_purchase(data, record, storage=None):
+    """Append a purchase and save the spend cube it updates."""
+    storage = storage or get_store()
+    cube = load_spend_cube(data)
+    with storage.batch():
+        add_grocery_record(data, "items", record, storage)
+        add_to_spend_cube(cube, record)
+        storage.save(SPEND_CUBE, cube)
+    return cube
+
+def recent_purchases(data, n=10):
+    return heapq.nlargest(n, data["items"], key=lambda record: record["date"])
+
+# Common grocery categories and items
+GROCERY_CATEGORIES = {
+    "Fruits & Vegetables": [
+        "Apples", "Bananas", "Oranges", "Tomatoes", "Potatoes", "Onions", "Carrots"
+    ],
+    "Dairy & Eggs": [
+        "Milk", "Cheese", "Yogurt", "Butter", "Eggs"
+    ],
+    "Grains & Cereals": [
+        "Rice", "Wheat Flour", "Bread", "Pasta", "Oats"
+    ],
+    "Protein": [
+        "Chicken", "Fish", "Tofu", "Lentils", "Beans"
+    ],
+    "Pantry Items": [
+        "Oil", "Sugar", "Salt", "Spices", "Tea", "Coffee"
+    ]
+}
+
+# Units are normalized to a base unit per dimension with precomputed factors
+UNIT_CONVERSIONS = {
+    "g": ("g", 1.0),
+    "kg": ("g", 1000.0),
+    "ml": ("ml", 1.0),
+    "l": ("ml", 1000.0),
+    "cups": ("ml", 240.0),
+    "pieces": ("pieces", 1.0)
+}
+UNITS = list(UNIT_CONVERSIONS)
+BASE_UNITS = ["g", "ml", "pieces"]
+UNIT_INDEX = {unit: i for i, unit in enumerate(UNITS)}
+UNIT_FACTORS = np.array([UNIT_CONVERSIONS[unit][1] for unit in UNITS])
+UNIT_BASES = np.array([BASE_UNITS.index(UNIT_CONVERSIONS[unit][0]) for unit in UNITS])
+
+def normalize_quantities(units, amounts):
+    """Return (base unit indices, amounts in base units) for parallel arrays."""
+    unit_ids = np.array([UNIT_INDEX[unit] for unit in units], dtype=int)
+    return UNIT_BASES[unit_ids], np.asarray(amounts, dtype=float) * UNIT_FACTORS[unit_ids]
+
+def base_amount(quantity, unit="pieces"):
+    """(base unit, quantity in it) for a quantity in any of UNITS."""
+    base, factor = UNIT_CONVERSIONS[unit]
+    return base, quantity * factor
+
+def format_amounts(amounts):
+    parts = []
+    for unit, amount in amounts.items():
+        if unit == "g" and amount >= 1000:
+            parts.append(f"{amount / 1000:.2f} kg")
+        elif unit == "ml" and amount >= 1000:
+            parts.append(f"{amount / 1000:.2f} l")
+        else:
+            parts.append(f"{amount:.0f} {unit}")
+    return ", ".join(parts)
+
+# Grocery catalog: every item gets an interned integer ID, a reverse lookup
+# to its category and a slot in the pre-flattened option list used by the
+# widgets. User-added items are appended, never re-flattened.
+def new_grocery_catalog(categories):
+    catalog = {"categories": {}, "category_of": {}, "ids": {}, "items": []}
+    for category, items in categories.items():
+        for item in items:
+            add_catalog_item(catalog, item, category)
+    return catalog
+
+def add_catalog_item(catalog, item, category="Other"):
+    if item not in catalog["ids"]:
+        catalog["ids"][item] = len(catalog["items"])
+        catalog["items"].append(item)
+        catalog["category_of"][item] = category
+        catalog["categories"].setdefault(category, []).append(item)
+    return catalog["ids"][item]
+
+def copy_catalog(catalog):
+    return {
+        "categories": {category: list(items) for category, items in catalog["categories"].items()},
+        "category_of": dict(catalog["category_of"]),
+        "ids": dict(catalog["ids"]),
+        "items": list(catalog["items"])
+    }
+
+def session_catalog(custom_items):
+    catalog = copy_catalog(GROCERY_CATALOG)
+    for custom in custom_items:
+        add_catalog_item(catalog, custom["item"], custom["category"])
+    return catalog
+
+def group_by_category(catalog, shopping_items):
+    grouped = {category: [] for category in catalog["categories"]}
+    for entry in shopping_items:
+        grouped.setdefault(catalog["category_of"].get(entry["item"], "Other"), []).append(entry)
+    return {category: entries for category, entries in grouped.items() if entries}
+
+GROCERY_CATALOG = new_grocery_catalog(GROCERY_CATEGORIES)
+
+# Meals indexed by date: a sorted list of planned dates for bisect range
+# lookups and, per date, an ingredient count vector and a quantity matrix
+# (catalog ID x base unit), so a shopping list only touches the days it covers.
+def new_meal_index(catalog):
+    return {"dates": [], "meals_by_date": {}, "counts_by_date": {}, "amounts_by_date": {},
+            "meals_by_ingredient": {}, "catalog": catalog}
+
+def pad_rows(array, rows):
+    if len(array) < rows:
+        padding = [(0, rows - len(array))] + [(0, 0)] * (array.ndim - 1)
+        array = np.pad(array, padding)
+    return array
+
+def add_meal_to_index(index, meal):
+    date = meal["date"]
+    if date not in index["meals_by_date"]:
+        insort(index["dates"], date)
+        index["meals_by_date"][date] = []
+        index["counts_by_date"][date] = np.zeros(0, dtype=int)
+        index["amounts_by_date"][date] = np.zeros((0, len(BASE_UNITS)))
+    index["meals_by_date"][date].append(meal)
+    if meal.get("name"):
+        for ingredient in meal["ingredients"]:
+            index["meals_by_ingredient"].setdefault(ingredient, {})[meal["name"]] = meal
+
+    catalog = index["catalog"]
+    ids = [add_catalog_item(catalog, ingredient) for ingredient in meal["ingredients"]]
+    quantities = meal.get("quantities", [])
+    quantity_ids = [add_catalog_item(catalog, q["item"]) for q in quantities]
+
+    counts = pad_rows(index["counts_by_date"][date], len(catalog["items"]))
+    np.add.at(counts, ids, 1)
+    index["counts_by_date"][date] = counts
+
+    # Quantities are stored per serving and scaled when the meal is indexed
+    amounts = pad_rows(index["amounts_by_date"][date], len(catalog["items"]))
+    if quantities:
+        bases, base_amounts = normalize_quantities(
+            [q["unit"] for q in quantities],
+            [q["amount"] for q in quantities]
+        )
+        np.add.at(amounts, (quantity_ids, bases), base_amounts * meal.get("servings", 1))
+    index["amounts_by_date"][date] = amounts
+    return index
+
+def build_meal_index(meals, catalog):
+    index = new_meal_index(catalog)
+    for meal in meals:
+        add_meal_to_index(index, meal)
+    return index
+
+def dates_between(index, start_date, end_date):
+    lo = bisect_left(index["dates"], start_date)
+    hi = bisect_right(index["dates"], end_date)
+    return index["dates"][lo:hi]
+
+def ingredient_counts_between(index, start_date, end_date):
+    items = index["catalog"]["items"]
+    total = np.zeros(len(items), dtype=int)
+    for date in dates_between(index, start_date, end_date):
+        counts = index["counts_by_date"][date]
+        total[:len(counts)] += counts
+    order = np.argsort(-total, kind="stable")
+    return [(items[i], int(total[i])) for i in order if total[i] > 0]
+
+def ingredient_amounts_between(index, start_date, end_date):
+    items = index["catalog"]["items"]
+    total = np.zeros((len(items), len(BASE_UNITS)))
+    for date in dates_between(index, start_date, end_date):
+        amounts = index["amounts_by_date"][date]
+        total[:len(amounts)] += amounts
+    return {
+        items[i]: {BASE_UNITS[u]: float(total[i, u]) for u in np.flatnonzero(total[i])}
+        for i in np.flatnonzero(total.any(axis=1))
+    }
+
+# Pantry stock ordered by expiry. A global heap answers "what expires next"
+# and a heap per item and base unit consumes the oldest stock first; both
+# use lazy deletion, so adds, uses and expiry queries stay logarithmic.
+# Entries keep the quantity and unit they were bought in (pieces if none),
+# and on_hand totals each item per base unit so stock can be compared with
+# the meal plan's ingredient amounts.
+STOCK_TOLERANCE = 1e-9
+
+def new_pantry():
+    return {"entries": {}, "heap": [], "by_item": {}, "on_hand": {}, "next_id": 0}
+
+def add_pantry_entry(pantry, entry):
+    entry = dict(entry)
+    entry.setdefault("unit", "pieces")
+    entry.setdefault("id", pantry["next_id"])
+    pantry["next_id"] = max(pantry["next_id"], entry["id"] + 1)
+    pantry["entries"][entry["id"]] = entry
+    base, amount = base_amount(entry["quantity"], entry["unit"])
+    heapq.heappush(pantry["heap"], (entry["expiry"], entry["id"]))
+    heapq.heappush(pantry["by_item"].setdefault((entry["item"], base), []), (entry["expiry"], entry["id"]))
+    stock = pantry["on_hand"].setdefault(entry["item"], {})
+    stock[base] = stock.get(base, 0) + amount
+    return entry
+
+def build_pantry(entries):
+    pantry = new_pantry()
+    for entry in entries:
+        add_pantry_entry(pantry, entry)
+    return pantry
+
+def apply_pantry_event(pantry, event):
+    if "add" in event:
+        return add_pantry_entry(pantry, event["add"])
+    if "use" in event:
+        return consume_pantry_item(pantry, event["use"], event["quantity"], event["unit"])
+    return discard_expired(pantry, event["discard"])
+
+def replay_pantry(events):
+    pantry = new_pantry()
+    for event in events:
+        apply_pantry_event(pantry, event)
+    return pantry
+
+def record_pantry_event(data, pantry, event, storage=None):
+    """Apply an add/use/discard event to the pantry and append it to the event log."""
+    result = apply_pantry_event(pantry, event)
+    if "add" in event:
+        # Log the entry with its assigned id, before any later partial use changes it
+        event = {"add": dict(result)}
+    add_grocery_record(data, "pantry_events", event, storage)
+    return result
+
+def take_stock(pantry, item, base, amount):
+    stock = pantry["on_hand"][item]
+    stock[base] -= amount
+    if stock[base] <= STOCK_TOLERANCE:
+        del stock[base]
+        if not stock:
+            del pantry["on_hand"][item]
+
+def remove_pantry_entry(pantry, entry_id):
+    entry = pantry["entries"].pop(entry_id)
+    take_stock(pantry, entry["item"], *base_amount(entry["quantity"], entry["unit"]))
+    return entry
+
+def prune_heap(pantry, heap):
+    # Drop heap tops whose entry has already been used up or discarded
+    while heap and heap[0][1] not in pantry["entries"]:
+        heapq.heappop(heap)
+
+def consume_pantry_item(pantry, item, quantity, unit="pieces"):
+    """Use up to `quantity` of an item, oldest expiry first; returns the amount used in `unit`."""
+    base, needed = base_amount(quantity, unit)
+    consumed = 0.0
+    heap = pantry["by_item"].get((item, base), [])
+    while needed > STOCK_TOLERANCE and heap:
+        prune_heap(pantry, heap)
+        if not heap:
+            break
+        entry = pantry["entries"][heap[0][1]]
+        factor = UNIT_CONVERSIONS[entry["unit"]][1]
+        available = entry["quantity"] * factor
+        used = min(needed, available)
+        consumed += used
+        needed -= used
+        if used >= available - STOCK_TOLERANCE:
+            heapq.heappop(heap)
+            remove_pantry_entry(pantry, entry["id"])
+        else:
+            entry["quantity"] -= used / factor
+            take_stock(pantry, item, base, used)
+    return consumed / UNIT_CONVERSIONS[unit][1]
+
+def discard_expired(pantry, today):
+    wasted = []
+    heap = pantry["heap"]
+    prune_heap(pantry, heap)
+    while heap and heap[0][0] < today:
+        _, entry_id = heapq.heappop(heap)
+        wasted.append(remove_pantry_entry(pantry, entry_id))
+        prune_heap(pantry, heap)
+    return wasted
+
+def expiring_within(pantry, cutoff):
+    # Walk only the heap nodes at or before the cutoff; their parents are
+    # never later, so everything else is skipped without a full scan
+    heap, found, stack = pantry["heap"], [], [0] if pantry["heap"] else []
+    while stack:
+        i = stack.pop()
+        expiry, entry_id = heap[i]
+        if expiry > cutoff:
+            continue
+        if entry_id in pantry["entries"]:
+            found.append(pantry["entries"][entry_id])
+        stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+    return sorted(found, key=lambda entry: (entry["expiry"], entry["id"]))
+
+def pantry_entries(pantry):
+    return list(pantry["entries"].values())
+
+def subtract_on_hand(shopping_items, on_hand):
+    """Shopping entries still needed after pantry stock, compared in base units.
+
+    Each base-unit amount of an entry is reduced by the stock in that unit;
+    entries without amounts need `quantity` pieces. An entry is dropped only
+    when nothing is left to buy.
+    """
+    remaining = []
+    for entry in shopping_items:
+        stock = on_hand.get(entry["item"], {})
+        if entry.get("amounts"):
+            amounts = {base: amount - stock.get(base, 0) for base, amount in entry["amounts"].items()}
+            amounts = {base: amount for base, amount in amounts.items() if amount > STOCK_TOLERANCE}
+            if amounts:
+                remaining.append(dict(entry, amounts=amounts))
+        else:
+            needed = entry["quantity"] - stock.get("pieces", 0)
+            if needed > STOCK_TOLERANCE:
+                remaining.append(dict(entry, quantity=needed))
+    return remaining
+
+def suggest_meals(meal_index, expiring_items):
+    # Rank known meals by how many of the expiring items they use up
+    scores, meals = {}, {}
+    for item in expiring_items:
+        for name, meal in meal_index["meals_by_ingredient"].get(item, {}).items():
+            scores[name] = scores.get(name, 0) + 1
+            meals[name] = meal
+    ranked = sorted(scores, key=lambda name: (-scores[name], name))
+    return [(meals[name], scores[name]) for name in ranked]
+
+# Spend cube (month x category x item) with rollups per axis, saved as its
+# own document and updated on every purchase so the analysis never regroups
+# the raw item history.
+def new_spend_cube():
+    return {"count": 0, "total": 0.0, "cells": {}, "by_month": {}, "by_category": {}, "by_item": {}}
+
+def add_to_spend_cube(cube, record):
+    month = record["date"][:7]
+    price = record["price"]
+    items = cube["cells"].setdefault(month, {}).setdefault(record["category"], {})
+    items[record["item"]] = items.get(record["item"], 0.0) + price
+    for rollup, key in (("by_month", month), ("by_category", record["category"]), ("by_item", record["item"])):
+        cube[rollup][key] = cube[rollup].get(key, 0.0) + price
+    cube["total"] += price
+    cube["count"] += 1
+    return cube
+
+def build_spend_cube(records):
+    cube = new_spend_cube()
+    for record in records:
+        add_to_spend_cube(cube, record)
+    return cube
+
+def load_spend_cube(data):
+    cube = data.get("spend_cube")
+    if cube is None or cube.get("count") != len(data["items"]):
+        # Missing or out of sync with the purchase records, rebuild once
+        cube = build_spend_cube(data["items"])
+        data["spend_cube"] = cube
+    return cube
+
+def monthly_spending(cube):
+    # Every calendar month between the first and last purchase, gaps as zero
+    if not cube["by_month"]:
+        return [], []
+    first, last = min(cube["by_month"]), max(cube["by_month"])
+    year, month = int(first[:4]), int(first[5:7])
+    months = []
+    while f"{year:04d}-{month:02d}" <= last:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months, [cube["by_month"].get(m, 0.0) for m in months]
+
+def top_spend_items(cube, n=5):
+    return heapq.nlargest(n, cube["by_item"].items(), key=lambda entry: entry[1])
+
+# Items that can stand in for each other when building the cheapest basket
+SUBSTITUTION_GROUPS = [
+    ["Chicken", "Fish", "Tofu"],
+    ["Lentils", "Beans"],
+    ["Rice", "Pasta"],
+    ["Apples", "Bananas", "Oranges"],
+    ["Tea", "Coffee"]
+]
+SUBSTITUTES = {item: group for group in SUBSTITUTION_GROUPS for item in group}
+
+# Price index built from the purchase records (grocery_items). Each
+# item keeps, per base unit, sorted unit prices (overall and per calendar
+# month) and the prices seen for every pack size in that base unit, updated
+# one purchase at a time.
+def median(sorted_values):
+    middle = len(sorted_values) // 2
+    if len(sorted_values) % 2:
+        return sorted_values[middle]
+    return (sorted_values[middle - 1] + sorted_values[middle]) / 2
+
+def add_price_record(price_index, record):
+    if record["quantity"] <= 0 or record["price"] <= 0:
+        return price_index
+    base, size = base_amount(record["quantity"], record.get("unit", "pieces"))
+    entry = price_index.setdefault(record["item"], {}).setdefault(base, {
+        "unit_prices": [], "monthly": {}, "packs": {}, "latest_date": "", "latest": 0.0
+    })
+    unit_price = record["price"] / size
+    month = int(record["date"][5:7])
+    insort(entry["unit_prices"], unit_price)
+    insort(entry["monthly"].setdefault(month, []), unit_price)
+
+    pack = entry["packs"].setdefault(size, {"prices": [], "latest": 0.0, "latest_date": ""})
+    insort(pack["prices"], record["price"])
+    if record["date"] >= pack["latest_date"]:
+        pack["latest"], pack["latest_date"] = record["price"], record["date"]
+    if record["date"] >= entry["latest_date"]:
+        entry["latest"], entry["latest_date"] = unit_price, record["date"]
+    return price_index
+
+def build_price_index(records):
+    price_index = {}
+    for record in records:
+        add_price_record(price_index, record)
+    return price_index
+
+def seasonal_factor(entry, month):
+    if month not in entry["monthly"]:
+        return 1.0
+    return median(entry["monthly"][month]) / median(entry["unit_prices"])
+
+def pack_options(entry, basis="Latest", month=None):
+    sizes = sorted(entry["packs"])
+    if basis == "Latest":
+        costs = [entry["packs"][size]["latest"] for size in sizes]
+    else:
+        costs = [median(entry["packs"][size]["prices"]) for size in sizes]
+        if basis == "Seasonal":
+            costs = [cost * seasonal_factor(entry, month) for cost in costs]
+    return np.array(sizes, dtype=float), np.array(costs, dtype=float)
+
+# Pack sizes are measured on a grid of their common divisor (in hundredths of
+# a base unit), and the DP runs over at most this many grid steps, one array
+# pass per pack size; the bulk of a larger need is bought in the pack with the
+# lowest cost per unit.
+MAX_PACK_STEPS = 2000
+
+def cheapest_packs(amount, sizes, costs):
+    """Minimum-cost pack combination covering at least `amount` (unbounded knapsack DP)."""
+    grid = np.round(np.asarray(sizes) * 100).astype(np.int64)
+    step = np.gcd.reduce(grid)
+    steps = grid // step
+    units = int(-(-int(np.ceil(amount * 100 - 1e-6)) // step))
+
+    packs = {}
+    bulk_cost = 0.0
+    if units > MAX_PACK_STEPS:
+        bulk = int(np.argmin(costs / steps))
+        count = -(-(units - MAX_PACK_STEPS) // int(steps[bulk]))
+        packs[float(sizes[bulk])] = count
+        bulk_cost = count * float(costs[bulk])
+        units = max(units - count * int(steps[bulk]), 0)
+
+    # best[n] is the cheapest cost of exactly n steps. A cover never needs to
+    # overshoot by a whole pack, so totals up to units + largest pack are enough
+    best = np.full(units + int(steps.max()), np.inf)
+    choice = np.full(len(best), -1)
+    best[0] = 0
+    for j in range(len(steps)):
+        # Adding any number of pack j is a running minimum along each residue
+        # class mod its size: best[r + t*s] -> t*c + min over u <= t of (best[r + u*s] - u*c)
+        step, rows = int(steps[j]), -(-len(best) // int(steps[j]))
+        grid = np.full(rows * step, np.inf)
+        grid[:len(best)] = best
+        offsets = np.arange(rows)[:, None] * costs[j]
+        candidates = (np.minimum.accumulate(grid.reshape(rows, step) - offsets, axis=0) + offsets).ravel()[:len(best)]
+        better = candidates < best - 1e-9
+        best[better] = candidates[better]
+        choice[better] = j
+
+    need = units + int(np.argmin(best[units:]))
+    cost = bulk_cost + float(best[need])
+    while need > 0:
+        size = float(sizes[choice[need]])
+        packs[size] = packs.get(size, 0) + 1
+        need -= int(steps[choice[need]])
+    return cost, packs
+
+def price_needs(needs, prices, basis="Latest", month=None):
+    """(cost, {base: packs}) covering base-unit `needs` from one item's prices, None if any is unpriced."""
+    cost, packs = 0.0, {}
+    for base, amount in needs.items():
+        if base not in prices:
+            return None
+        sizes, costs = pack_options(prices[base], basis, month)
+        base_cost, packs[base] = cheapest_packs(amount, sizes, costs)
+        cost += base_cost
+    return cost, packs
+
+def optimize_basket(shopping_items, price_index, basis="Latest", month=None, allow_substitutes=True,
+                    budget=None):
+    """Cheapest packs for each shopping entry, priced in the base units of its needs.
+
+    Needs are the entry's amounts, or `quantity` pieces when it has none.
+    Without a budget every entry is bought as its cheapest priced option.
+    With one, requested items are kept and swapped for cheaper substitutes,
+    largest saving first, only while the basket is over budget. Packs are
+    already the cheapest combination, so a basket still over budget after
+    every swap cannot be bought and ValueError is raised.
+    """
+    basket, missing, swaps = [], [], []
+    for entry in shopping_items:
+        needs = entry.get("amounts") or {"pieces": entry["quantity"]}
+        options = SUBSTITUTES.get(entry["item"], [entry["item"]]) if allow_substitutes else [entry["item"]]
+        priced = []
+        for option in options:
+            result = price_needs(needs, price_index.get(option, {}), basis, month)
+            if result is not None:
+                priced.append({"item": entry["item"], "buy": option, "amounts": needs,
+                               "packs": result[1], "cost": result[0]})
+        if not priced:
+            missing.append(entry["item"])
+            continue
+        cheapest = min(priced, key=lambda line: line["cost"])
+        if budget is None:
+            basket.append(cheapest)
+            continue
+        requested = next((line for line in priced if line["buy"] == entry["item"]), cheapest)
+        basket.append(requested)
+        if cheapest["cost"] < requested["cost"]:
+            swaps.append((requested["cost"] - cheapest["cost"], len(basket) - 1, cheapest))
+
+    if budget is not None:
+        total = sum(line["cost"] for line in basket)
+        for saving, position, cheapest in sorted(swaps, key=lambda swap: swap[0], reverse=True):
+            if total <= budget:
+                break
+            basket[position] = cheapest
+            total -= saving
+        if total > budget + 1e-9:
+            raise ValueError(f"The cheapest basket costs ₹{total:,.2f}, over the ₹{budget:,.2f} budget")
+    return basket, missing
@@ -0,0 +1,97 @@
+"""Array-native health formulas shared by the BMI, calorie and hydration pages.
+
+Every function accepts scalars or NumPy arrays, so one person and a whole
+cohort go through the same code.
+"""
+import numpy as np
+
+SEXES = ["Male", "Female"]
+
+BMI_BINS = [18.5, 25, 30]
+BMI_CATEGORIES = np.array(["Underweight", "Normal weight", "Overweight", "Obese"])
+
+ACTIVITY_MULTIPLIERS = {
+    "Sedentary": 1.2,
+    "Lightly Active": 1.375,
+    "Moderately Active": 1.55,
+    "Very Active": 1.725,
+    "Extra Active": 1.9
+}
+
+GOAL_ADJUSTMENTS = {
+    "Maintain Weight": 0,
+    "Lose Weight": -500,
+    "Gain Weight": 500
+}
+
+HYDRATION_ACTIVITY_MULTIPLIERS = {
+    "Sedentary": 1.0,
+    "Light Exercise": 1.2,
+    "Moderate Exercise": 1.4,
+    "Heavy Exercise": 1.6,
+    "Athlete": 1.8
+}
+
+CLIMATE_MULTIPLIERS = {
+    "Cold": 0.9,
+    "Moderate": 1.0,
+    "Hot": 1.2,
+    "Very Hot": 1.4
+}
+
+def lookup(keys, table):
+    """Map an array of labels through a dict, one dict lookup per distinct label."""
+    keys = np.asarray(keys)
+    if keys.ndim == 0:
+        return np.float64(table[keys.item()])
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return np.array([table[key] for key in unique], dtype=float)[inverse]
+
+def is_male(gender):
+    return np.asarray(gender) == "Male"
+
+def bmi(weight_kg, height_cm):
+    height_m = np.asarray(height_cm) / 100
+    return np.asarray(weight_kg) / height_m ** 2
+
+def bmi_category(bmi_values):
+    return BMI_CATEGORIES[np.digitize(bmi_values, BMI_BINS)]
+
+def hamwi_ideal_weight(height_cm, gender):
+    inches_over_5ft = (np.asarray(height_cm) - 152.4) / 2.54
+    return np.where(is_male(gender), 48 + 2.7 * inches_over_5ft, 45.5 + 2.2 * inches_over_5ft)
+
+def mifflin_st_jeor_bmr(weight_kg, height_cm, age, gender):
+    base = 10 * np.asarray(weight_kg) + 6.25 * np.asarray(height_cm) - 5 * np.asarray(age)
+    return base + np.where(is_male(gender), 5, -161)
+
+def tdee(bmr, activity_level):
+    return bmr * lookup(activity_level, ACTIVITY_MULTIPLIERS)
+
+def calorie_target(tdee_values, goal):
+    return tdee_values + lookup(goal, GOAL_ADJUSTMENTS)
+
+def macros(weight_kg, calories):
+    """Return (protein, carbs, fat) in grams: 2.2 g/kg protein, 25% fat, rest carbs."""
+    protein = np.asarray(weight_kg) * 2.2
+    fat = np.asarray(calories) * 0.25 / 9
+    carbs = (calories - protein * 4 - fat * 9) / 4
+    return protein, carbs, fat
+
+def hydration_needs(weight_kg, activity_level, climate, pregnant=False, high_altitude=False,
+                    caffeine_cups=0):
+    """Daily water needs in ml."""
+    water = np.asarray(weight_kg) * 30
+    water = water * lookup(activity_level, HYDRATION_ACTIVITY_MULTIPLIERS) * lookup(climate, CLIMATE_MULTIPLIERS)
+    water = water + np.where(pregnant, 300, 0)
+    water = water * np.where(high_altitude, 1.15, 1.0)
+    return water + np.asarray(caffeine_cups) * 200
+
+def hourly_hydration_schedule(water_needs, wake_hour=6, sleep_hour=22):
+    """Recommended ml for each of the 24 hours: an even split over waking hours,
+    front-loaded 20% for the first four and eased off 20% for the last three."""
+    waking = np.arange(sleep_hour - wake_hour)
+    weights = np.where(waking < 4, 1.2, np.where(waking > len(waking) - 4, 0.8, 1.0))
+    schedule = np.zeros(24)
+    schedule[wake_hour:sleep_hour] = weights * water_needs / len(waking)
+    return schedule
@@ -0,0 +1,38 @@
+"""Hydration intake log: an append-only list of entries folded into hourly per-day totals."""
+from datetime import datetime
+
+import numpy as np
+
+from utilitycalc.storage import get_store
+
+GLASS_ML = 250
+
+def new_intake_log():
+    # Per day: ml logged in each hour slot and the running day total
+    return {"hours": {}, "totals": {}}
+
+def record_intake(log, date, hour, ml):
+    if date not in log["hours"]:
+        log["hours"][date] = np.zeros(24)
+        log["totals"][date] = 0.0
+    log["hours"][date][hour] += ml
+    log["totals"][date] += ml
+
+def load_intake_log(storage=None):
+    log = new_intake_log()
+    for entry in (storage or get_store()).load("hydration_log", []):
+        record_intake(log, entry["date"], entry["hour"], entry["ml"])
+    return log
+
+def log_intake(log, date, hour, ml, storage=None):
+    """Append one entry to storage and fold it into the in-memory aggregates."""
+    (storage or get_store()).append("hydration_log", {"date": date, "hour": hour, "ml": ml,
+                                                      "time": datetime.now().strftime("%H:%M")})
+    record_intake(log, date, hour, ml)
+
+def day_intake(log, date):
+    return log["hours"].get(date, np.zeros(24))
+
+def intake_status(log, date, hour, cumulative_schedule):
+    """(ml drunk today, ml recommended by the end of `hour`) without touching other days."""
+    return log["totals"].get(date, 0.0), float(cumulative_schedule[hour])
@@ -0,0 +1,162 @@
+"""Local food database with a prefix search index for calorie logging.
+
+Nutrient values and prices are per 100 g. The index holds every word of
+every food name in one sorted list, so a type-ahead query is two bisects
+plus the matches, not a scan over the table. ``plan_meals`` solves a
+multi-day meal plan against macro targets as one sparse linear program.
+"""
+import csv
+import os
+from bisect import bisect_left
+from functools import lru_cache
+
+import numpy as np
+
+from utilitycalc.cache import cached, canonical_hash
+from utilitycalc.storage import get_store
+
+FOOD_DATABASE = os.path.join(os.path.dirname(__file__), '..', 'data', 'foods.csv')
+NUTRIENTS = ["calories", "protein", "carbs", "fat"]
+
+# The food log is stored as an append-only list and held in memory per day,
+# with each day's nutrient totals kept up to date as entries are logged, so
+# showing a day never scans the other days. Entries for foods missing from
+# the database stay in storage but are left out of the days.
+def new_food_log():
+    return {"days": {}, "totals": {}}
+
+def record_food(log, entry, database):
+    food_id = database["ids"].get(entry["food"])
+    if food_id is None:
+        return
+    log["days"].setdefault(entry["date"], []).append(entry)
+    if entry["date"] not in log["totals"]:
+        log["totals"][entry["date"]] = np.zeros(len(NUTRIENTS))
+    log["totals"][entry["date"]] += entry["grams"] / 100 * database["nutrients"][food_id]
+
+def load_food_log(storage=None, database=None):
+    database = database or default_food_database()
+    log = new_food_log()
+    for entry in (storage or get_store()).load("food_log", []):
+        record_food(log, entry, database)
+    return log
+
+def log_food(log, entry, storage=None, database=None):
+    (storage or get_store()).append("food_log", entry)
+    record_food(log, entry, database or default_food_database())
+
+def day_food_log(log, date):
+    return log["days"].get(date, [])
+
+def day_food_totals(log, date):
+    return dict(zip(NUTRIENTS, log["totals"].get(date, np.zeros(len(NUTRIENTS))).tolist()))
+
+def load_food_database(path=FOOD_DATABASE):
+    names, values, prices = [], [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            names.append(row["name"])
+            values.append([float(row[n]) for n in NUTRIENTS])
+            prices.append(float(row.get("price") or 1.0))
+    database = {"names": names, "nutrients": np.array(values).reshape(-1, len(NUTRIENTS)),
+                "prices": np.array(prices)}
+    # Hashed once here so cached plans are keyed on it, not on the whole table
+    database["content_hash"] = canonical_hash(database)
+    return database
+
+def build_food_index(names):
+    # Foods are ranked once, best (shortest) names first, and each word key
+    # holds a rank, so the best matches of a query are its lowest ranks.
+    # One (word, rank) key per word so "chick" matches "Grilled Chicken" too
+    foods = sorted(range(len(names)), key=lambda i: (len(names[i]), names[i]))
+    keys = sorted((word, rank) for rank, food_id in enumerate(foods)
+                  for word in set(names[food_id].lower().split()))
+    return {"words": [word for word, _ in keys], "ranks": np.array([r for _, r in keys], dtype=int),
+            "foods": np.array(foods, dtype=int)}
+
+def search_foods(index, query, limit=20):
+    """Food ids whose words start with every query word, best (shortest) names first."""
+    words = query.lower().split()
+    if not words:
+        return []
+    # A mask over ranks per query word; the first `limit` set ranks are the answer
+    matches = np.ones(len(index["foods"]), dtype=bool)
+    for word in words:
+        lo = bisect_left(index["words"], word)
+        hi = bisect_left(index["words"], word + "\uffff")
+        if lo == hi:
+            return []
+        found = np.zeros_like(matches)
+        found[index["ranks"][lo:hi]] = True
+        matches &= found
+    return index["foods"][np.flatnonzero(matches)[:limit]].tolist()
+
+def food_log_totals(database, food_ids, grams):
+    """Sum nutrients for parallel arrays of food ids and grams eaten."""
+    if len(food_ids) == 0:
+        return dict.fromkeys(NUTRIENTS, 0.0)
+    totals = (np.asarray(grams, dtype=float) / 100) @ database["nutrients"][np.asarray(food_ids, dtype=int)]
+    return dict(zip(NUTRIENTS, totals.tolist()))
+
+@lru_cache(maxsize=None)
+def default_food_database():
+    """The bundled database and its index, loaded once per process."""
+    database = load_food_database()
+    database["index"] = build_food_index(database["names"])
+    database["ids"] = {name: i for i, name in enumerate(database["names"])}
+    return database
+
+def food_database_key(database, *args, **kwargs):
+    return (database["content_hash"], args, sorted(kwargs.items()))
+
+@cached(key=food_database_key)
+def plan_meals(database, targets, days=7, max_grams=300, max_weekly_grams=700,
+               excluded=(), preferred=(), deviation_penalty=100.0):
+    """Cheapest per-day food portions that hit the macro targets.
+
+    Variables are grams/100 of every food on every day plus under/over
+    slack per day and nutrient, so the program is always feasible and a
+    missed target costs ``deviation_penalty`` per 1% of that target.
+    The weekly gram cap per food is what makes the days differ.
+    ``excluded`` and ``preferred`` are food ids; preferred foods cost half.
+    Returns a list of {food id: grams} per day and a (days, nutrients)
+    array of the planned totals.
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    nutrients = database["nutrients"]
+    n_foods, n_nutrients = nutrients.shape
+    target = np.array([targets[n] for n in NUTRIENTS], dtype=float)
+    n_food_vars, n_slacks = days * n_foods, days * n_nutrients
+
+    cost = database["prices"].copy()
+    cost[list(preferred)] *= 0.5
+    slack_cost = np.tile(deviation_penalty * 100 / np.maximum(target, 1e-9), days)
+    c = np.concatenate([np.tile(cost, days), slack_cost, slack_cost])
+
+    # Day d, nutrient k: foods + under - over == target
+    identity = sparse.identity(n_slacks, format='csr')
+    A_eq = sparse.hstack([sparse.kron(sparse.identity(days), sparse.csr_matrix(nutrients.T)),
+                          identity, -identity], format='csr')
+    b_eq = np.tile(target, days)
+    # Each food summed over all days stays under the weekly cap
+    A_ub = sparse.hstack([sparse.kron(np.ones((1, days)), sparse.identity(n_foods)),
+                          sparse.csr_matrix((n_foods, 2 * n_slacks))], format='csr')
+    b_ub = np.full(n_foods, max_weekly_grams / 100)
+
+    upper = np.full(n_foods, max_grams / 100)
+    upper[list(excluded)] = 0
+    bounds = np.zeros((n_food_vars + 2 * n_slacks, 2))
+    bounds[:n_food_vars, 1] = np.tile(upper, days)
+    bounds[n_food_vars:, 1] = np.inf
+
+    result = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
+    if result.status != 0:
+        raise ValueError(f"Meal plan could not be solved: {result.message}")
+
+    # Round to 5 g portions and drop traces the solver leaves behind
+    grams = np.round(result.x[:n_food_vars].reshape(days, n_foods) * 20) * 5
+    grams[grams < 10] = 0
+    plan = [{int(i): float(day[i]) for i in np.flatnonzero(day)} for day in grams]
+    return plan, (grams / 100) @ nutrients
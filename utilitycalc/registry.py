@@ -0,0 +1,115 @@
+"""Manifest of the calculator pages shown as tiles on the home page.
+
+Titles, descriptions and categories are declared here. Each page's icon is
+read from the ``st.set_page_config`` call in its source with ``ast``, so
+building the manifest never imports a page or its plotting and dataframe
+dependencies. Pages only run when Streamlit opens them.
+"""
+import ast
+import os
+from functools import lru_cache
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), '..', 'pages')
+DEFAULT_ICON = "🧮"
+
+CALCULATORS = {
+    "Finance": [
+        {
+            "title": "Loan EMI Calculator",
+            "description": "Calculate monthly EMI payments, total interest cost, and view complete amortization schedule for any loan amount and tenure",
+            "file": "loan_emi_calculator.py"
+        },
+        {
+            "title": "Investment Growth Calculator",
+            "description": "Plan your investments with compound interest calculations, SIP returns, and goal-based investment planning",
+            "file": "investment_calculator.py"
+        },
+        {
+            "title": "Mortgage Calculator",
+            "description": "Make informed home-buying decisions with mortgage payments, affordability analysis, and rent vs. buy comparison",
+            "file": "mortgage_calculator.py"
+        },
+        {
+            "title": "Expense Tracker",
+            "description": "Track daily expenses, set budgets, analyze spending patterns, and get insights on your financial habits",
+            "file": "expense_tracker.py"
+        },
+        {
+            "title": "Salary Calculator",
+            "description": "Calculate your take-home salary after taxes and deductions, plan your finances better",
+            "file": "salary_calculator.py"
+        }
+    ],
+    "Health & Wellness": [
+        {
+            "title": "BMI Calculator",
+            "description": "Calculate your Body Mass Index (BMI), get personalized health insights and weight management recommendations",
+            "file": "bmi_calculator.py"
+        },
+        {
+            "title": "Calorie Calculator",
+            "description": "Get personalized daily calorie needs based on your age, weight, height, activity level, and fitness goals",
+            "file": "calorie_calculator.py"
+        },
+        {
+            "title": "Hydration Calculator",
+            "description": "Track your daily water intake, get hydration reminders, and personalized recommendations based on your lifestyle",
+            "file": "hydration_calculator.py"
+        },
+        {
+            "title": "Sleep Calculator",
+            "description": "Optimize your sleep schedule, track sleep patterns, and get recommendations for better sleep quality",
+            "file": "sleep_calculator.py"
+        }
+    ],
+    "Home & Utilities": [
+        {
+            "title": "Electricity Bill Calculator",
+            "description": "Calculate electricity costs, track appliance-wise consumption, and get energy-saving recommendations",
+            "file": "electricity_calculator.py"
+        },
+        {
+            "title": "Grocery Planner",
+            "description": "Plan your meals, generate shopping lists, track grocery expenses, and minimize food waste",
+            "file": "grocery_planner.py"
+        }
+    ],
+    "Productivity": [
+        {
+            "title": "Task Time Estimator",
+            "description": "Get AI-powered estimates for task completion times, track productivity, and improve time management",
+            "file": "task_estimator.py"
+        }
+    ]
+}
+
+def page_config(path):
+    """Keyword arguments of the first st.set_page_config call in a page's source."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "set_page_config"):
+            return {kw.arg: kw.value.value for kw in node.keywords if isinstance(kw.value, ast.Constant)}
+    return {}
+
+def build_manifest(calculators=CALCULATORS, pages_dir=PAGES_DIR):
+    """{category: [page entry]} with the page path, Streamlit URL path and icon filled in."""
+    manifest = {}
+    for category, pages in calculators.items():
+        for page in pages:
+            path = os.path.join(pages_dir, page["file"])
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Calculator page not found: {path}")
+            manifest.setdefault(category, []).append({
+                **page,
+                "path": f"pages/{page['file']}",
+                "url_path": os.path.splitext(page["file"])[0],
+                "icon": page_config(path).get("page_icon", DEFAULT_ICON)
+            })
+    return manifest
+
+@lru_cache(maxsize=None)
+def page_manifest():
+    """The manifest for the bundled pages, built once per process."""
+    return build_manifest()
@@ -0,0 +1,419 @@
+"""Sleep debt, running sleep statistics, circular timing, wearable import and recovery planning.
+
+Functions that return DataFrames import pandas on first use, so importing
+this module needs only NumPy.
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utilitycalc.storage import get_store
+
+def load_sleep_data(storage=None):
+    return (storage or get_store()).load("sleep_data", [])
+
+def calculate_sleep_debt(sleep_hours, recommended_hours=8):
+    return max(0, recommended_hours - sleep_hours)
+
+def calculate_recovery_plan(total_debt, max_extra_sleep=2):
+    days_needed = total_debt / max_extra_sleep
+    return round(days_needed)
+
+# Running aggregates kept next to the sleep records so the analysis tabs never
+# rescan the full history. Every update is O(1) per new record.
+ROLLING_WINDOWS = (7, 30)
+# Nights are also kept by date for the TREND_DAYS ending at the latest logged
+# date, so rolling windows follow the calendar even when records arrive out of
+# order (wearable backfills, past-dated entries)
+TREND_DAYS = 90
+STATS_VERSION = 3
+
+# Sleep timing is tracked as minute-of-day histograms. Every derived metric
+# is a dot product with these fixed 1440-entry tables, so its cost does not
+# depend on how many nights have been logged. In memory the histograms are
+# NumPy arrays; they are saved as JSON lists.
+MINUTES_PER_DAY = 24 * 60
+MINUTE_ANGLES = 2 * np.pi * np.arange(MINUTES_PER_DAY) / MINUTES_PER_DAY
+MINUTE_COS = np.cos(MINUTE_ANGLES)
+MINUTE_SIN = np.sin(MINUTE_ANGLES)
+TIMING_HISTOGRAMS = ["bedtime", "wake", "midsleep_work", "midsleep_free", "asleep"]
+
+# Nights before Saturday and Sunday count as free days for social jetlag
+FREE_NIGHTS = {4, 5}
+
+def new_sleep_stats():
+    return {
+        "count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "total_debt": 0.0,
+        "latest_date": None,
+        "recent_nights": {},
+        "rolling_debt": {str(w): 0.0 for w in ROLLING_WINDOWS},
+        "timing": {name: np.zeros(MINUTES_PER_DAY, dtype=np.int64) for name in TIMING_HISTOGRAMS},
+        "quality_counts": {},
+        "version": STATS_VERSION
+    }
+
+def time_to_minutes(time_str):
+    hours, minutes = map(int, time_str.split(":"))
+    return hours * 60 + minutes
+
+def minutes_to_time(minutes):
+    minutes = round(minutes) % MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def update_sleep_timing(timing, record):
+    bedtime = time_to_minutes(record['sleep_time'])
+    wake = time_to_minutes(record['wake_time'])
+    time_in_bed = (wake - bedtime) % MINUTES_PER_DAY
+    midsleep = (bedtime + time_in_bed // 2) % MINUTES_PER_DAY
+    free_night = datetime.strptime(record['date'], "%Y-%m-%d").weekday() in FREE_NIGHTS
+
+    timing['bedtime'][bedtime] += 1
+    timing['wake'][wake] += 1
+    timing['midsleep_free' if free_night else 'midsleep_work'][midsleep] += 1
+
+    # Mark every minute of the night as asleep, wrapping past midnight
+    asleep = timing['asleep']
+    end = bedtime + time_in_bed
+    asleep[bedtime:min(end, MINUTES_PER_DAY)] += 1
+    asleep[:max(end - MINUTES_PER_DAY, 0)] += 1
+    return timing
+
+def circular_summary(histogram):
+    """Return (mean minute of day, resultant length) of a 1440-bin histogram."""
+    histogram = np.asarray(histogram, dtype=float)
+    total = histogram.sum()
+    if total == 0:
+        return None, 0.0
+    cos_sum = histogram @ MINUTE_COS
+    sin_sum = histogram @ MINUTE_SIN
+    angle = math.atan2(sin_sum, cos_sum) % (2 * math.pi)
+    return angle * MINUTES_PER_DAY / (2 * math.pi), math.hypot(cos_sum, sin_sum) / total
+
+def circular_std_minutes(histogram):
+    _, resultant = circular_summary(histogram)
+    if resultant <= 0:
+        return None
+    return math.sqrt(-2 * math.log(min(resultant, 1.0))) * MINUTES_PER_DAY / (2 * math.pi)
+
+def social_jetlag_hours(timing):
+    free_mid, _ = circular_summary(timing['midsleep_free'])
+    work_mid, _ = circular_summary(timing['midsleep_work'])
+    if free_mid is None or work_mid is None:
+        return None
+    difference = (free_mid - work_mid + MINUTES_PER_DAY / 2) % MINUTES_PER_DAY - MINUTES_PER_DAY / 2
+    return abs(difference) / 60
+
+def regularity_index(timing):
+    # 100 when bedtimes and wake times never move, towards 0 when scattered
+    _, bed_resultant = circular_summary(timing['bedtime'])
+    _, wake_resultant = circular_summary(timing['wake'])
+    return 50 * (bed_resultant + wake_resultant)
+
+def hourly_sleep_probability(timing, nights):
+    if nights == 0:
+        return np.zeros(24)
+    return np.asarray(timing['asleep'], dtype=float).reshape(24, 60).mean(axis=1) / nights
+
+def update_sleep_stats(stats, record):
+    duration = record['duration']
+    debt = calculate_sleep_debt(duration)
+
+    # Welford's online mean and variance of sleep duration
+    stats['count'] += 1
+    delta = duration - stats['mean']
+    stats['mean'] += delta / stats['count']
+    stats['m2'] += delta * (duration - stats['mean'])
+
+    update_recent_nights(stats, record)
+    stats['total_debt'] += debt
+
+    # Bedtime, wake and mid-sleep as minutes on the 24h circle
+    update_sleep_timing(stats['timing'], record)
+
+    quality = record['quality']
+    stats['quality_counts'][quality] = stats['quality_counts'].get(quality, 0) + 1
+    return stats
+
+def window_start(latest_date, days):
+    start = datetime.strptime(latest_date, "%Y-%m-%d") - timedelta(days=days - 1)
+    return start.strftime("%Y-%m-%d")
+
+def days_from(start_date, days):
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+def night_debt(nights, date):
+    return sum(calculate_sleep_debt(hours) for hours in nights.get(date, ()))
+
+def advance_latest_date(stats, latest_date):
+    """Move the windows forward, subtracting the nights that leave each one and dropping old dates."""
+    nights, previous = stats['recent_nights'], stats['latest_date']
+    stats['latest_date'] = latest_date
+    if previous is None:
+        return
+    shift = (datetime.strptime(latest_date, "%Y-%m-%d") - datetime.strptime(previous, "%Y-%m-%d")).days
+    # Only the calendar days each window moved past are visited, never the nights kept
+    for window in ROLLING_WINDOWS:
+        if shift >= window:
+            stats['rolling_debt'][str(window)] = 0.0
+            continue
+        for date in days_from(window_start(previous, window), shift):
+            stats['rolling_debt'][str(window)] -= night_debt(nights, date)
+    if shift >= TREND_DAYS:
+        nights.clear()
+        return
+    for date in days_from(window_start(previous, TREND_DAYS), shift):
+        nights.pop(date, None)
+
+def update_recent_nights(stats, record):
+    """Keep the record's night if it is within TREND_DAYS of the latest date and add it to the windows.
+
+    The rolling debts are running sums, so a record costs O(1) plus one step
+    per calendar day the windows move forward.
+    """
+    date = record['date']
+    if stats['latest_date'] is None or date > stats['latest_date']:
+        advance_latest_date(stats, date)
+    if date >= window_start(stats['latest_date'], TREND_DAYS):
+        stats['recent_nights'].setdefault(date, []).append(record['duration'])
+    debt = calculate_sleep_debt(record['duration'])
+    for window in ROLLING_WINDOWS:
+        if date >= window_start(stats['latest_date'], window):
+            stats['rolling_debt'][str(window)] += debt
+
+def recent_durations(stats, days):
+    """Durations of every night dated within `days` of the latest logged date, oldest first."""
+    if stats['latest_date'] is None:
+        return []
+    start = window_start(stats['latest_date'], days)
+    return [hours for date, durations in sorted(stats['recent_nights'].items()) if date >= start
+            for hours in durations]
+
+def nightly_totals(stats):
+    """(dates, total hours slept per date) over the trend window."""
+    dates = sorted(stats['recent_nights'])
+    return dates, [sum(stats['recent_nights'][date]) for date in dates]
+
+def most_common_time(histogram):
+    return minutes_to_time(int(np.argmax(histogram))) if np.any(histogram) else None
+
+def most_common_quality(stats):
+    counts = stats['quality_counts']
+    return max(counts, key=counts.get) if counts else None
+
+def build_sleep_stats(records):
+    stats = new_sleep_stats()
+    for record in records:
+        update_sleep_stats(stats, record)
+    return stats
+
+def stats_document(stats):
+    """The stats with the timing histograms as lists, ready to save as JSON."""
+    return dict(stats, timing={name: histogram.tolist() for name, histogram in stats['timing'].items()})
+
+def load_sleep_stats(records, storage=None):
+    stats = (storage or get_store()).load("sleep_stats")
+    if stats and stats.get('count') == len(records) and stats.get('version') == STATS_VERSION:
+        stats['timing'] = {name: np.array(histogram, dtype=np.int64)
+                           for name, histogram in stats['timing'].items()}
+        return stats
+    # Missing or out of sync with the records, rebuild once
+    return build_sleep_stats(records)
+
+def add_sleep_records(data, stats, records, storage=None):
+    """Add records to the history and stats, appending them and saving the stats in one batch."""
+    for record in records:
+        data.append(record)
+        update_sleep_stats(stats, record)
+    storage = storage or get_store()
+    with storage.batch():
+        storage.append("sleep_data", *records)
+        storage.save("sleep_stats", stats_document(stats))
+
+def sleep_duration_std(stats):
+    if stats['count'] < 2:
+        return 0.0
+    return math.sqrt(stats['m2'] / (stats['count'] - 1))
+
+def mean_bedtime(stats):
+    minutes, _ = circular_summary(stats['timing']['bedtime'])
+    if minutes is None:
+        return None
+    return minutes_to_time(minutes)
+
+def mean_wake_time(stats):
+    minutes, _ = circular_summary(stats['timing']['wake'])
+    if minutes is None:
+        return None
+    return minutes_to_time(minutes)
+
+def build_recovery_calendar(start_date, days, weekday_window=("22:30", "06:30"),
+                            weekend_window=("23:00", "08:00")):
+    calendar = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        bedtime, wake = weekend_window if day.weekday() in FREE_NIGHTS else weekday_window
+        calendar.append({
+            "Date": day.strftime("%Y-%m-%d"),
+            "Earliest Bedtime": bedtime,
+            "Latest Wake": wake,
+            "Commitments (hrs)": 0.0
+        })
+    return calendar
+
+def plan_recovery_schedule(total_debt, earliest_bedtimes, latest_wakes, commitment_hours,
+                           target_sleep=8, max_extra_sleep=2):
+    import pandas as pd
+    bedtimes = np.array([time_to_minutes(t) for t in earliest_bedtimes])
+    wakes = np.array([time_to_minutes(t) for t in latest_wakes])
+    commitments = np.asarray(commitment_hours, dtype=float)
+
+    # Hours actually available for sleep between the constraints
+    opportunity = np.maximum(((wakes - bedtimes) % MINUTES_PER_DAY) / 60 - commitments, 0)
+
+    # Sleeping as long as allowed every night clears the debt fastest, so
+    # the greedy plan is optimal. Nights shorter than the target add debt.
+    balance = np.minimum(opportunity, target_sleep + max_extra_sleep) - target_sleep
+
+    # Remaining debt follows r[t] = max(0, r[t-1] - balance[t]); the running
+    # minimum of the cumulative sum solves the recursion without a loop.
+    cumulative = total_debt - np.cumsum(balance)
+    remaining = cumulative - np.minimum(np.minimum.accumulate(cumulative), 0)
+    previous = np.concatenate([[total_debt], remaining[:-1]])
+
+    extra_sleep = np.clip(np.minimum(balance, previous), 0, None)
+    planned_sleep = np.where(balance > 0, target_sleep + extra_sleep, opportunity)
+    recommended_bedtimes = (wakes - np.round((planned_sleep + commitments) * 60)) % MINUTES_PER_DAY
+
+    return pd.DataFrame({
+        "Day": np.arange(1, len(opportunity) + 1),
+        "Bedtime": [minutes_to_time(m) for m in recommended_bedtimes],
+        "Wake": list(latest_wakes),
+        "Sleep Opportunity": opportunity,
+        "Planned Sleep": planned_sleep,
+        "Extra Sleep": extra_sleep,
+        "Remaining Debt": remaining
+    })
+
+def recovery_days_needed(schedule):
+    cleared = np.flatnonzero(schedule['Remaining Debt'].to_numpy() <= 1e-9)
+    return int(cleared[0]) + 1 if len(cleared) else None
+
+# Minute-level wearable exports: one row per minute with a timestamp, heart
+# rate (bpm) and a movement/activity count
+WEARABLE_COLUMNS = ["timestamp", "heart_rate", "movement"]
+
+def load_wearable_csv(source):
+    import pandas as pd
+    df = pd.read_csv(source)
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+    missing = [c for c in WEARABLE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns in wearable export: {', '.join(missing)}")
+    df = df[WEARABLE_COLUMNS].dropna()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df.sort_values('timestamp').reset_index(drop=True)
+
+def run_length_encode(values, breaks=None):
+    """Return (starts, lengths, values) of the runs in a 1-D array."""
+    values = np.asarray(values)
+    n = len(values)
+    if n == 0:
+        return np.array([], dtype=int), np.array([], dtype=int), values
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    change[1:] = values[1:] != values[:-1]
+    if breaks is not None:
+        change |= breaks
+    starts = np.flatnonzero(change)
+    lengths = np.diff(np.append(starts, n))
+    return starts, lengths, values[starts]
+
+def classify_sleep_minutes(df, movement_threshold=2, smoothing_minutes=5):
+    # Asleep when movement stays low and heart rate sits below its median
+    movement = df['movement'].rolling(smoothing_minutes, center=True, min_periods=1).median()
+    heart_rate = df['heart_rate'].rolling(smoothing_minutes, center=True, min_periods=1).median()
+    return ((movement <= movement_threshold) & (heart_rate <= df['heart_rate'].median())).to_numpy()
+
+def episodes_frame(**columns):
+    import pandas as pd
+    names = ["start", "end", "asleep_minutes", "in_bed_minutes", "awakenings", "efficiency"]
+    return pd.DataFrame({name: columns.get(name, []) for name in names})
+
+def detect_sleep_episodes(df, max_wake_gap=20, min_episode_minutes=60):
+    asleep = classify_sleep_minutes(df)
+    timestamps = df['timestamp'].to_numpy()
+    if len(asleep) == 0:
+        return episodes_frame()
+
+    # Gaps in the export always end a run
+    gaps = np.zeros(len(asleep), dtype=bool)
+    gaps[1:] = np.diff(timestamps) > np.timedelta64(1, 'm')
+
+    starts, lengths, values = run_length_encode(asleep, gaps)
+
+    # Short wake runs between two sleep runs are awakenings, not the end of an episode
+    interior = np.zeros(len(values), dtype=bool)
+    interior[1:-1] = values[:-2] & values[2:] & ~gaps[starts[1:-1]] & ~gaps[starts[2:]]
+    bridged = values | (interior & (lengths < max_wake_gap))
+    in_episode = np.repeat(bridged, lengths)
+
+    ep_starts, ep_lengths, ep_values = run_length_encode(in_episode, gaps)
+    keep = ep_values & (ep_lengths >= min_episode_minutes)
+    ep_starts, ep_lengths = ep_starts[keep], ep_lengths[keep]
+    ep_ends = ep_starts + ep_lengths
+    if len(ep_starts) == 0:
+        return episodes_frame()
+
+    # Asleep minutes per episode from a cumulative sum
+    asleep_cumsum = np.concatenate([[0], np.cumsum(asleep)])
+    asleep_minutes = asleep_cumsum[ep_ends] - asleep_cumsum[ep_starts]
+
+    # Awakenings are wake runs that start strictly inside an episode
+    wake_starts = starts[~values]
+    episode_idx = np.searchsorted(ep_starts, wake_starts, side='right') - 1
+    inside = (episode_idx >= 0) & (wake_starts > ep_starts[np.maximum(episode_idx, 0)]) & \
+             (wake_starts < ep_ends[np.maximum(episode_idx, 0)])
+    awakenings = np.bincount(episode_idx[inside], minlength=len(ep_starts))
+
+    return episodes_frame(
+        start=timestamps[ep_starts],
+        end=timestamps[ep_ends - 1] + np.timedelta64(1, 'm'),
+        asleep_minutes=asleep_minutes,
+        in_bed_minutes=ep_lengths,
+        awakenings=awakenings,
+        efficiency=asleep_minutes / ep_lengths
+    )
+
+def efficiency_to_quality(efficiency):
+    if efficiency >= 0.9:
+        return "Excellent"
+    elif efficiency >= 0.85:
+        return "Good"
+    elif efficiency >= 0.75:
+        return "Fair"
+    return "Poor"
+
+def episodes_to_records(episodes):
+    import pandas as pd
+    records = []
+    for episode in episodes.itertuples(index=False):
+        start = pd.Timestamp(episode.start)
+        end = pd.Timestamp(episode.end)
+        # Nights are filed under the evening they started, like manual records
+        night = (start - timedelta(hours=12)).date()
+        records.append({
+            "date": night.strftime("%Y-%m-%d"),
+            "sleep_time": start.strftime("%H:%M"),
+            "wake_time": end.strftime("%H:%M"),
+            "duration": episode.asleep_minutes / 60,
+            "quality": efficiency_to_quality(episode.efficiency),
+            "efficiency": float(episode.efficiency),
+            "awakenings": int(episode.awakenings),
+            "source": "wearable"
+        })
+    return records
@@ -0,0 +1,600 @@
+"""Namespaced, lock-protected document storage shared by the calculator pages.
+
+A document is any JSON value saved under a name, and list documents can
+also grow one record at a time with ``append``. Each namespace (one per
+signed-in user, one per anonymous session, or ``default`` for the local
+user) has its own files or rows, so sessions never rewrite each other's
+data. File writes go to a temp file that is
+fsynced and renamed over the target under an exclusive lock, so a reader
+sees the old document or the new one, never half of one.
+
+The backend comes from the UTILITYCALC_STORAGE environment variable:
+
+- ``jsonl`` (default): lists are JSON Lines files, so an append writes
+  only the new lines; other documents are JSON files.
+- ``json``: every document is one JSON file.
+- ``sqlite``: one database file holds every namespace.
+
+Data lives under UTILITYCALC_DATA_DIR, the working directory by default.
+The default namespace keeps the file names the pages have always used,
+and other namespaces go under ``users/<namespace>/``.
+
+The pages write through a ``WriteBehindBackend``: a save or append goes on
+a queue and returns at once, and a worker thread writes bursts of queued
+changes to the real backend in one flush per document. Artifacts such as
+models go through ``Store.write_file`` and ``Store.read_file`` so that they
+are queued and read back the same way.
+"""
+import atexit
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only guard threads within this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "default"
+# What st.experimental_user reports when nobody is signed in
+LOCAL_USER_EMAIL = "test@example.com"
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` against other threads and processes."""
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def atomic_write(path, write):
+    """Call write(binary file) on a temp file beside `path`, fsync it and rename it over `path`."""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        # mkstemp creates the file private; keep the permissions a plain open() would give
+        os.chmod(temp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+def encode_lines(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode('utf-8')
+
+def read_lines(path):
+    records = []
+    with open(path, 'r') as f:
+        lines = [line for line in f if line.strip()]
+    for i, line in enumerate(lines):
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # A crash mid-append can leave a torn last line; anything else is corruption
+            if i != len(lines) - 1:
+                raise
+    return records
+
+def namespace_dir(root, namespace):
+    return root if namespace == DEFAULT_NAMESPACE else os.path.join(root, 'users', namespace)
+
+# Writes not yet handed to a backend, keyed by document. A save replaces
+# anything pending for its document; appends after a save extend it.
+def new_pending():
+    return {"saves": {}, "appends": {}}
+
+def pend_save(pending, key, document):
+    pending["appends"].pop(key, None)
+    pending["saves"][key] = document
+
+def pend_append(pending, key, records):
+    if key in pending["saves"]:
+        pending["saves"][key] = pending["saves"][key] + list(records)
+    else:
+        pending["appends"].setdefault(key, []).extend(records)
+
+def merge_pending(first, then):
+    """One pending set with the changes of `first` followed by those of `then`."""
+    merged = new_pending()
+    for part in (first, then):
+        for key, document in part["saves"].items():
+            pend_save(merged, key, document)
+        for key, records in part["appends"].items():
+            pend_append(merged, key, records)
+    return merged
+
+def pending_for(pending, key):
+    """A pending set holding only `key`'s changes, safe to read after `pending` moves on."""
+    part = new_pending()
+    if key in pending["saves"]:
+        part["saves"][key] = pending["saves"][key]
+    if key in pending["appends"]:
+        part["appends"][key] = list(pending["appends"][key])
+    return part
+
+def read_through(pending, key, read):
+    """The document as it will be once `pending` is written, given read() for the stored one."""
+    if key in pending["saves"]:
+        return pending["saves"][key]
+    document = read()
+    if key in pending["appends"]:
+        document = (document or []) + pending["appends"][key]
+    return document
+
+class Backend:
+    """Per-namespace directories, also used for non-JSON artifacts like models."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, namespace, name, extension=''):
+        directory = namespace_dir(self.root, namespace)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name + extension)
+
+    def write_file(self, path, write):
+        with file_lock(path):
+            atomic_write(path, write)
+
+    def read_file(self, path):
+        """Contents of an artifact saved with write_file, or None if there is none."""
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def flush(self, timeout=None):
+        return True
+
+class JSONBackend(Backend):
+    """One <name>.json file per document; append rewrites the whole list."""
+
+    def read(self, namespace, name, default=None):
+        path = self.path(namespace, name, '.json')
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def write(self, namespace, name, document):
+        self.write_file(self.path(namespace, name, '.json'),
+                        lambda f: f.write(json.dumps(document).encode('utf-8')))
+
+    def append(self, namespace, name, records):
+        path = self.path(namespace, name, '.json')
+        with file_lock(path):
+            document = self.read(namespace, name, []) + list(records)
+            atomic_write(path, lambda f: f.write(json.dumps(document).encode('utf-8')))
+
+class JSONLBackend(JSONBackend):
+    """Lists are <name>.jsonl with one record per line; other documents are JSON."""
+
+    def read(self, namespace, name, default=None):
+        path = self.path(namespace, name, '.jsonl')
+        if os.path.exists(path):
+            return read_lines(path)
+        return super().read(namespace, name, default)
+
+    def write(self, namespace, name, document):
+        if not isinstance(document, list):
+            return super().write(namespace, name, document)
+        self.write_file(self.path(namespace, name, '.jsonl'), lambda f: f.write(encode_lines(document)))
+
+    def append(self, namespace, name, records):
+        path = self.path(namespace, name, '.jsonl')
+        with file_lock(path):
+            if not os.path.exists(path):
+                # First append carries over a list previously saved as <name>.json
+                existing = super().read(namespace, name, [])
+                atomic_write(path, lambda f: f.write(encode_lines(existing + list(records))))
+                return
+            with open(path, 'ab') as f:
+                f.write(encode_lines(records))
+                f.flush()
+                os.fsync(f.fileno())
+
+class SQLiteBackend(Backend):
+    """Every namespace in one database; list documents keep one row per record."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            namespace TEXT NOT NULL, name TEXT NOT NULL, body TEXT NOT NULL,
+            PRIMARY KEY (namespace, name));
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL, name TEXT NOT NULL, body TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS records_by_name ON records (namespace, name, id);
+    """
+    # documents.body for a list whose items live in the records table
+    LIST_MARKER = "[]"
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.database = os.path.join(root, 'utilitycalc.db')
+
+    @contextlib.contextmanager
+    def transaction(self):
+        os.makedirs(self.root, exist_ok=True)
+        connection = sqlite3.connect(self.database, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(self.SCHEMA)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def read(self, namespace, name, default=None):
+        with self.transaction() as db:
+            row = db.execute("SELECT body FROM documents WHERE namespace = ? AND name = ?",
+                             (namespace, name)).fetchone()
+            if row is None:
+                return default
+            if row[0] != self.LIST_MARKER:
+                return json.loads(row[0])
+            rows = db.execute("SELECT body FROM records WHERE namespace = ? AND name = ? ORDER BY id",
+                              (namespace, name))
+            return [json.loads(body) for body, in rows]
+
+    def write(self, namespace, name, document):
+        with self.transaction() as db:
+            db.execute("DELETE FROM records WHERE namespace = ? AND name = ?", (namespace, name))
+            if isinstance(document, list):
+                body = self.LIST_MARKER
+                db.executemany("INSERT INTO records (namespace, name, body) VALUES (?, ?, ?)",
+                               [(namespace, name, json.dumps(record)) for record in document])
+            else:
+                body = json.dumps(document)
+            db.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", (namespace, name, body))
+
+    def append(self, namespace, name, records):
+        with self.transaction() as db:
+            db.execute("INSERT OR IGNORE INTO documents VALUES (?, ?, ?)",
+                       (namespace, name, self.LIST_MARKER))
+            db.executemany("INSERT INTO records (namespace, name, body) VALUES (?, ?, ?)",
+                           [(namespace, name, json.dumps(record)) for record in records])
+
+BACKENDS = {"json": JSONBackend, "jsonl": JSONLBackend, "sqlite": SQLiteBackend}
+
+class WriteBehindBackend:
+    """Queue writes for a worker thread so callers never wait on the disk.
+
+    write and append copy their arguments and write_file serializes its
+    content right away; each queues the change and returns a Future that
+    resolves once it is durable. The worker waits `linger` seconds after the
+    first queued change so a burst of them goes out as one write per
+    document. At most `max_pending` changes wait in the queue; beyond that
+    callers block until the worker catches up.
+
+    Reads layer queued and in-flight changes over the stored document and
+    only wait while that same document is being written, never for a whole
+    flush. A change whose document fails to write fails its Future (others in
+    the same flush still succeed) but stays queued, and is retried with a
+    growing delay; everything queued is flushed when the process exits, and
+    anything that still cannot be written then is logged.
+    """
+
+    def __init__(self, backend, max_pending=1000, linger=0.05, retry_delay=0.5, max_retry_delay=30.0):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._pending = new_pending()
+        self._files = {}
+        self._futures = []
+        self._size = 0
+        # Changes taken by the worker and not yet written; each leaves as soon as it is durable
+        self._inflight = new_pending()
+        self._inflight_files = {}
+        # Document (or file path) being written right now, and a count of finished
+        # writes per document, so a read can tell whether a write overlapped it
+        self._writing = None
+        self._versions = {}
+        self._busy = False
+        self._closed = False
+        self._changed = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="utilitycalc-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def path(self, namespace, name, extension=''):
+        return self.backend.path(namespace, name, extension)
+
+    def _read_stable(self, key, snapshot, read):
+        # Snapshot the queued layers under the lock, read the backend without it and
+        # retry if a write of this document finished in between
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._writing != key)
+                layers = snapshot()
+                version = self._versions.get(key, 0)
+            result = read(layers)
+            with self._changed:
+                if self._writing != key and self._versions.get(key, 0) == version:
+                    return result
+
+    def read(self, namespace, name, default=None):
+        key = (namespace, name)
+        snapshot = lambda: (pending_for(self._inflight, key), pending_for(self._pending, key))
+        read = lambda layers: copy.deepcopy(read_through(
+            layers[1], key, lambda: read_through(layers[0], key,
+                                                 lambda: self.backend.read(namespace, name, default))))
+        return self._read_stable(key, snapshot, read)
+
+    def read_file(self, path):
+        snapshot = lambda: self._files.get(path, self._inflight_files.get(path))
+        return self._read_stable(path, snapshot, lambda data: data if data is not None else self.backend.read_file(path))
+
+    def write(self, namespace, name, document):
+        key = (namespace, name)
+        return self._submit(key, lambda: pend_save(self._pending, key, copy.deepcopy(document)))
+
+    def append(self, namespace, name, records):
+        key = (namespace, name)
+        return self._submit(key, lambda: pend_append(self._pending, key, copy.deepcopy(list(records))))
+
+    def write_file(self, path, write):
+        buffer = io.BytesIO()
+        write(buffer)
+        data = buffer.getvalue()
+        # Only the latest content of a file matters, so earlier queued writes are dropped
+        return self._submit(path, lambda: self._files.__setitem__(path, data))
+
+    def _submit(self, key, queue_change):
+        future = Future()
+        with self._changed:
+            if self._closed:
+                raise RuntimeError("Write-behind storage is closed")
+            while self._size >= self.max_pending:
+                self._changed.wait()
+            queue_change()
+            self._futures.append((key, future))
+            self._size += 1
+            self._changed.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Wait until every change queued so far is written; False if `timeout` ran out."""
+        with self._changed:
+            return self._changed.wait_for(lambda: not self._size and not self._busy, timeout)
+
+    def close(self):
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._worker.join()
+
+    def _write_one(self, key, write, written):
+        with self._changed:
+            self._writing = key
+        error = None
+        try:
+            write()
+        except Exception as e:
+            logger.exception("Background write of %s failed; it stays queued", key)
+            error = e
+        with self._changed:
+            if error is None:
+                written()
+            self._writing = None
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._changed.notify_all()
+        return error
+
+    def _write_inflight(self):
+        """Write every in-flight change; returns the error of each document that failed."""
+        errors = {}
+        for (namespace, name), document in list(self._inflight["saves"].items()):
+            errors[(namespace, name)] = self._write_one(
+                (namespace, name), lambda: self.backend.write(namespace, name, document),
+                lambda key=(namespace, name): self._inflight["saves"].pop(key))
+        for (namespace, name), records in list(self._inflight["appends"].items()):
+            errors[(namespace, name)] = self._write_one(
+                (namespace, name), lambda: self.backend.append(namespace, name, records),
+                lambda key=(namespace, name): self._inflight["appends"].pop(key))
+        for path, data in list(self._inflight_files.items()):
+            errors[path] = self._write_one(
+                path, lambda: self.backend.write_file(path, lambda f: f.write(data)),
+                lambda path=path: self._inflight_files.pop(path))
+        return {key: error for key, error in errors.items() if error is not None}
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._size or self._closed)
+                if not self._size:
+                    return
+            if not self._closed:
+                time.sleep(self.linger)
+            with self._changed:
+                self._inflight, self._inflight_files = self._pending, self._files
+                futures = self._futures
+                self._pending, self._files, self._futures = new_pending(), {}, []
+                self._size = 0
+                self._busy = True
+                self._changed.notify_all()
+            errors = self._write_inflight()
+            with self._changed:
+                failed = self._inflight, self._inflight_files
+                count = len(failed[0]["saves"]) + len(failed[0]["appends"]) + len(failed[1])
+                if errors and self._closed:
+                    logger.error("Background storage closed with %d changes that could not be written", count)
+                elif errors:
+                    # Failed changes go back in front of anything queued since
+                    self._pending = merge_pending(failed[0], self._pending)
+                    self._files = {**failed[1], **self._files}
+                    self._size += count
+                self._inflight, self._inflight_files = new_pending(), {}
+                self._busy = False
+                self._changed.notify_all()
+            # Each change hears about its own document only
+            for key, future in futures:
+                if key in errors:
+                    future.set_exception(errors[key])
+                else:
+                    future.set_result(True)
+            if errors:
+                with self._changed:
+                    self._changed.wait_for(lambda: self._closed, delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            else:
+                delay = self.retry_delay
+
+class Store:
+    """Documents for one namespace, with optional write batching per thread.
+
+    Inside ``with store.batch():`` saves and appends are held back; repeated
+    saves of a document collapse into its last value and appends to a list
+    go out as one write when the outermost batch exits (nothing is written
+    if the block raises). Streamlit runs each
+    session in its own thread, so sessions sharing a store batch separately.
+
+    Outside a batch, save, append and write_file return the backend's
+    acknowledgement: None once written, or a Future on a write-behind store.
+    """
+
+    def __init__(self, backend, namespace=DEFAULT_NAMESPACE):
+        self.backend = backend
+        self.namespace = namespace
+        self._local = threading.local()
+
+    def _pending(self):
+        return getattr(self._local, 'pending', None)
+
+    def load(self, name, default=None):
+        read = lambda: self.backend.read(self.namespace, name, default)
+        pending = self._pending()
+        return read() if pending is None else read_through(pending, name, read)
+
+    def save(self, name, document):
+        pending = self._pending()
+        if pending is None:
+            return self.backend.write(self.namespace, name, document)
+        pend_save(pending, name, document)
+
+    def append(self, name, *records):
+        pending = self._pending()
+        if pending is None:
+            return self.backend.append(self.namespace, name, records)
+        pend_append(pending, name, records)
+
+    def path(self, filename):
+        """Path for a non-JSON artifact (model, index) in this namespace's directory."""
+        name, extension = os.path.splitext(filename)
+        return self.backend.path(self.namespace, name, extension)
+
+    def write_file(self, filename, write):
+        """Atomically replace an artifact with whatever write(binary file) produces."""
+        return self.backend.write_file(self.path(filename), write)
+
+    def read_file(self, filename):
+        """Bytes of an artifact, including a write still queued; None if it was never written."""
+        return self.backend.read_file(self.path(filename))
+
+    def flush(self, timeout=None):
+        """Wait for queued writes to reach disk; True once everything is written."""
+        return self.backend.flush(timeout)
+
+    @contextlib.contextmanager
+    def batch(self):
+        if self._pending() is not None:
+            # Nested batches join the outermost one
+            yield self
+            return
+        self._local.pending = new_pending()
+        try:
+            yield self
+        finally:
+            pending, self._local.pending = self._local.pending, None
+        for name, document in pending["saves"].items():
+            self.backend.write(self.namespace, name, document)
+        for name, records in pending["appends"].items():
+            self.backend.append(self.namespace, name, records)
+
+@lru_cache(maxsize=None)
+def _backend(kind, root, write_behind):
+    if write_behind:
+        return WriteBehindBackend(_backend(kind, root, False))
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {kind!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[kind](root)
+
+@lru_cache(maxsize=None)
+def _store(namespace, kind, root, write_behind):
+    return Store(_backend(kind, root, write_behind), namespace)
+
+def get_store(namespace=DEFAULT_NAMESPACE, backend=None, root=None, write_behind=False):
+    """The shared Store for a namespace on the configured (or given) backend.
+
+    With `write_behind` the store queues writes for a background thread
+    instead of writing before it returns.
+    """
+    kind = backend or os.environ.get("UTILITYCALC_STORAGE", "jsonl")
+    root = root or os.environ.get("UTILITYCALC_DATA_DIR", ".")
+    return _store(namespace, kind, root, write_behind)
+
+def user_namespace(email):
+    """Stable directory-safe namespace for a user, without putting the email on disk.
+
+    The local user of ``streamlit run`` keeps the default namespace; without
+    an email there is no user to key on and None is returned.
+    """
+    if email == LOCAL_USER_EMAIL:
+        return DEFAULT_NAMESPACE
+    if not email:
+        return None
+    return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+def session_namespace(session_state):
+    """A namespace private to one anonymous browser session, kept in its session state."""
+    if "storage_namespace" not in session_state:
+        session_state["storage_namespace"] = "session-" + secrets.token_hex(8)
+    return session_state["storage_namespace"]
+
+def user_store():
+    """The write-behind Store for whoever is signed in to the running Streamlit app.
+
+    Anonymous sessions each write to their own namespace rather than sharing
+    one; outside a running app (scripts, the batch CLI) it is the default.
+    """
+    try:
+        import streamlit as st
+        from streamlit import runtime
+    except ImportError:
+        return get_store(write_behind=True)
+    if not runtime.exists():
+        return get_store(write_behind=True)
+    namespace = user_namespace(st.experimental_user.get("email"))
+    return get_store(namespace or session_namespace(st.session_state), write_behind=True)
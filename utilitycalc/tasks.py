@@ -0,0 +1,511 @@
+"""Task history store, time estimate model, similar-task index and PERT project simulation.
+
+pandas, scikit-learn and SciPy are imported by the functions that need
+them, so importing this module needs only NumPy.
+"""
+import io
+import logging
+import pickle
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from utilitycalc.cache import cached, sign, verify
+from utilitycalc.storage import get_store
+
+logger = logging.getLogger(__name__)
+
+# Task history is an append-only log: each saved task is one record and
+# later changes (like logging actual time) are appended as update records,
+# so nothing rewrites the whole history. A history saved by older versions
+# as one JSON document is carried over by the first append. In memory the
+# history is held column by column with display strings formatted once on
+# append, alongside running estimated-hour totals per type and complexity
+# so the analysis never regroups the rows.
+TASKS_HISTORY = "tasks_history"
+TASK_COLUMNS = ["date", "name", "type", "complexity", "experience_level",
+                "estimated_time", "min_time", "max_time", "actual_time", "description"]
+HOUR_COLUMNS = ["estimated_time", "min_time", "max_time", "actual_time"]
+
+def format_hours(value):
+    return f"{value:.1f} hrs" if value is not None else ""
+
+SUMMARY_COLUMNS = ["type", "complexity"]
+
+def new_task_store():
+    store = {"columns": {column: [] for column in TASK_COLUMNS}, "count": 0,
+             "totals": {column: {} for column in SUMMARY_COLUMNS}, "completed": 0, "training_version": 0}
+    store["columns"].update({f"{column}_display": [] for column in HOUR_COLUMNS})
+    return store
+
+def add_to_totals(store, position, sign):
+    hours = store["columns"]["estimated_time"][position] or 0.0
+    for column in SUMMARY_COLUMNS:
+        count, total = store["totals"][column].get(store["columns"][column][position], (0, 0.0))
+        store["totals"][column][store["columns"][column][position]] = (count + sign, total + sign * hours)
+
+def store_task(store, task):
+    columns = store["columns"]
+    for column in TASK_COLUMNS:
+        columns[column].append(task.get(column))
+    for column in HOUR_COLUMNS:
+        columns[f"{column}_display"].append(format_hours(task.get(column)))
+    add_to_totals(store, store["count"], 1)
+    store["completed"] += bool(task.get("actual_time"))
+    store["training_version"] += bool(task.get("actual_time"))
+    store["count"] += 1
+
+def store_update(store, position, fields):
+    columns = store["columns"]
+    add_to_totals(store, position, -1)
+    store["completed"] -= bool(columns["actual_time"][position])
+    for column, value in fields.items():
+        columns[column][position] = value
+        if column in HOUR_COLUMNS:
+            columns[f"{column}_display"][position] = format_hours(value)
+    add_to_totals(store, position, 1)
+    store["completed"] += bool(columns["actual_time"][position])
+    # Bumped on every change to the training data, including a re-logged actual time
+    store["training_version"] += "actual_time" in fields
+
+def build_task_store(tasks):
+    store = new_task_store()
+    for task in tasks:
+        store_task(store, task)
+    return store
+
+def load_task_store(storage=None):
+    store = new_task_store()
+    for record in (storage or get_store()).load(TASKS_HISTORY, []):
+        if "_update" in record:
+            position = record.pop("_update")
+            store_update(store, position, record)
+        else:
+            store_task(store, record)
+    return store
+
+def add_task(store, task, storage=None):
+    (storage or get_store()).append(TASKS_HISTORY, task)
+    store_task(store, task)
+
+def update_task(store, position, fields, storage=None):
+    (storage or get_store()).append(TASKS_HISTORY, dict(fields, _update=position))
+    store_update(store, position, fields)
+
+def task_row(store, position):
+    columns = store["columns"]
+    return {column: columns[column][position] for column in TASK_COLUMNS if columns[column][position] is not None}
+
+def task_rows(store):
+    return [task_row(store, i) for i in range(store["count"])]
+
+def task_summary(store, column):
+    """{value: (task count, estimated hours)} for a SUMMARY_COLUMNS column, without touching the rows."""
+    return {value: totals for value, totals in store["totals"][column].items() if totals[0]}
+
+def task_page(store, page=0, page_size=25, filters=None):
+    """Return (positions, display DataFrame, total matches) for one page, newest first."""
+    import pandas as pd
+    columns = store["columns"]
+    mask = np.ones(store["count"], dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= np.isin(np.asarray(columns[column], dtype=object), list(values))
+    matches = np.flatnonzero(mask)[::-1]
+    positions = matches[page * page_size:(page + 1) * page_size].tolist()
+    page_df = pd.DataFrame({
+        "Date": [columns["date"][i] for i in positions],
+        "Task": [columns["name"][i] for i in positions],
+        "Type": [columns["type"][i] for i in positions],
+        "Complexity": [columns["complexity"][i] for i in positions],
+        "Experience": [columns["experience_level"][i] for i in positions],
+        "Estimated": [columns["estimated_time_display"][i] for i in positions],
+        "Range": [f"{columns['min_time_display'][i]} - {columns['max_time_display'][i]}" for i in positions],
+        "Actual": [columns["actual_time_display"][i] for i in positions]
+    }, index=positions)
+    return positions, page_df, len(matches)
+
+TASK_COMPLEXITIES = ["Low", "Medium", "High", "Very High"]
+TASK_TYPES = ["Development", "Design", "Documentation", "Testing", "Research", "Planning"]
+EXPERIENCE_LEVELS = ["Beginner", "Intermediate", "Expert"]
+
+def estimate_time(complexity, task_type, experience_level):
+    # Base time in hours for different complexity levels
+    base_times = {
+        "Low": 1,
+        "Medium": 3,
+        "High": 8,
+        "Very High": 16
+    }
+    
+    # Multipliers for different task types
+    type_multipliers = {
+        "Development": 1.0,
+        "Design": 0.8,
+        "Documentation": 0.6,
+        "Testing": 0.7,
+        "Research": 1.2,
+        "Planning": 0.5
+    }
+    
+    # Experience level adjustments
+    experience_multipliers = {
+        "Beginner": 1.5,
+        "Intermediate": 1.0,
+        "Expert": 0.7
+    }
+    
+    base_time = base_times[complexity]
+    type_mult = type_multipliers[task_type]
+    exp_mult = experience_multipliers[experience_level]
+    
+    estimated_time = base_time * type_mult * exp_mult
+    
+    # Add some variance (±20%)
+    min_time = estimated_time * 0.8
+    max_time = estimated_time * 1.2
+    
+    return min_time, estimated_time, max_time
+
+# Learned estimator: an SGD regressor predicts the log ratio between actual
+# and rule-based hours, so an untrained model falls back to estimate_time.
+# Quantiles come from the model's recent out-of-sample residuals. A model
+# records the store's training_version it reflects; a saved model behind the
+# history is retrained in a background thread while the last saved one keeps
+# serving estimates. The pickle is signed with the cache key and only
+# unpickled when the signature matches.
+TASK_MODEL_FILE = 'task_model.pkl'
+MAX_RESIDUALS = 1000
+MIN_RESIDUALS = 5
+
+_retrains = {}  # model path: Future of the retrain in progress or last finished
+_retrains_guard = threading.Lock()
+
+def task_features(tasks):
+    complexity = np.array([TASK_COMPLEXITIES.index(t['complexity']) for t in tasks])
+    task_type = np.array([TASK_TYPES.index(t['type']) for t in tasks])
+    experience = np.array([EXPERIENCE_LEVELS.index(t['experience_level']) for t in tasks])
+    features = np.zeros((len(tasks), len(TASK_COMPLEXITIES) + len(TASK_TYPES) + len(EXPERIENCE_LEVELS)))
+    rows = np.arange(len(tasks))
+    features[rows, complexity] = 1
+    features[rows, len(TASK_COMPLEXITIES) + task_type] = 1
+    features[rows, len(TASK_COMPLEXITIES) + len(TASK_TYPES) + experience] = 1
+    return features
+
+def rule_estimates(tasks):
+    return np.array([estimate_time(t['complexity'], t['type'], t['experience_level'])[1] for t in tasks])
+
+def new_task_model():
+    # Imported here so the page can start without loading scikit-learn
+    from sklearn.linear_model import SGDRegressor
+    return {
+        "regressor": SGDRegressor(loss="huber", alpha=1e-4, eta0=0.05, random_state=0),
+        "fitted": False,
+        "residuals": [],
+        "n_samples": 0,
+        "version": 0
+    }
+
+def actual_log_ratios(tasks):
+    return np.log(np.array([t['actual_time'] for t in tasks]) / rule_estimates(tasks))
+
+def update_task_model(model, tasks, version=None):
+    """Fit newly completed tasks; `version` is the store's training_version that now includes them."""
+    if version is not None:
+        model["version"] = version
+    if not tasks:
+        return model
+    features = task_features(tasks)
+    targets = actual_log_ratios(tasks)
+
+    # Residuals are recorded before the update so the quantiles stay honest
+    if model["fitted"]:
+        model["residuals"].extend((targets - model["regressor"].predict(features)).tolist())
+        model["residuals"] = model["residuals"][-MAX_RESIDUALS:]
+
+    model["regressor"].partial_fit(features, targets)
+    model["fitted"] = True
+    model["n_samples"] += len(tasks)
+    return model
+
+def train_task_model(tasks, epochs=20, version=0):
+    model = new_task_model()
+    model["version"] = version
+    completed = [t for t in tasks if t.get('actual_time')]
+    if not completed:
+        return model
+    features = task_features(completed)
+    targets = actual_log_ratios(completed)
+    for _ in range(epochs):
+        model["regressor"].partial_fit(features, targets)
+    model["fitted"] = True
+    model["n_samples"] = len(completed)
+    model["residuals"] = (targets - model["regressor"].predict(features))[-MAX_RESIDUALS:].tolist()
+    return model
+
+def load_task_model(store, storage=None):
+    """The saved model, starting a background retrain if it is out of sync with the task store.
+
+    Never waits for training: until the retrain finishes this returns the
+    last saved model, or an untrained one if none was saved yet.
+    """
+    storage = storage or get_store()
+    data = storage.read_file(TASK_MODEL_FILE)
+    body = verify(TASK_MODEL_FILE, data) if data is not None else None
+    if data is not None and body is None:
+        logger.warning("Ignoring %s with a bad signature", TASK_MODEL_FILE)
+    model = pickle.loads(body) if body is not None else None
+    if model is not None and model.get("version") == store["training_version"]:
+        return model
+    if store["completed"]:
+        retrain_task_model(task_rows(store), storage, store["training_version"])
+    return model if model is not None else new_task_model()
+
+def retrain_task_model(tasks, storage=None, version=0):
+    """Train on `tasks` in a background thread and save the result; returns a Future of the model.
+
+    A retrain already running for the same store is reused rather than started twice.
+    """
+    storage = storage or get_store()
+    path = storage.path(TASK_MODEL_FILE)
+    with _retrains_guard:
+        future = _retrains.get(path)
+        if future is not None and not future.done():
+            return future
+        future = _retrains[path] = Future()
+    # Copied so edits made while training (like logging actual time) don't race it
+    tasks = [dict(t) for t in tasks]
+
+    def retrain():
+        try:
+            model = train_task_model(tasks, version=version)
+            save_task_model(model, storage)
+        except Exception as error:
+            logger.exception("Background task model retrain failed")
+            future.set_exception(error)
+        else:
+            future.set_result(model)
+    threading.Thread(target=retrain, name="utilitycalc-task-model", daemon=True).start()
+    return future
+
+def task_model_retrain(storage=None):
+    """Future of the latest background retrain for this store, or None if there was none."""
+    with _retrains_guard:
+        return _retrains.get((storage or get_store()).path(TASK_MODEL_FILE))
+
+def save_task_model(model, storage=None):
+    data = sign(TASK_MODEL_FILE, pickle.dumps(model))
+    return (storage or get_store()).write_file(TASK_MODEL_FILE, lambda f: f.write(data))
+
+def predict_task_times(model, tasks, quantiles=(0.1, 0.9)):
+    """Return (low, expected, high) hour arrays for a batch of tasks."""
+    expected = rule_estimates(tasks)
+    if model["fitted"]:
+        expected = expected * np.exp(model["regressor"].predict(task_features(tasks)))
+    if len(model["residuals"]) >= MIN_RESIDUALS:
+        low_q, high_q = np.quantile(model["residuals"], quantiles)
+        return expected * np.exp(low_q), expected, expected * np.exp(high_q)
+    return expected * 0.8, expected, expected * 1.2
+
+# Text similarity index over task names and descriptions. Term counts are
+# hashed into a fixed feature space, so new tasks append a row and bump the
+# document frequencies without refitting a vocabulary. IDF weights are
+# applied at query time with two sparse matrix-vector products; the weights
+# and row norms are kept until the next append changes them. On disk the
+# index is append-only: each save writes just the new rows as one more
+# shard listed in a small manifest, and the shards are merged back into one
+# once there are MAX_TEXT_SHARDS of them.
+TEXT_INDEX_FILE = 'task_text_index'
+TEXT_FEATURES = 2 ** 18
+MAX_TEXT_SHARDS = 16
+
+def task_text(task):
+    return f"{task.get('name', '')} {task.get('description', '')}"
+
+def vectorize_task_text(texts):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    vectorizer = HashingVectorizer(n_features=TEXT_FEATURES, alternate_sign=False, norm=None,
+                                   ngram_range=(1, 2), stop_words='english')
+    counts = vectorizer.transform(texts).tocsr()
+    counts.data = 1 + np.log(counts.data)  # sublinear term frequency
+    return counts
+
+def text_index_from_matrix(matrix, shards=()):
+    return {"matrix": matrix, "squares": matrix.power(2),
+            "df": np.bincount(matrix.indices, minlength=TEXT_FEATURES).astype(float),
+            "shards": list(shards), "idf": None, "row_norms": None}
+
+def new_text_index():
+    from scipy import sparse
+    return text_index_from_matrix(sparse.csr_matrix((0, TEXT_FEATURES)))
+
+def add_to_text_index(index, tasks):
+    from scipy import sparse
+    rows = vectorize_task_text([task_text(t) for t in tasks])
+    index["matrix"] = sparse.vstack([index["matrix"], rows], format='csr')
+    index["squares"] = sparse.vstack([index["squares"], rows.power(2)], format='csr')
+    np.add.at(index["df"], rows.indices, 1)
+    index["idf"] = index["row_norms"] = None
+    return index
+
+def build_text_index(tasks):
+    index = new_text_index()
+    return add_to_text_index(index, tasks) if tasks else index
+
+def text_shard_file(number):
+    return f"{TEXT_INDEX_FILE}.{number}.npz"
+
+def read_text_shard(data):
+    from scipy import sparse
+    stored = np.load(io.BytesIO(data))
+    return sparse.csr_matrix((stored['data'], stored['indices'], stored['indptr']), shape=tuple(stored['shape']))
+
+def load_text_index(store, storage=None):
+    from scipy import sparse
+    storage = storage or get_store()
+    manifest = storage.load(TEXT_INDEX_FILE)
+    if manifest and sum(manifest["shards"]) == store["count"]:
+        parts = [storage.read_file(text_shard_file(i)) for i in range(len(manifest["shards"]))]
+        if all(part is not None for part in parts):
+            shards = [read_text_shard(part) for part in parts]
+            if [shard.shape[0] for shard in shards] == manifest["shards"]:
+                matrix = sparse.vstack(shards, format='csr') if shards else new_text_index()["matrix"]
+                return text_index_from_matrix(matrix, manifest["shards"])
+    # No index, or it is out of sync with the history: rebuild and save it as one shard
+    index = build_text_index(task_rows(store))
+    save_text_index(index, storage)
+    return index
+
+def save_text_index(index, storage=None):
+    """Write the rows added since the last save as a new shard, then the manifest listing it."""
+    storage = storage or get_store()
+    shards = index["shards"]
+    if len(shards) >= MAX_TEXT_SHARDS:
+        shards.clear()  # merge: the next shard holds every row
+    rows = index["matrix"][sum(shards):]
+    if rows.shape[0] or not shards:
+        storage.write_file(text_shard_file(len(shards)),
+                           lambda f: np.savez(f, data=rows.data, indices=rows.indices,
+                                              indptr=rows.indptr, shape=np.array(rows.shape)))
+        shards.append(rows.shape[0])
+    return storage.save(TEXT_INDEX_FILE, {"shards": shards})
+
+def similar_tasks(index, text, k=5):
+    """Return [(task position, cosine similarity)] for the k closest tasks."""
+    matrix = index["matrix"]
+    n_docs = matrix.shape[0]
+    if n_docs == 0 or not text.strip():
+        return []
+    query = vectorize_task_text([text])
+    if query.nnz == 0:
+        return []
+
+    if index["idf"] is None:
+        index["idf"] = np.log((1 + n_docs) / (1 + index["df"])) + 1
+        index["row_norms"] = np.sqrt(index["squares"] @ index["idf"] ** 2)
+    idf, row_norms = index["idf"], index["row_norms"]
+    query_weights = np.zeros(TEXT_FEATURES)
+    query_weights[query.indices] = query.data * idf[query.indices] ** 2
+    dots = matrix @ query_weights
+    query_norm = np.sqrt(np.sum((query.data * idf[query.indices]) ** 2))
+    scores = dots / np.maximum(row_norms * query_norm, 1e-12)
+
+    top = np.argpartition(-scores, min(k, n_docs) - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+# Project simulation: Beta-PERT durations for every task x trial, with
+# earliest finish times propagated through the dependency graph one task at
+# a time (vectorized across trials) in topological order.
+def parse_dependencies(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [dep.strip() for dep in str(value).split(",") if dep.strip()]
+
+def topological_order(task_ids, dependencies):
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    if len(positions) != len(task_ids):
+        raise ValueError("Task IDs must be unique")
+    successors = [[] for _ in task_ids]
+    indegree = [0] * len(task_ids)
+    for i, deps in enumerate(dependencies):
+        for dep in deps:
+            if dep not in positions:
+                raise ValueError(f"Unknown dependency '{dep}'")
+            successors[positions[dep]].append(i)
+            indegree[i] += 1
+
+    order = [i for i, degree in enumerate(indegree) if degree == 0]
+    for i in order:
+        for successor in successors[i]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0:
+                order.append(successor)
+    if len(order) != len(task_ids):
+        raise ValueError("Task dependencies contain a cycle")
+    return order
+
+def check_estimates(task_ids, optimistic, likely, pessimistic):
+    if not task_ids:
+        raise ValueError("Add at least one task to simulate")
+    for task_id, low, mid, high in zip(task_ids, optimistic, likely, pessimistic):
+        # Comparisons with NaN are False, so missing estimates fail here too
+        if not 0 <= low <= mid <= high:
+            raise ValueError(f"Task '{task_id}' needs estimates with "
+                             "0 <= Optimistic <= Most Likely <= Pessimistic")
+
+def sample_pert_durations(optimistic, likely, pessimistic, trials, rng):
+    optimistic, likely, pessimistic = (np.asarray(v, dtype=float) for v in (optimistic, likely, pessimistic))
+    spread = pessimistic - optimistic
+    safe_spread = np.where(spread > 0, spread, 1.0)
+    alpha = 1 + 4 * (likely - optimistic) / safe_spread
+    beta = 1 + 4 * (pessimistic - likely) / safe_spread
+    samples = rng.beta(alpha, beta, size=(trials, len(optimistic)))
+    return (optimistic + samples * spread).astype(np.float32)
+
+@cached()
+def simulate_project(task_ids, optimistic, likely, pessimistic, dependencies,
+                     trials=50000, chunk_size=5000, seed=0):
+    """Finish times and criticality of a seeded simulation, cached so reruns and other users reuse it."""
+    check_estimates(task_ids, optimistic, likely, pessimistic)
+    rng = np.random.default_rng(seed)
+    order = topological_order(task_ids, dependencies)
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    predecessors = [[positions[dep] for dep in deps] for deps in dependencies]
+    successors = [[] for _ in task_ids]
+    for i, preds in enumerate(predecessors):
+        for pred in preds:
+            successors[pred].append(i)
+
+    project_finish = np.empty(trials, dtype=np.float32)
+    critical_counts = np.zeros(len(task_ids))
+
+    # Trials run in chunks to bound memory for large projects
+    for chunk_start in range(0, trials, chunk_size):
+        n = min(chunk_size, trials - chunk_start)
+        durations = sample_pert_durations(optimistic, likely, pessimistic, n, rng)
+
+        # Forward pass: earliest finish
+        finish = np.zeros_like(durations)
+        for i in order:
+            start = finish[:, predecessors[i]].max(axis=1) if predecessors[i] else 0
+            finish[:, i] = start + durations[:, i]
+        total = finish.max(axis=1)
+
+        # Backward pass: latest finish; zero slack marks the critical path
+        latest = np.empty_like(durations)
+        for i in reversed(order):
+            if successors[i]:
+                latest[:, i] = (latest[:, successors[i]] - durations[:, successors[i]]).min(axis=1)
+            else:
+                latest[:, i] = total
+        critical_counts += np.isclose(latest, finish, rtol=1e-5, atol=1e-4).sum(axis=0)
+        project_finish[chunk_start:chunk_start + n] = total
+
+    return project_finish, critical_counts / trials
+
+def completion_date(start_date, hours, hours_per_day=8):
+    # Working days only, counting the start date as day one
+    days = int(np.ceil(hours / hours_per_day))
+    return np.busday_offset(np.datetime64(start_date), max(days - 1, 0), roll='forward').astype(object)